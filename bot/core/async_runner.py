@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+VIPAT Hotel ERP - asyncio Bot Runner
+ทางเลือกแทนลูป getUpdates แบบ thread: long-poll ด้วย aiohttp ซ้อนกับการประมวลผลอัพเดท
+งาน SQLite/handler เดิมของบอทรันใน thread executor (ในแชทเดียวกันยังทำตามลำดับ)
+
+    python3 bot/core/บอทโรงแรมSQLite.py --async     (หรือ BOT_ASYNC=1)
+"""
+import asyncio
+import signal
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Deque, Dict, Optional
+
+try:
+    import aiohttp
+except ImportError:  # ติดตั้งเพิ่ม: pip install aiohttp
+    aiohttp = None
+
+try:
+    from bot.core.telegram_client import API_RETRIES, API_URL, NON_IDEMPOTENT_METHODS, POLL_TIMEOUT, OutboundQueue, TelegramError, backoff_delay
+    from bot.core.update_dispatcher import BOT_MAX_PENDING, BOT_WORKERS, LATENCY_SAMPLES, update_chat_id
+except ImportError:  # รันตรงจาก bot/core
+    from telegram_client import API_RETRIES, API_URL, NON_IDEMPOTENT_METHODS, POLL_TIMEOUT, OutboundQueue, TelegramError, backoff_delay
+    from update_dispatcher import BOT_MAX_PENDING, BOT_WORKERS, LATENCY_SAMPLES, update_chat_id
+
+
+def _request_not_sent(error: BaseException) -> bool:
+    """เชื่อมต่อไม่ได้/connection ใน pool ถูกปิด (ลองใหม่ได้เสมอ) - ไม่รวมการหมดเวลารอคำตอบ"""
+    if isinstance(error, getattr(aiohttp, 'ConnectionTimeoutError', ())):
+        return True
+    return isinstance(error, aiohttp.ClientConnectionError) and not isinstance(error, (aiohttp.ServerTimeoutError, asyncio.TimeoutError))
+
+
+class AsyncTelegramClient:
+    """Bot API ผ่าน aiohttp.ClientSession (retry แบบเดียวกับ TelegramClient.call)"""
+
+    def __init__(self, token: str, api_url: str = None, retries: int = API_RETRIES, pool_size: int = 16,
+                 base_delay: float = 0.5, max_delay: float = 30.0):
+        self.base_url = f"{api_url or API_URL}/bot{token}"
+        self.retries = retries
+        self.pool_size = pool_size
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._session: Optional["aiohttp.ClientSession"] = None
+
+    async def start(self):
+        self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.pool_size))
+
+    async def close(self):
+        if self._session:
+            await self._session.close()
+
+    async def call(self, method: str, payload: Optional[Dict] = None, timeout: float = 10, retries: Optional[int] = None,
+                   http_method: str = "POST", idempotent: Optional[bool] = None) -> Any:
+        retries = self.retries if retries is None else retries
+        if idempotent is None:
+            idempotent = method not in NON_IDEMPOTENT_METHODS
+        url = f"{self.base_url}/{method}"
+        client_timeout = aiohttp.ClientTimeout(total=timeout)
+        attempt = 0
+        while True:
+            retry_after = None
+            try:
+                if http_method == "GET":
+                    params = {key: str(value) for key, value in (payload or {}).items()}
+                    request = self._session.get(url, params=params, timeout=client_timeout)
+                else:
+                    request = self._session.post(url, json=payload, timeout=client_timeout)
+                async with request as response:
+                    try:
+                        body = await response.json(content_type=None)
+                    except ValueError:
+                        body = {"ok": False, "description": (await response.text())[:200]}
+                    if response.status == 200 and body.get("ok"):
+                        return body.get("result")
+                    error = TelegramError(f"{method}: {response.status} {body.get('description', '')}".strip())
+                    if response.status == 429:
+                        retry_after = (body.get("parameters") or {}).get("retry_after")
+                    elif response.status < 500:
+                        raise error
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = TelegramError(f"{method}: {e!r}")
+                # หมดเวลารอคำตอบ: คำขออาจถึง Telegram แล้ว - ส่งซ้ำได้เฉพาะ method ที่ idempotent
+                if not idempotent and not _request_not_sent(e):
+                    raise error
+
+            if attempt >= retries:
+                raise error
+            await asyncio.sleep(retry_after if retry_after is not None else backoff_delay(attempt, self.base_delay, self.max_delay))
+            attempt += 1
+
+
+class ThreadsafeTelegramClient:
+    """
+    หน้าตาเดียวกับ TelegramClient (call/close) สำหรับโค้ด sync ใน executor/OutboundQueue
+    ส่งงานไปทำบน event loop ด้วย AsyncTelegramClient แล้วรอผล
+    """
+
+    def __init__(self, client: AsyncTelegramClient, loop: asyncio.AbstractEventLoop):
+        self.client = client
+        self.loop = loop
+
+    def call(self, method: str, payload: Optional[Dict] = None, timeout: float = 10, retries: Optional[int] = None,
+             http_method: str = "POST", idempotent: Optional[bool] = None) -> Any:
+        future = asyncio.run_coroutine_threadsafe(self.client.call(method, payload, timeout, retries, http_method, idempotent), self.loop)
+        return future.result()
+
+    def close(self):
+        pass
+
+
+class AsyncBotRunner:
+    """
+    รัน ระบบจัดการโรงแรมSQLite บน asyncio
+    - getUpdates รอบถัดไปถูกส่งทันที ไม่ต้องรอ handler ของรอบก่อน
+    - handler (bot.จัดการอัพเดท) รันใน ThreadPoolExecutor - แชทละงานเดียวในเวลาหนึ่ง ต่างแชทขนานกัน
+    - getUpdates ล้มเหลวรอแบบ exponential backoff + jitter
+    - stop()/SIGINT/SIGTERM: หยุด poll, รอ handler ที่ค้างและคิวส่งข้อความให้หมด แล้วปิด session
+    """
+
+    def __init__(self, bot, workers: int = BOT_WORKERS, max_pending: int = BOT_MAX_PENDING, api_url: str = None,
+                 poll_timeout: int = POLL_TIMEOUT):
+        self.bot = bot
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.poll_timeout = poll_timeout
+        self.client = AsyncTelegramClient(bot.token, api_url)
+        self._chats: Dict[Any, Deque] = {}
+        self._tasks: Dict[Any, asyncio.Task] = {}
+        self._pending = 0
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self._stats = {"submitted": 0, "completed": 0, "errors": 0, "poll_errors": 0, "backpressure_waits": 0}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._changed: Optional[asyncio.Condition] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def stop(self):
+        """หยุดจาก thread ใดก็ได้"""
+        if self._loop and self._stop:
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+    async def _wait_or_stop(self, delay: float):
+        try:
+            await asyncio.wait_for(self._stop.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _submit(self, update: Dict):
+        async with self._changed:
+            while self._pending >= self.max_pending:
+                self._stats["backpressure_waits"] += 1
+                await self._changed.wait()
+            chat_id = update_chat_id(update)
+            self._chats.setdefault(chat_id, deque()).append((time.monotonic(), update))
+            self._pending += 1
+            self._stats["submitted"] += 1
+            if chat_id not in self._tasks:
+                self._tasks[chat_id] = asyncio.create_task(self._drain_chat(chat_id))
+
+    async def _drain_chat(self, chat_id):
+        """ประมวลผลอัพเดทของแชทหนึ่งตามลำดับ จนคิวของแชทว่าง"""
+        queue = self._chats[chat_id]
+        while queue:
+            enqueued_at, update = queue.popleft()
+            failed = False
+            try:
+                await self._loop.run_in_executor(self._executor, self.bot.จัดการอัพเดท, update)
+            except Exception as e:
+                failed = True
+                print(f"ข้อผิดพลาดในการประมวลผลอัพเดท {update.get('update_id')}: {e}")
+            self._latencies.append(time.monotonic() - enqueued_at)
+            async with self._changed:
+                self._pending -= 1
+                self._stats["completed"] += 1
+                if failed:
+                    self._stats["errors"] += 1
+                if not queue:
+                    del self._chats[chat_id]
+                    del self._tasks[chat_id]
+                self._changed.notify_all()
+
+    async def _poll_loop(self):
+        failures = 0
+        while not self._stop.is_set():
+            try:
+                params = {"offset": self.bot.offset, "timeout": self.poll_timeout}
+                updates = await self.client.call("getUpdates", params, timeout=self.poll_timeout + 5, retries=0, http_method="GET")
+            except TelegramError as e:
+                failures += 1
+                self._stats["poll_errors"] += 1
+                delay = backoff_delay(failures, 1.0, 30.0)
+                print(f"ข้อผิดพลาด: {e} (ลองใหม่ใน {delay:.1f} วินาที)")
+                await self._wait_or_stop(delay)
+                continue
+            failures = 0
+            for update in updates or []:
+                await self._submit(update)
+                self.bot.offset = update["update_id"] + 1
+
+    async def run(self):
+        if aiohttp is None:
+            raise RuntimeError("ต้องติดตั้ง aiohttp สำหรับโหมด async (pip install aiohttp)")
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        self._changed = asyncio.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bot-async")
+        await self.client.start()
+
+        # โค้ด sync ของบอท (ส่งข้อความ, ตอบ callback) ใช้ session ของ aiohttp ผ่าน event loop นี้
+        bridge = ThreadsafeTelegramClient(self.client, self._loop)
+        previous_outbox, previous_client = self.bot.outbox, self.bot.telegram
+        self.bot.telegram = bridge
+        self.bot.outbox = OutboundQueue(bridge)
+        await self._loop.run_in_executor(None, previous_outbox.stop)
+        previous_client.close()
+
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self._loop.add_signal_handler(sig, self._stop.set)
+            except (NotImplementedError, RuntimeError, ValueError):
+                pass  # ไม่ใช่ main thread / ไม่รองรับบนแพลตฟอร์มนี้
+
+        self.bot.running = True
+        self.bot.async_runner = self
+        print(f"🤖 ระบบจัดการโรงแรม SQLite เริ่มทำงาน (asyncio)... ({self.workers} workers)")
+        poller = asyncio.create_task(self._poll_loop())
+        try:
+            await self._stop.wait()
+        finally:
+            self.bot.running = False
+            poller.cancel()
+            await asyncio.gather(poller, return_exceptions=True)
+            async with self._changed:
+                while self._pending:
+                    await self._changed.wait()
+            await self._loop.run_in_executor(None, self.bot.user_sessions.close)
+            # ส่งข้อความที่ค้างให้หมด (sender ต้องใช้ event loop จึงรอใน executor)
+            await self._loop.run_in_executor(None, self.bot.outbox.stop)
+            self._executor.shutdown(wait=True)
+            await self.client.close()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                try:
+                    self._loop.remove_signal_handler(sig)
+                except (NotImplementedError, RuntimeError, ValueError):
+                    pass
+            self.bot.async_runner = None
+            print(f"📈 สถิติการประมวลผลอัพเดท: {self.stats()}")
+            print(f"📤 สถิติการส่งข้อความ: {self.bot.outbox.stats()}")
+
+    def stats(self) -> Dict:
+        samples = sorted(self._latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            if not samples:
+                return None
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))], 4)
+
+        return {**self._stats, "workers": self.workers, "pending": self._pending, "active_chats": len(self._tasks),
+                "latency_p50": percentile(0.50), "latency_p95": percentile(0.95),
+                "max_latency": round(samples[-1], 4) if samples else None}
+
+
+def run_async(bot, **kwargs) -> AsyncBotRunner:
+    """รันบอทบน asyncio จนกว่าจะ stop()/SIGINT/SIGTERM"""
+    runner = AsyncBotRunner(bot, **kwargs)
+    asyncio.run(runner.run())
+    return runner
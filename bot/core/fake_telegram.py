@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+VIPAT Hotel ERP - Fake Telegram Bot API
+เซิร์ฟเวอร์ Bot API จำลองในเครื่อง (getUpdates แบบ long-poll, sendMessage, answerCallbackQuery)
+ใช้ทดสอบ/benchmark บอทแบบออฟไลน์: ตั้ง TELEGRAM_API_URL=http://127.0.0.1:<port>
+
+    python3 bot/core/fake_telegram.py [port]   แล้วพิมพ์ "<chat_id> <ข้อความ>" เพื่อจำลองผู้ใช้
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qsl, urlparse
+
+
+class FakeTelegramServer:
+    """
+    Bot API จำลอง
+    - push_message()/push_callback() ใส่อัพเดทเข้าคิว แล้ว getUpdates คืนตาม offset (รอได้ถึง timeout)
+    - ข้อความที่บอทส่งเก็บใน sent; wait_for_sent() รอจนครบจำนวน
+    - latency: หน่วงเวลาต่อคำขอส่งข้อความ, rate_limit_every: ตอบ 429 ทุกๆ n คำขอ
+    - fail_get_updates: ตอบ 502 ให้ getUpdates n ครั้งถัดไป (เวลาที่ถูกเรียกทุกครั้งอยู่ใน poll_times)
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, rate_limit_every: int = 0,
+                 fail_get_updates: int = 0):
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.fail_get_updates = fail_get_updates
+        self.poll_times: List[float] = []
+        self.updates: List[Dict] = []
+        self.sent: List[Dict] = []
+        self.callbacks_answered = 0
+        self.requests = 0
+        self._next_update_id = 1
+        self._cond = threading.Condition()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-telegram", daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def push_update(self, update: Dict) -> int:
+        with self._cond:
+            update_id = self._next_update_id
+            self._next_update_id += 1
+            self.updates.append({"update_id": update_id, **update})
+            self._cond.notify_all()
+            return update_id
+
+    def push_message(self, chat_id: int, text: str, first_name: str = "ทดสอบ") -> int:
+        return self.push_update({"message": {
+            "message_id": self._next_update_id, "date": int(time.time()), "text": text,
+            "chat": {"id": chat_id, "type": "private"}, "from": {"id": chat_id, "first_name": first_name},
+        }})
+
+    def push_callback(self, chat_id: int, data: str) -> int:
+        return self.push_update({"callback_query": {
+            "id": f"cb{self._next_update_id}", "data": data, "from": {"id": chat_id, "first_name": "ทดสอบ"},
+            "message": {"message_id": 0, "chat": {"id": chat_id, "type": "private"}},
+        }})
+
+    def wait_for_sent(self, count: int, timeout: float = 30) -> bool:
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while len(self.sent) < count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def _get_updates(self, params: Dict) -> List[Dict]:
+        offset = int(params.get("offset", 0))
+        deadline = time.monotonic() + float(params.get("timeout", 0))
+        with self._cond:
+            # offset ยืนยันว่าอัพเดทก่อนหน้าได้รับแล้ว - ทิ้งไปเหมือน Telegram
+            self.updates = [u for u in self.updates if u["update_id"] >= offset]
+            while not self.updates:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return self.updates[:int(params.get("limit", 100))]
+
+    def _dispatch(self, method: str, params: Dict):
+        """คืน (status, body)"""
+        if method == "getUpdates":
+            with self._cond:
+                self.poll_times.append(time.monotonic())
+                failing = self.fail_get_updates > 0
+                if failing:
+                    self.fail_get_updates -= 1
+            if failing:
+                return 502, {"ok": False, "error_code": 502, "description": "Bad Gateway"}
+            return 200, {"ok": True, "result": self._get_updates(params)}
+        with self._cond:
+            self.requests += 1
+            limited = self.rate_limit_every and self.requests % self.rate_limit_every == 0
+        if limited:
+            return 429, {"ok": False, "error_code": 429, "description": "Too Many Requests: retry after 1",
+                         "parameters": {"retry_after": 1}}
+        if self.latency:
+            time.sleep(self.latency)
+        if method == "sendMessage":
+            if not params.get("chat_id") or not params.get("text"):
+                return 400, {"ok": False, "error_code": 400, "description": "Bad Request: message text is empty"}
+            with self._cond:
+                self.sent.append({**params, "at": time.monotonic()})
+                self._cond.notify_all()
+            return 200, {"ok": True, "result": {"message_id": len(self.sent), "chat": {"id": params["chat_id"]}, "text": params["text"]}}
+        if method == "answerCallbackQuery":
+            with self._cond:
+                self.callbacks_answered += 1
+            return 200, {"ok": True, "result": True}
+        return 404, {"ok": False, "error_code": 404, "description": "Not Found"}
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _respond(self, params: Dict):
+                method = urlparse(self.path).path.rsplit('/', 1)[-1]
+                status, body = fake._dispatch(method, params)
+                data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                try:
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # client เลิกรอ long-poll แล้ว (เช่น บอทหยุดทำงาน)
+
+            def do_GET(self):
+                self._respond(dict(parse_qsl(urlparse(self.path).query)))
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                if 'json' in (self.headers.get('Content-Type') or ''):
+                    params = json.loads(raw or b'{}')
+                else:
+                    params = dict(parse_qsl(raw.decode('utf-8')))
+                self._respond(params)
+
+        return Handler
+
+
+if __name__ == "__main__":
+    import sys
+    server = FakeTelegramServer(port=int(sys.argv[1]) if len(sys.argv) > 1 else 8081)
+    print(f"🧪 Fake Telegram API: {server.start()}  (TELEGRAM_API_URL={server.url})")
+    print("พิมพ์ '<chat_id> <ข้อความ>' เพื่อส่งข้อความเข้าบอท (Ctrl+D เพื่อจบ)")
+
+    def print_sent():
+        seen = 0
+        while True:
+            server.wait_for_sent(seen + 1, timeout=3600)
+            for message in server.sent[seen:]:
+                print(f"→ {message['chat_id']}: {message['text'][:80]!r}")
+            seen = len(server.sent)
+
+    threading.Thread(target=print_sent, daemon=True).start()
+    try:
+        for line in sys.stdin:
+            chat_id, _, text = line.strip().partition(' ')
+            if chat_id.lstrip('-').isdigit() and text:
+                server.push_message(int(chat_id), text)
+    except KeyboardInterrupt:
+        pass
+    server.stop()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+VIPAT Hotel ERP - Bot Session Store
+เก็บฟอร์มหลายขั้นตอนของบอท (เพิ่มผู้เข้าพัก) แทน dict ธรรมดา: หมดอายุตาม TTL, จำกัดจำนวนในหน่วยความจำแบบ LRU
+และบันทึกลงตาราง Data_BotSessions แบบ write-behind เป็นชุด - รีสตาร์ทบอทแล้วฟอร์มที่ค้างไว้ทำต่อได้
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from database.models.db_access_v2 import get_db_connection, run_write_transaction
+
+# ฟอร์มที่ไม่มีความเคลื่อนไหวเกิน TTL ถือว่าถูกทิ้ง
+SESSION_TTL = float(os.environ.get('BOT_SESSION_TTL', 6 * 3600))
+SESSION_MAX = int(os.environ.get('BOT_SESSION_MAX', 1000))
+SESSION_FLUSH_INTERVAL = float(os.environ.get('BOT_SESSION_FLUSH_INTERVAL', 2.0))
+
+_MISSING = object()
+
+
+class SessionStore:
+    """
+    ใช้แทน dict ของ user_sessions ได้ตรงๆ (in, get, [], del) - โค้ดฟอร์มแก้ session dict ที่ได้มาได้ตามเดิม
+    - หน่วยความจำ: เรียงตามการใช้งานล่าสุด เกิน max_sessions ตัดตัวที่เก่าสุดออก (ยังอยู่ในฐานข้อมูล)
+    - lazy hydration: session ที่อยู่ในฐานข้อมูลแต่ไม่อยู่ในหน่วยความจำ โหลดเมื่อแชทนั้นส่งข้อความมา
+    - write-behind: ทุก flush_interval เขียนเฉพาะ session ที่เนื้อหาเปลี่ยน (เทียบ JSON) และลบที่ถูกลบ/หมดอายุ
+      ใน transaction เดียว - flush() / close() บังคับเขียนทันที
+    """
+
+    def __init__(self, ttl: float = SESSION_TTL, max_sessions: int = SESSION_MAX,
+                 flush_interval: float = SESSION_FLUSH_INTERVAL, autostart: bool = True):
+        self.ttl = ttl
+        self.max_sessions = max(1, max_sessions)
+        self.flush_interval = flush_interval
+        self._sessions: "OrderedDict[Any, Tuple[Dict, float]]" = OrderedDict()
+        # JSON และเวลาที่เขียนลงฐานข้อมูลครั้งล่าสุด ของ session ในหน่วยความจำ
+        self._persisted: Dict[str, Tuple[str, float]] = {}
+        self._on_disk: Optional[set] = None
+        self._deleted = set()
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._stats = {"hydrated": 0, "expired": 0, "evicted": 0, "flushes": 0, "written": 0, "deleted": 0}
+        self._last_cleanup = 0.0
+        self._thread = None
+        if autostart:
+            self._thread = threading.Thread(target=self._run, name="bot-session-flush", daemon=True)
+            self._thread.start()
+
+    @staticmethod
+    def _key(chat_id) -> str:
+        return str(chat_id)
+
+    def _index(self) -> set:
+        """chat_id ที่มี session ในฐานข้อมูล (โหลดครั้งแรกที่ใช้ เฉพาะคีย์)"""
+        if self._on_disk is None:
+            with get_db_connection() as conn:
+                cutoff = time.time() - self.ttl
+                self._on_disk = {row[0] for row in conn.execute(
+                    "SELECT chat_id FROM Data_BotSessions WHERE updated_at >= ?", (cutoff,))}
+        return self._on_disk
+
+    def _hydrate(self, chat_id, now: float):
+        key = self._key(chat_id)
+        if key not in self._index():
+            return None
+        with get_db_connection() as conn:
+            row = conn.execute("SELECT session, updated_at FROM Data_BotSessions WHERE chat_id = ?", (key,)).fetchone()
+        if row is None or row[1] + self.ttl < now:
+            self._on_disk.discard(key)
+            if row is not None:
+                self._deleted.add(key)
+                self._stats["expired"] += 1
+            return None
+        session = json.loads(row[0])
+        self._sessions[chat_id] = (session, now)
+        self._persisted[key] = (row[0], row[1])
+        self._stats["hydrated"] += 1
+        self._evict(now)
+        return session
+
+    def _drop(self, chat_id, delete_persisted: bool):
+        key = self._key(chat_id)
+        self._sessions.pop(chat_id, None)
+        if delete_persisted:
+            self._persisted.pop(key, None)
+            if self._on_disk is not None:
+                self._on_disk.discard(key)
+            self._deleted.add(key)
+
+    def _evict(self, now: float):
+        # หมดอายุ: ลบทั้งจากหน่วยความจำและฐานข้อมูล (เรียงตามการใช้งาน ตัวหน้าสุดเก่าสุด)
+        while self._sessions:
+            chat_id, (_, last_used) = next(iter(self._sessions.items()))
+            if last_used + self.ttl >= now:
+                break
+            self._drop(chat_id, delete_persisted=True)
+            self._stats["expired"] += 1
+        # เกินจำนวน: เขียนลงฐานข้อมูลก่อน (flush ถัดไป) แล้วค่อยปล่อยจากหน่วยความจำ
+        while len(self._sessions) > self.max_sessions:
+            chat_id, (session, last_used) = next(iter(self._sessions.items()))
+            key = self._key(chat_id)
+            if self._persisted.get(key, (None,))[0] != json.dumps(session, ensure_ascii=False):
+                break
+            self._sessions.popitem(last=False)
+            self._persisted.pop(key, None)
+            self._stats["evicted"] += 1
+
+    def get(self, chat_id, default=None):
+        now = time.time()
+        with self._lock:
+            entry = self._sessions.get(chat_id)
+            if entry is not None and entry[1] + self.ttl < now:
+                self._drop(chat_id, delete_persisted=True)
+                self._stats["expired"] += 1
+                entry = None
+            if entry is not None:
+                self._sessions[chat_id] = (entry[0], now)
+                self._sessions.move_to_end(chat_id)
+                return entry[0]
+            session = self._hydrate(chat_id, now)
+            return default if session is None else session
+
+    def __contains__(self, chat_id) -> bool:
+        return self.get(chat_id, _MISSING) is not _MISSING
+
+    def __getitem__(self, chat_id):
+        session = self.get(chat_id, _MISSING)
+        if session is _MISSING:
+            raise KeyError(chat_id)
+        return session
+
+    def __setitem__(self, chat_id, session: Dict):
+        now = time.time()
+        with self._lock:
+            self._sessions[chat_id] = (session, now)
+            self._sessions.move_to_end(chat_id)
+            self._deleted.discard(self._key(chat_id))
+            self._evict(now)
+
+    def __delitem__(self, chat_id):
+        with self._lock:
+            if chat_id not in self._sessions and self._key(chat_id) not in self._index():
+                raise KeyError(chat_id)
+            self._drop(chat_id, delete_persisted=True)
+
+    def pop(self, chat_id, default=None):
+        with self._lock:
+            session = self.get(chat_id, _MISSING)
+            if session is _MISSING:
+                return default
+            self._drop(chat_id, delete_persisted=True)
+            return session
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def flush(self) -> int:
+        """เขียน session ที่เปลี่ยนและลบที่ถูกลบลงฐานข้อมูลใน transaction เดียว - คืนจำนวนแถวที่เขียน/ลบ"""
+        with self._flush_lock:
+            now = time.time()
+            with self._lock:
+                self._evict(now)
+                upserts = []
+                for chat_id, (session, last_used) in self._sessions.items():
+                    key = self._key(chat_id)
+                    try:
+                        payload = json.dumps(session, ensure_ascii=False)
+                    except RuntimeError:
+                        continue  # กำลังถูกแก้โดย worker ของแชทนั้น - เขียนรอบถัดไป
+                    persisted = self._persisted.get(key)
+                    # เนื้อหาเปลี่ยน หรือยังใช้งานอยู่แต่เวลาในฐานข้อมูลใกล้หมดอายุ
+                    if persisted is None or persisted[0] != payload or last_used - persisted[1] > self.ttl / 4:
+                        upserts.append((key, payload, last_used))
+                deletes = [(key,) for key in self._deleted]
+                self._deleted.clear()
+            # ลบแถวที่หมดอายุในฐานข้อมูล (ไม่ถี่กว่าทุก ttl/4 หรือ 1 นาที)
+            cleanup = now - self._last_cleanup >= min(self.ttl / 4, 60)
+            if not upserts and not deletes and not cleanup:
+                return 0
+
+            def work(conn):
+                conn.executemany("DELETE FROM Data_BotSessions WHERE chat_id = ?", deletes)
+                conn.executemany(
+                    """INSERT INTO Data_BotSessions (chat_id, session, updated_at) VALUES (?, ?, ?)
+                       ON CONFLICT(chat_id) DO UPDATE SET session = excluded.session, updated_at = excluded.updated_at""",
+                    upserts)
+                if cleanup:
+                    conn.execute("DELETE FROM Data_BotSessions WHERE updated_at < ?", (now - self.ttl,))
+
+            try:
+                run_write_transaction(work)
+            except Exception as e:
+                with self._lock:
+                    in_memory = {self._key(chat_id) for chat_id in self._sessions}
+                    self._deleted.update(key for (key,) in deletes if key not in in_memory)
+                print(f"⚠️ บันทึก session ของบอทไม่สำเร็จ: {e}")
+                return 0
+            with self._lock:
+                in_memory = {self._key(chat_id) for chat_id in self._sessions}
+                for key, payload, last_used in upserts:
+                    if key not in in_memory:
+                        continue  # ถูกลบระหว่างเขียน - แถวนี้จะถูกลบใน flush ถัดไป
+                    self._persisted[key] = (payload, last_used)
+                    if self._on_disk is not None:
+                        self._on_disk.add(key)
+                if cleanup:
+                    self._last_cleanup = now
+                self._stats["flushes"] += 1
+                self._stats["written"] += len(upserts)
+                self._stats["deleted"] += len(deletes)
+            return len(upserts) + len(deletes)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        """หยุด thread เขียนเบื้องหลังแล้ว flush ครั้งสุดท้าย"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.flush()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self._stats, "in_memory": len(self._sessions), "pending_deletes": len(self._deleted),
+                    "on_disk": None if self._on_disk is None else len(self._on_disk)}
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+VIPAT Hotel ERP - Telegram Bot API Client
+requests.Session ที่ใช้การเชื่อมต่อซ้ำ (keep-alive) + retry แบบ exponential backoff
+และคิวส่งข้อความขาออกที่เคารพ rate limit ของ Telegram (รวมทั้งบอทและต่อแชท) พร้อมรวมข้อความที่ส่งถึงแชทเดียวกัน
+"""
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# เปลี่ยนเป็น fake server (bot/core/fake_telegram.py) เพื่อทดสอบ/benchmark แบบออฟไลน์ได้
+API_URL = os.environ.get('TELEGRAM_API_URL', 'https://api.telegram.org').rstrip('/')
+POLL_TIMEOUT = int(os.environ.get('BOT_POLL_TIMEOUT', 30))
+API_RETRIES = int(os.environ.get('TELEGRAM_API_RETRIES', 4))
+SENDER_THREADS = int(os.environ.get('TELEGRAM_SENDERS', 4))
+# Telegram: ~30 ข้อความ/วินาทีทั้งบอท และ ~1 ข้อความ/วินาทีต่อแชท (ยอมให้ส่งติดกันได้เล็กน้อย)
+GLOBAL_RATE = float(os.environ.get('TELEGRAM_GLOBAL_RATE', 30))
+CHAT_RATE = float(os.environ.get('TELEGRAM_CHAT_RATE', 1))
+CHAT_BURST = float(os.environ.get('TELEGRAM_CHAT_BURST', 3))
+OUTBOX_MAX = int(os.environ.get('TELEGRAM_OUTBOX_MAX', 1000))
+MAX_MESSAGE_LENGTH = 4096
+# method ที่ส่งซ้ำแล้วได้ผลซ้ำ (ข้อความซ้ำถึงแขก/พนักงาน): ไม่ retry เมื่อหมดเวลารอคำตอบหลังส่งคำขอไปแล้ว
+NON_IDEMPOTENT_METHODS = {"sendMessage", "sendPhoto", "sendDocument", "sendMediaGroup", "forwardMessage", "copyMessage"}
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """Exponential backoff แบบ full jitter: สุ่มระหว่าง 0 ถึง min(cap, base * 2^attempt)"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class TelegramError(Exception):
+    """เรียก Bot API ไม่สำเร็จหลัง retry ครบแล้ว (หรือเป็นข้อผิดพลาดที่ retry ไม่ได้ เช่น 400)"""
+
+
+class TelegramClient:
+    """Bot API ผ่าน requests.Session เดียว (connection pool ใช้ร่วมกันได้หลาย thread)"""
+
+    def __init__(self, token: str, retries: int = API_RETRIES, pool_size: int = 16, base_delay: float = 0.5, max_delay: float = 30.0,
+                 api_url: str = None):
+        self.base_url = f"{api_url or API_URL}/bot{token}"
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def call(self, method: str, payload: Optional[Dict] = None, timeout: float = 10, retries: Optional[int] = None, http_method: str = "POST",
+             idempotent: Optional[bool] = None) -> Dict:
+        """
+        เรียก Bot API แล้วคืน result - retry เมื่อเชื่อมต่อไม่ได้, 5xx หรือ 429 (ใช้ retry_after ของ Telegram)
+        ข้อผิดพลาดฝั่งคำขอ (4xx อื่นๆ) raise TelegramError ทันที
+        หมดเวลารอคำตอบ (ReadTimeout) retry เฉพาะ method ที่ idempotent (ค่าเริ่มต้น: ไม่อยู่ใน NON_IDEMPOTENT_METHODS)
+        """
+        retries = self.retries if retries is None else retries
+        if idempotent is None:
+            idempotent = method not in NON_IDEMPOTENT_METHODS
+        url = f"{self.base_url}/{method}"
+        attempt = 0
+        while True:
+            retry_after = None
+            try:
+                if http_method == "GET":
+                    response = self.session.get(url, params=payload, timeout=timeout)
+                else:
+                    response = self.session.post(url, json=payload, timeout=timeout)
+                try:
+                    body = response.json()
+                except ValueError:
+                    body = {"ok": False, "description": response.text[:200]}
+                if response.status_code == 200 and body.get("ok"):
+                    return body.get("result")
+                error = TelegramError(f"{method}: {response.status_code} {body.get('description', '')}".strip())
+                if response.status_code == 429:
+                    retry_after = (body.get("parameters") or {}).get("retry_after")
+                elif response.status_code < 500:
+                    raise error
+            except requests.ConnectionError as e:
+                # เชื่อมต่อไม่ได้/connection ใน pool ถูกปิด - คำขอยังไม่ถูกประมวลผล ลองใหม่ได้
+                error = TelegramError(f"{method}: {e}")
+            except requests.RequestException as e:
+                # เช่น ReadTimeout: คำขออาจถึง Telegram แล้ว - ส่งซ้ำได้เฉพาะ method ที่ idempotent
+                error = TelegramError(f"{method}: {e}")
+                if not idempotent:
+                    raise error
+
+            if attempt >= retries:
+                raise error
+            delay = retry_after if retry_after is not None else backoff_delay(attempt, self.base_delay, self.max_delay)
+            time.sleep(delay)
+            attempt += 1
+
+    def close(self):
+        self.session.close()
+
+
+class TokenBucket:
+    """Token bucket (rate โทเค็น/วินาที จุได้ capacity) - delay() บอกเวลาที่ต้องรอก่อนมีโทเค็น"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class OutboundQueue:
+    """
+    คิวส่งข้อความขาออก ระบายโดย sender threads เบื้องหลัง
+    - ข้อความของแชทเดียวกันถูกส่งตามลำดับ (แชทละ sender เดียวในเวลาหนึ่ง)
+    - ข้อความที่รออยู่ของแชทเดียวกันถูกรวมเป็นข้อความเดียว (ถ้าข้อความก่อนหน้าไม่มีปุ่ม และยาวรวมไม่เกิน 4096)
+    - token bucket ทั้งบอท (GLOBAL_RATE) และต่อแชท (CHAT_RATE/CHAT_BURST)
+    - ส่งไม่สำเร็จ retry ใน TelegramClient.call แล้วบันทึกเป็น failed (ไม่เงียบหาย)
+    """
+
+    def __init__(self, client: TelegramClient, senders: int = SENDER_THREADS, global_rate: float = GLOBAL_RATE,
+                 chat_rate: float = CHAT_RATE, chat_burst: float = CHAT_BURST, max_pending: int = OUTBOX_MAX):
+        self.client = client
+        self.max_pending = max_pending
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chat_buckets: Dict[Any, TokenBucket] = {}
+        self._chats: "OrderedDict[Any, Deque[Dict]]" = OrderedDict()
+        self._in_flight = set()
+        self._pending = 0
+        self._stopping = False
+        self._cond = threading.Condition()
+        self._stats = {"queued": 0, "sent": 0, "coalesced": 0, "failed": 0, "rate_limited_waits": 0}
+        self._threads = [threading.Thread(target=self._run, name=f"tg-sender-{i}", daemon=True) for i in range(max(1, senders))]
+        for thread in self._threads:
+            thread.start()
+
+    def send(self, chat_id, text: str, reply_markup: Optional[Dict] = None, parse_mode: str = "HTML", timeout: Optional[float] = None) -> bool:
+        """เข้าคิวข้อความ (รอถ้าคิวเต็ม) - คืน False ถ้าหมดเวลารอหรือคิวปิดแล้ว"""
+        message = {"chat_id": chat_id, "text": text, "parse_mode": parse_mode}
+        if reply_markup:
+            message["reply_markup"] = reply_markup
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending >= self.max_pending and not self._stopping:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            if self._stopping:
+                return False
+            self._chats.setdefault(chat_id, deque()).append(message)
+            self._pending += 1
+            self._stats["queued"] += 1
+            self._cond.notify_all()
+            return True
+
+    def _coalesce(self, queue: Deque[Dict]) -> Tuple[Dict, int]:
+        """ดึงข้อความแรกของแชท แล้วรวมข้อความถัดไปเข้าด้วยกันเท่าที่ทำได้"""
+        message = dict(queue.popleft())
+        count = 1
+        while queue:
+            following = queue[0]
+            if ("reply_markup" in message or following["parse_mode"] != message["parse_mode"]
+                    or len(message["text"]) + 2 + len(following["text"]) > MAX_MESSAGE_LENGTH):
+                break
+            queue.popleft()
+            message["text"] = f"{message['text']}\n\n{following['text']}"
+            if "reply_markup" in following:
+                message["reply_markup"] = following["reply_markup"]
+            count += 1
+        return message, count
+
+    def _next(self):
+        with self._cond:
+            while True:
+                if self._stopping and self._pending == 0:
+                    return None
+                wait = None
+                for chat_id, queue in self._chats.items():
+                    if not queue or chat_id in self._in_flight:
+                        continue
+                    bucket = self._chat_buckets.setdefault(chat_id, TokenBucket(self.chat_rate, self.chat_burst))
+                    delay = bucket.delay()
+                    if delay > 0:
+                        wait = delay if wait is None else min(wait, delay)
+                        continue
+                    bucket.take()
+                    message, count = self._coalesce(queue)
+                    if not queue:
+                        del self._chats[chat_id]
+                    else:
+                        self._chats.move_to_end(chat_id)  # round-robin ระหว่างแชท
+                    self._in_flight.add(chat_id)
+                    return chat_id, message, count
+                if wait is not None:
+                    self._stats["rate_limited_waits"] += 1
+                self._cond.wait(wait)
+
+    def _run(self):
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            chat_id, message, count = item
+            while True:
+                with self._cond:
+                    delay = self._global.delay()
+                    if delay <= 0:
+                        self._global.take()
+                        break
+                time.sleep(delay)
+            try:
+                self.client.call("sendMessage", message)
+                outcome = "sent"
+            except TelegramError as e:
+                outcome = "failed"
+                print(f"❌ ส่งข้อความถึง {chat_id} ไม่สำเร็จ: {e}")
+            with self._cond:
+                self._in_flight.discard(chat_id)
+                self._pending -= count
+                self._stats[outcome] += count
+                self._stats["coalesced"] += count - 1
+                self._cond.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """รอจนคิวว่าง"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def stop(self, timeout: Optional[float] = None):
+        """หยุดรับข้อความใหม่ ส่งที่ค้างให้หมด แล้วหยุด sender"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {**self._stats, "pending": self._pending, "chats": len(self._chats), "in_flight": len(self._in_flight)}
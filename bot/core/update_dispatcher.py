@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+VIPAT Hotel ERP - Telegram Update Dispatcher
+กระจายอัพเดทจาก getUpdates ให้ worker หลายตัว: ต่างแชททำงานขนานกัน แต่ในแชทเดียวกันทำตามลำดับเสมอ
+(ฟอร์มใน user_sessions ของแต่ละแชทจึงไม่ถูกแก้พร้อมกัน)
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+BOT_WORKERS = int(os.environ.get('BOT_WORKERS', 8))
+# จำนวนอัพเดทที่รอประมวลผลได้ทั้งหมด - เกินแล้ว submit() จะรอ (backpressure ไปที่ลูป getUpdates)
+BOT_MAX_PENDING = int(os.environ.get('BOT_MAX_PENDING', 200))
+# ต่อแชท - เกินแล้วทิ้งอัพเดทของแชทนั้น (ไม่รอ: แชทเดียวที่ช้า/ส่งรัวต้องไม่หยุดลูปที่รับอัพเดทของทุกแชท)
+BOT_MAX_PENDING_PER_CHAT = int(os.environ.get('BOT_MAX_PENDING_PER_CHAT', 20))
+LATENCY_SAMPLES = 1000
+
+
+def update_chat_id(update: Dict) -> Optional[Any]:
+    """chat_id ของอัพเดท (message / callback_query) - None ถ้าไม่มีแชท"""
+    message = update.get("message") or update.get("edited_message")
+    if message is None and "callback_query" in update:
+        callback = update["callback_query"]
+        message = callback.get("message")
+        if message is None:
+            return callback.get("from", {}).get("id")
+    if message is None:
+        return None
+    return message.get("chat", {}).get("id")
+
+
+class UpdateDispatcher:
+    """
+    Worker pool ที่รักษาลำดับต่อแชท
+    - แต่ละแชทมีคิวของตัวเอง และมี worker ทำงานให้แชทหนึ่งได้ครั้งละตัวเดียว
+    - แชทที่พร้อมทำงานถูกวนให้ worker แบบ round-robin (แชทที่ส่งรัวๆ ไม่แย่ง worker ของแชทอื่น)
+    - แชทที่ค้างครบ max_pending_per_chat: อัพเดทใหม่ของแชทนั้นถูกทิ้งและนับใน stats()["dropped"]
+    - stats(): จำนวนที่รอ/ทำเสร็จ/ผิดพลาด และ latency (รอคิว + ประมวลผล) p50/p95/max
+    """
+
+    def __init__(self, handler: Callable[[Dict], None], workers: int = BOT_WORKERS,
+                 max_pending: int = BOT_MAX_PENDING, max_pending_per_chat: int = BOT_MAX_PENDING_PER_CHAT):
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.max_pending_per_chat = max(1, max_pending_per_chat)
+        self._chats: Dict[Any, Deque] = {}
+        self._active = set()
+        self._ready: Deque = deque()
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self._stats = {"submitted": 0, "completed": 0, "errors": 0, "dropped": 0, "backpressure_waits": 0, "max_latency": 0.0}
+        self._workers = [
+            threading.Thread(target=self._run, name=f"bot-worker-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, update: Dict, timeout: Optional[float] = None) -> bool:
+        """
+        ส่งอัพเดทเข้าคิว (รอถ้าคิวรวมเต็ม) - คืน False ถ้าหมดเวลา timeout หรือกำลังปิด
+        แชทที่ค้างเกิน max_pending_per_chat: ทิ้งอัพเดททันทีแล้วคืน True (รับไปแล้ว ไม่ต้องดึงซ้ำ)
+        """
+        chat_id = update_chat_id(update)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if not self._stopping and len(self._chats.get(chat_id, ())) >= self.max_pending_per_chat:
+                self._stats["dropped"] += 1
+                print(f"⚠️ ทิ้งอัพเดท {update.get('update_id')} ของแชท {chat_id}: ค้างครบ {self.max_pending_per_chat} รายการ")
+                return True
+            while not self._stopping and self._pending >= self.max_pending:
+                self._stats["backpressure_waits"] += 1
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            if self._stopping:
+                return False
+
+            self._chats.setdefault(chat_id, deque()).append((time.monotonic(), update))
+            self._pending += 1
+            self._stats["submitted"] += 1
+            if chat_id not in self._active and chat_id not in self._ready:
+                self._ready.append(chat_id)
+            self._cond.notify_all()
+            return True
+
+    def _next(self):
+        """รอแชทที่พร้อม แล้วคืน (chat_id, enqueued_at, update) - None เมื่อปิดและคิวว่าง"""
+        with self._cond:
+            while not self._ready:
+                if self._stopping and self._pending == 0:
+                    return None
+                self._cond.wait()
+            chat_id = self._ready.popleft()
+            self._active.add(chat_id)
+            enqueued_at, update = self._chats[chat_id].popleft()
+            return chat_id, enqueued_at, update
+
+    def _done(self, chat_id, enqueued_at: float, failed: bool):
+        latency = time.monotonic() - enqueued_at
+        with self._cond:
+            self._pending -= 1
+            self._active.discard(chat_id)
+            if self._chats[chat_id]:
+                # ยังมีอัพเดทของแชทนี้ - ต่อท้ายคิว ให้แชทอื่นได้ทำก่อน
+                self._ready.append(chat_id)
+            else:
+                del self._chats[chat_id]
+            self._latencies.append(latency)
+            self._stats["completed"] += 1
+            self._stats["max_latency"] = max(self._stats["max_latency"], latency)
+            if failed:
+                self._stats["errors"] += 1
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            chat_id, enqueued_at, update = item
+            failed = False
+            try:
+                self.handler(update)
+            except Exception as e:
+                failed = True
+                print(f"ข้อผิดพลาดในการประมวลผลอัพเดท {update.get('update_id')}: {e}")
+            finally:
+                self._done(chat_id, enqueued_at, failed)
+
+    def stats(self) -> Dict:
+        with self._cond:
+            samples = sorted(self._latencies)
+            stats = dict(self._stats)
+            stats.update({
+                "workers": self.workers,
+                "pending": self._pending,
+                "active_chats": len(self._active),
+                "queued_chats": len(self._chats),
+            })
+
+        def percentile(p: float) -> Optional[float]:
+            if not samples:
+                return None
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))], 4)
+
+        stats["latency_p50"] = percentile(0.50)
+        stats["latency_p95"] = percentile(0.95)
+        stats["max_latency"] = round(stats["max_latency"], 4)
+        return stats
+
+    def shutdown(self, wait: bool = True, timeout: Optional[float] = None):
+        """หยุดรับอัพเดทใหม่ ทำงานที่ค้างในคิวให้เสร็จ แล้วหยุด worker"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if wait:
+            for worker in self._workers:
+                worker.join(timeout)
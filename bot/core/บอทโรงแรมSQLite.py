@@ -3,31 +3,50 @@
 ระบบจัดการโรงแรมด้วย SQLite Database
 """
 import os
-import requests
 import threading
 import time
 import sqlite3
 import json
 from datetime import datetime, timedelta
 from database.models.db_access_v2 import (
+    AvailabilityService,
+    DashboardStats,
     EnhancedBookingEngine, 
     FinancialReporting, 
+    get_availability_cache,
     get_db_connection,
-    IDGenerator
+    IDGenerator,
+    DB_PATH
 )
+from database.models.storage_tuning import start_checkpoint_scheduler
+from database.backups.backup_system import DatabaseBackup
+
+try:
+    from bot.core.update_dispatcher import UpdateDispatcher
+    from bot.core.session_store import SessionStore
+    from bot.core.telegram_client import API_URL, POLL_TIMEOUT, OutboundQueue, TelegramClient, TelegramError, backoff_delay
+except ImportError:  # รันตรงจาก bot/core
+    from update_dispatcher import UpdateDispatcher
+    from session_store import SessionStore
+    from telegram_client import API_URL, POLL_TIMEOUT, OutboundQueue, TelegramClient, TelegramError, backoff_delay
 
 class ระบบจัดการโรงแรมSQLite:
     def __init__(self):
         self.token = os.getenv("TELEGRAM_BOT_TOKEN", "YOUR_BOT_TOKEN_HERE")
-        self.base_url = f"https://api.telegram.org/bot{self.token}"
+        self.base_url = f"{API_URL}/bot{self.token}"
+        # Session เดียวใช้การเชื่อมต่อซ้ำ + คิวส่งข้อความที่คุม rate limit
+        self.telegram = TelegramClient(self.token)
+        self.outbox = OutboundQueue(self.telegram)
         self.offset = 0
         self.running = False
         
         # SQLite Database
         self.db_path = "database/data/โรงแรม.db"
         
-        # User sessions for form input
-        self.user_sessions = {}
+        # User sessions for form input (หมดอายุ/จำกัดจำนวน และบันทึกลงฐานข้อมูล - ทำต่อได้หลังรีสตาร์ท)
+        self.user_sessions = SessionStore()
+        # สำรองข้อมูลทีละงานใน thread เบื้องหลัง
+        self.backup_lock = threading.Lock()
         
     def สร้างฐานข้อมูล(self):
         """ตรวจสอบความพร้อมของฐานข้อมูล (ใช้ upgrade_to_erp_v2.py แทน)"""
@@ -75,15 +94,8 @@ class ระบบจัดการโรงแรมSQLite:
         print("✅ เพิ่มข้อมูลตัวอย่างเรียบร้อย")
     
     def ส่งข้อความ(self, chat_id, ข้อความ, แป้นพิมพ์=None):
-        """ส่งข้อความ"""
-        payload = {"chat_id": chat_id, "text": ข้อความ, "parse_mode": "HTML"}
-        if แป้นพิมพ์:
-            payload["reply_markup"] = แป้นพิมพ์
-        try:
-            response = requests.post(f"{self.base_url}/sendMessage", json=payload, timeout=10)
-            return response.json().get("ok", False)
-        except:
-            return False
+        """ส่งข้อความ (เข้าคิว outbox - sender เบื้องหลังส่งตาม rate limit และ retry เมื่อผิดพลาด)"""
+        return self.outbox.send(chat_id, ข้อความ, แป้นพิมพ์)
     
     def เมนูหลัก(self):
         """เมนูหลัก - ปรับปรุงใหม่สำหรับ ERP"""
@@ -106,26 +118,12 @@ class ระบบจัดการโรงแรมSQLite:
     
     def แสดงแดชบอร์ด(self, chat_id):
         """แสดงแดชบอร์ด"""
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            
-            # สถิติห้องพัก
-            cursor.execute("SELECT COUNT(*) FROM ห้องพัก")
-            จำนวนห้องทั้งหมด = cursor.fetchone()[0] or 1
-            
-            cursor.execute("SELECT COUNT(*) FROM ห้องพัก WHERE สถานะ = 'มีผู้เข้าพัก'")
-            ห้องมีผู้เข้าพัก = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT COUNT(*) FROM ห้องพัก WHERE สถานะ = 'ว่าง'")
-            ห้องว่าง = cursor.fetchone()[0]
-            
-            # สถิติผู้เข้าพัก (ใช้ Data_Bookings แทน)
-            cursor.execute("SELECT COUNT(*) FROM Data_Bookings WHERE status IN ('Confirmed', 'Checked-in')")
-            จำนวนผู้เข้าพัก = cursor.fetchone()[0]
-            
-            # สถิติรายการบัญชี
-            cursor.execute("SELECT COUNT(*) FROM Data_Journal")
-            จำนวนรายการบัญชี = cursor.fetchone()[0]
+        สถิติ = DashboardStats.get()
+        จำนวนห้องทั้งหมด = สถิติ["rooms"]["total"] or 1
+        ห้องมีผู้เข้าพัก = สถิติ["rooms"]["occupied"]
+        ห้องว่าง = สถิติ["rooms"]["vacant"]
+        จำนวนผู้เข้าพัก = สถิติ["bookings"]["active"]
+        จำนวนรายการบัญชี = สถิติ["journal_count"]
         
         แดชบอร์ด = f"""🏨 <b>แดชบอร์ดระบบจัดการโรงแรม (SQLite)</b>
 
@@ -340,12 +338,16 @@ class ระบบจัดการโรงแรมSQLite:
                 session["data"]["อีเมล"] = None
             session["step"] = "room"
             
-            # แสดงห้องว่าง
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute("SELECT เลขห้อง, ประเภท, ราคา FROM ห้องพัก WHERE สถานะ = 'ว่าง' ORDER BY เลขห้อง")
-            available_rooms = cursor.fetchall()
-            conn.close()
+            # แสดงห้องว่าง (สถานะว่างและไม่มีการจองทับคืนนี้)
+            วันนี้ = datetime.now().date()
+            available_rooms = [
+                (r['room_number'], r['room_type'], r['nightly_price'])
+                for r in AvailabilityService.search(
+                    วันนี้.strftime("%Y-%m-%d"),
+                    (วันนี้ + timedelta(days=1)).strftime("%Y-%m-%d"),
+                    room_status='ว่าง'
+                )
+            ]
             
             if available_rooms:
                 room_text = "🏠 <b>ขั้นตอนที่ 4/5:</b> เลือกห้องพัก\n\n📋 <b>ห้องว่าง:</b>\n"
@@ -382,7 +384,6 @@ class ระบบจัดการโรงแรมSQLite:
                 session["data"]["จำนวนวัน"] = days
                 
                 # คำนวณวันที่
-                from datetime import datetime, timedelta
                 checkin = datetime.now().date()
                 checkout = checkin + timedelta(days=days)
                 
@@ -523,8 +524,10 @@ class ระบบจัดการโรงแรมSQLite:
         data = callback_query["data"]
         
         # ตอบกลับ callback query
-        callback_url = f"{self.base_url}/answerCallbackQuery"
-        requests.post(callback_url, json={"callback_query_id": callback_query["id"]})
+        try:
+            self.telegram.call("answerCallbackQuery", {"callback_query_id": callback_query["id"]}, retries=1)
+        except TelegramError as e:
+            print(f"⚠️ ตอบ callback ไม่สำเร็จ: {e}")
         
         if data == "dashboard":
             self.แสดงแดชบอร์ด(chat_id)
@@ -546,27 +549,41 @@ class ระบบจัดการโรงแรมSQLite:
             self.ส่งข้อความ(chat_id, "🔧 ฟีเจอร์นี้กำลังพัฒนา...", self.เมนูหลัก())
     
     def สำรองข้อมูล(self, chat_id):
-        """สำรองข้อมูล"""
+        """สำรองข้อมูลใน thread เบื้องหลัง - บอทตอบแชทอื่น (และแชทนี้) ได้ตามปกติระหว่างนั้น"""
+        if not self.backup_lock.acquire(blocking=False):
+            self.ส่งข้อความ(chat_id, "⏳ กำลังสำรองข้อมูลอยู่แล้ว กรุณารอสักครู่", self.เมนูหลัก())
+            return
         self.ส่งข้อความ(chat_id, "🔄 กำลังสำรองข้อมูล...")
-        
+        threading.Thread(target=self.สำรองข้อมูลเบื้องหลัง, args=(chat_id,), name="bot-backup", daemon=True).start()
+
+    def สำรองข้อมูลเบื้องหลัง(self, chat_id):
+        reported = set()
+
+        def progress(stage, done, total):
+            # แจ้งทุก 25% ของขั้น snapshot (ข้อความที่ค้างในคิวถูกรวมกันโดย outbox)
+            step = done * 4 // total if total else 0
+            if stage == "snapshot" and 0 < step < 4 and step not in reported:
+                reported.add(step)
+                self.ส่งข้อความ(chat_id, f"⏳ สำรองข้อมูล {step * 25}% ({done}/{total} หน้า)")
+
         try:
-            import sys
-            sys.path.append('src')
-            from backup_system import DatabaseBackup
-            
-            backup = DatabaseBackup()
-            backup_file = backup.create_backup()
+            backup = DatabaseBackup(DB_PATH)
+            backup_file = backup.create_backup(progress=progress)
+            stats = backup.last_stats
             
             msg = f"""✅ <b>สำรองข้อมูลสำเร็จ!</b>
             
 📁 <b>ไฟล์:</b> {os.path.basename(backup_file)}
 📊 <b>ขนาด:</b> {os.path.getsize(backup_file)/1024:.1f} KB
+⚡ <b>ใช้เวลา:</b> {stats['seconds']:.2f} วินาที ({stats['mb_per_second']} MB/s)
 ⏰ <b>เวลา:</b> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"""
             
             self.ส่งข้อความ(chat_id, msg, self.เมนูหลัก())
             
         except Exception as e:
             self.ส่งข้อความ(chat_id, f"❌ <b>สำรองข้อมูลไม่สำเร็จ:</b> {str(e)}", self.เมนูหลัก())
+        finally:
+            self.backup_lock.release()
     
     def แสดงWebInterface(self, chat_id):
         """แสดงข้อมูล Web Interface"""
@@ -606,39 +623,75 @@ class ระบบจัดการโรงแรมSQLite:
     def รับอัพเดท(self):
         """รับอัพเดท"""
         try:
-            url = f"{self.base_url}/getUpdates"
-            params = {"offset": self.offset, "timeout": 30}
-            response = requests.get(url, params=params, timeout=35)
-            if response.status_code == 200:
-                return response.json()
-        except:
+            params = {"offset": self.offset, "timeout": POLL_TIMEOUT}
+            result = self.telegram.call("getUpdates", params, timeout=POLL_TIMEOUT + 5, retries=0, http_method="GET")
+            return {"ok": True, "result": result}
+        except TelegramError:
             pass
         return None
     
+    def จัดการอัพเดท(self, update):
+        """ประมวลผลอัพเดทหนึ่งรายการ (เรียกจาก worker ของ UpdateDispatcher - แชทเดียวกันทีละรายการ)"""
+        # จัดการข้อความ
+        if "message" in update:
+            self.ประมวลผลข้อความ(update["message"])
+        
+        # จัดการ callback query
+        elif "callback_query" in update:
+            self.จัดการCallback(update["callback_query"])
+
     def เริ่มทำงาน(self):
         """เริ่มทำงาน"""
         self.running = True
-        print("🤖 ระบบจัดการโรงแรม SQLite เริ่มทำงาน...")
+        self.dispatcher = UpdateDispatcher(self.จัดการอัพเดท)
+        print(f"🤖 ระบบจัดการโรงแรม SQLite เริ่มทำงาน... ({self.dispatcher.workers} workers)")
         
-        while self.running:
-            try:
-                updates = self.รับอัพเดท()
-                if updates and updates.get("ok"):
-                    for update in updates.get("result", []):
-                        self.offset = update["update_id"] + 1
-                        
-                        # จัดการข้อความ
-                        if "message" in update:
-                            self.ประมวลผลข้อความ(update["message"])
-                        
-                        # จัดการ callback query
-                        elif "callback_query" in update:
-                            self.จัดการCallback(update["callback_query"])
-                            
-            except Exception as e:
-                print(f"ข้อผิดพลาด: {e}")
-                time.sleep(5)
+        failures = 0
+        try:
+            while self.running:
+                try:
+                    updates = self.รับอัพเดท()
+                    if updates is None:
+                        # getUpdates ล้มเหลว - รอแบบ backoff แทนการยิงซ้ำทันที
+                        failures += 1
+                        time.sleep(backoff_delay(failures, 1.0, 30.0))
+                        continue
+                    failures = 0
+                    if updates.get("ok"):
+                        for update in updates.get("result", []):
+                            # รอถ้าคิวรวมเต็ม (backpressure) - offset ขยับเฉพาะอัพเดทที่รับแล้ว (รวมที่ถูกทิ้งเพราะแชทค้างเกิน)
+                            if not self.dispatcher.submit(update):
+                                break
+                            self.offset = update["update_id"] + 1
+                                
+                except Exception as e:
+                    print(f"ข้อผิดพลาด: {e}")
+                    failures += 1
+                    time.sleep(backoff_delay(failures, 1.0, 30.0))
+        finally:
+            self.dispatcher.shutdown()
+            self.user_sessions.close()
+            self.outbox.stop()
+            self.telegram.close()
+            print(f"📈 สถิติการประมวลผลอัพเดท: {self.dispatcher.stats()}")
+            print(f"📤 สถิติการส่งข้อความ: {self.outbox.stats()}")
+
+    def หยุดทำงาน(self):
+        self.running = False
+        if getattr(self, "async_runner", None):
+            self.async_runner.stop()
 
 if __name__ == "__main__":
+    import sys
+    start_checkpoint_scheduler(DB_PATH)
+    if get_availability_cache():
+        get_availability_cache().warm()
     บอท = ระบบจัดการโรงแรมSQLite()
-    บอท.เริ่มทำงาน()
+    if "--async" in sys.argv[1:] or os.environ.get("BOT_ASYNC") == "1":
+        try:
+            from bot.core.async_runner import run_async
+        except ImportError:  # รันตรงจาก bot/core
+            from async_runner import run_async
+        run_async(บอท)
+    else:
+        บอท.เริ่มทำงาน()
@@ -1,73 +1,173 @@
 #!/usr/bin/env python3
 """
 ระบบสำรองข้อมูล - Database Backup System
+สำรองแบบ online ด้วย SQLite backup API: คัดลอกทีละช่วงหน้า (page) แล้วพักสั้นๆ - ผู้เขียนไม่ถูกบล็อก
+และได้ snapshot ที่สอดคล้องกันเสมอ (ต่างจากการคัดลอกไฟล์ที่อาจได้ไฟล์ครึ่งๆ กลางๆ ระหว่างมีการเขียน)
 """
 import sqlite3
 import json
 import os
-import shutil
+import tempfile
+import time
+from contextlib import contextmanager
 from datetime import datetime
 import zipfile
 
+BACKUP_DIR = os.environ.get('BACKUP_DIR', os.path.dirname(os.path.abspath(__file__)))
+# จำนวนหน้าที่คัดลอกต่อรอบ และเวลาพักระหว่างรอบ (ให้ transaction อื่นได้ทำงาน)
+BACKUP_PAGES_PER_STEP = int(os.environ.get('BACKUP_PAGES_PER_STEP', 256))
+BACKUP_STEP_SLEEP = float(os.environ.get('BACKUP_STEP_SLEEP', 0.005))
+BACKUP_COMPRESSLEVEL = int(os.environ.get('BACKUP_COMPRESSLEVEL', 6))
+STREAM_CHUNK = 1024 * 1024
+
+
+def print_progress(stage, done, total):
+    """progress callback เริ่มต้น: พิมพ์ทุก ~10%"""
+    if total and (done == total or done * 10 // total != (done - 1) * 10 // total):
+        print(f"  ⏳ {stage}: {done}/{total} ({done * 100 // total}%)")
+
+
 class DatabaseBackup:
-    def __init__(self, db_path="database/data/โรงแรม.db"):
+    def __init__(self, db_path="database/data/โรงแรม.db", backup_dir=BACKUP_DIR):
         self.db_path = db_path
-        self.backup_dir = "database/backups"
+        self.backup_dir = backup_dir
+        self.last_stats = None
         self.ensure_backup_dir()
-    
+
     def ensure_backup_dir(self):
         """สร้างโฟลเดอร์สำรอง"""
         if not os.path.exists(self.backup_dir):
             os.makedirs(self.backup_dir)
     
-    def create_backup(self):
-        """สร้างไฟล์สำรอง"""
+    def snapshot(self, dest: sqlite3.Connection, pages=BACKUP_PAGES_PER_STEP, step_sleep=BACKUP_STEP_SLEEP, progress=None):
+        """
+        คัดลอกฐานข้อมูลที่กำลังใช้งานลง dest ด้วย Connection.backup ทีละ pages หน้า
+        พักระหว่างรอบเพื่อไม่แย่ง I/O กับงานอื่น - คืนจำนวนหน้าทั้งหมด
+        """
+        total_pages = [0]
+
+        def on_step(status, remaining, total):
+            total_pages[0] = total
+            if progress:
+                progress("snapshot", total - remaining, total)
+            if remaining and step_sleep:
+                time.sleep(step_sleep)
+
+        src = sqlite3.connect(self.db_path, isolation_level=None)
+        try:
+            # เปิด read transaction ค้างไว้ทั้งรอบ: ทุก step อ่านจาก snapshot เดียวกัน (WAL - ผู้เขียนยัง commit ได้ตามปกติ)
+            # ไม่งั้น SQLite เริ่มคัดลอกใหม่ทุกครั้งที่มี commit ระหว่าง step และไม่มีวันเสร็จถ้าเขียนถี่
+            src.execute("BEGIN")
+            src.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            src.backup(dest, pages=pages, progress=on_step)
+        finally:
+            src.close()
+        return total_pages[0]
+
+    @contextmanager
+    def open_snapshot(self, pages=BACKUP_PAGES_PER_STEP, step_sleep=BACKUP_STEP_SLEEP, progress=None):
+        """
+        snapshot ที่สอดคล้องกัน → (connection ของ snapshot, ไฟล์ image สำหรับอ่านแบบ binary, ขนาด, จำนวนหน้า)
+        snapshot อยู่ในไฟล์ชั่วคราวใน backup_dir (ลบเมื่อจบ) แล้วอ่านเป็น stream - หน่วยความจำคงที่ไม่ขึ้นกับขนาดฐานข้อมูล
+        """
+        fd, temp_path = tempfile.mkstemp(prefix=".snapshot_", suffix=".db", dir=self.backup_dir)
+        os.close(fd)
+        dest = sqlite3.connect(temp_path)
+        try:
+            page_count = self.snapshot(dest, pages, step_sleep, progress)
+            size = os.path.getsize(temp_path)
+            with open(temp_path, 'rb') as image:
+                yield dest, image, size, page_count
+        finally:
+            dest.close()
+            for path in (temp_path, temp_path + "-wal", temp_path + "-shm"):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def create_backup(self, json_dump=True, pages=BACKUP_PAGES_PER_STEP, step_sleep=BACKUP_STEP_SLEEP, progress=print_progress):
+        """
+        สร้างไฟล์สำรอง backup_<เวลา>.zip = database_<เวลา>.db (+ data_<เวลา>.json จาก snapshot เดียวกัน)
+        เขียนลง ZIP แบบ stream (ดู open_snapshot) - สถิติ (จำนวนหน้า, ขนาด, เวลา, MB/s) อยู่ใน self.last_stats
+        """
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
-        # สำรองไฟล์ database
-        db_backup = os.path.join(self.backup_dir, f"database_{timestamp}.db")
-        shutil.copy2(self.db_path, db_backup)
-        
-        # สำรองเป็น JSON
-        json_backup = os.path.join(self.backup_dir, f"data_{timestamp}.json")
-        self.export_to_json(json_backup)
-        
-        # สร้าง ZIP
         zip_backup = os.path.join(self.backup_dir, f"backup_{timestamp}.zip")
-        with zipfile.ZipFile(zip_backup, 'w') as zipf:
-            zipf.write(db_backup, f"database_{timestamp}.db")
-            zipf.write(json_backup, f"data_{timestamp}.json")
-        
-        # ลบไฟล์ชั่วคราว
-        os.remove(db_backup)
-        os.remove(json_backup)
-        
-        print(f"✅ สำรองข้อมูลแล้ว: {zip_backup}")
+        partial = zip_backup + ".part"
+        started = time.monotonic()
+        try:
+            with self.open_snapshot(pages, step_sleep, progress) as (dest, image, size, page_count):
+                snapshot_seconds = time.monotonic() - started
+                with zipfile.ZipFile(partial, 'w', zipfile.ZIP_DEFLATED, compresslevel=BACKUP_COMPRESSLEVEL) as zipf:
+                    # สำรองไฟล์ database
+                    with zipf.open(f"database_{timestamp}.db", 'w', force_zip64=True) as out:
+                        db_bytes = self.stream_file(image, size, out, progress)
+                    # สำรองเป็น JSON
+                    if json_dump:
+                        with zipf.open(f"data_{timestamp}.json", 'w', force_zip64=True) as out:
+                            self.write_json(dest, out)
+            os.replace(partial, zip_backup)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+
+        seconds = time.monotonic() - started
+        self.last_stats = {
+            "file": zip_backup,
+            "pages": page_count,
+            "db_bytes": db_bytes,
+            "zip_bytes": os.path.getsize(zip_backup),
+            "snapshot_seconds": round(snapshot_seconds, 3),
+            "seconds": round(seconds, 3),
+            "mb_per_second": round(db_bytes / 1024 / 1024 / seconds, 2) if seconds else None,
+        }
+        print(f"✅ สำรองข้อมูลแล้ว: {zip_backup} ({db_bytes / 1024:.1f} KB ใน {seconds:.2f} วินาที, "
+              f"{self.last_stats['mb_per_second']} MB/s)")
         return zip_backup
-    
-    def export_to_json(self, json_path):
-        """ส่งออกข้อมูลเป็น JSON"""
-        conn = sqlite3.connect(self.db_path)
+
+    @staticmethod
+    def stream_file(f, size, out, progress=None):
+        written = 0
+        while True:
+            chunk = f.read(STREAM_CHUNK)
+            if not chunk:
+                return written
+            out.write(chunk)
+            written += len(chunk)
+            if progress:
+                progress("zip", written, size)
+
+    @staticmethod
+    def write_json(conn, out):
+        """ส่งออกทุกตารางเป็น JSON ทีละแถว ({"ตาราง": [แถว, ...]}) - ไม่สร้างทั้งก้อนในหน่วยความจำ"""
         conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        data = {}
-        
-        # ดึงรายชื่อตาราง
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tables = [row[0] for row in cursor.fetchall()]
-        
-        for table in tables:
-            if table != 'sqlite_sequence':
-                cursor.execute(f"SELECT * FROM {table}")
-                rows = cursor.fetchall()
-                data[table] = [dict(row) for row in rows]
-        
-        conn.close()
-        
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2, default=str)
-    
+        tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name != 'sqlite_sequence'")]
+        buffer = ["{"]
+        size = 0
+        for i, table in enumerate(tables):
+            buffer.append(f'{", " if i else ""}{json.dumps(table, ensure_ascii=False)}: [')
+            quoted = table.replace('"', '""')
+            for j, row in enumerate(conn.execute(f'SELECT * FROM "{quoted}"')):
+                part = (", " if j else "") + json.dumps(dict(row), ensure_ascii=False, default=str)
+                buffer.append(part)
+                size += len(part)
+                if size >= STREAM_CHUNK:
+                    out.write("".join(buffer).encode('utf-8'))
+                    buffer.clear()
+                    size = 0
+            buffer.append("]")
+        buffer.append("}")
+        out.write("".join(buffer).encode('utf-8'))
+
+    def export_to_json(self, json_path):
+        """ส่งออกข้อมูลเป็น JSON (อ่านจาก snapshot ที่สอดคล้องกัน ไม่ใช่ไฟล์ที่กำลังถูกเขียน)"""
+        dest = sqlite3.connect(":memory:")
+        try:
+            self.snapshot(dest)
+            with open(json_path, 'wb') as f:
+                self.write_json(dest, f)
+        finally:
+            dest.close()
+
     def list_backups(self):
         """แสดงรายการไฟล์สำรอง"""
         backups = []
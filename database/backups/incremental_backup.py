@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+ระบบสำรองข้อมูลแบบ incremental - Content-addressed Snapshot Store
+snapshot (จาก SQLite backup API) ถูกแบ่งเป็นชิ้นขนาดคงที่ตามขอบหน้า แต่ละชิ้นเก็บครั้งเดียวตาม hash ของเนื้อหา
+snapshot ใหม่เขียนเฉพาะชิ้นที่เปลี่ยน + manifest (รายการ hash) - สำรองทุกชั่วโมงได้โดยใช้ดิสก์และ I/O น้อย
+
+    python3 database/backups/incremental_backup.py snapshot [--prune]
+    python3 database/backups/incremental_backup.py list
+    python3 database/backups/incremental_backup.py verify [snapshot_id] [--quick]
+    python3 database/backups/incremental_backup.py restore <snapshot_id> <ไฟล์ปลายทาง>
+    python3 database/backups/incremental_backup.py prune [--keep N] [--keep-daily D]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+import zlib
+from datetime import datetime
+from typing import Dict, List, Optional
+
+try:
+    from database.backups.backup_system import BACKUP_COMPRESSLEVEL, BACKUP_DIR, DatabaseBackup, print_progress
+except ImportError:  # รันตรงจาก database/backups
+    from backup_system import BACKUP_COMPRESSLEVEL, BACKUP_DIR, DatabaseBackup, print_progress
+
+INCREMENTAL_DIR = os.environ.get('BACKUP_INCREMENTAL_DIR', os.path.join(BACKUP_DIR, 'incremental'))
+# ขนาดชิ้น (ปัดเป็นจำนวนเท่าของ page_size) - เล็ก = ใช้ซ้ำได้มากขึ้นแต่ไฟล์ชิ้นมากขึ้น
+BACKUP_CHUNK_SIZE = int(os.environ.get('BACKUP_CHUNK_SIZE', 64 * 1024))
+# เก็บ snapshot ล่าสุด N ชุด + ชุดสุดท้ายของแต่ละวันย้อนหลัง D วัน
+BACKUP_KEEP_SNAPSHOTS = int(os.environ.get('BACKUP_KEEP_SNAPSHOTS', 48))
+BACKUP_KEEP_DAILY = int(os.environ.get('BACKUP_KEEP_DAILY', 14))
+# ชิ้นที่ไม่มี manifest อ้างถึงแต่ใหม่กว่านี้ (วินาที) ไม่ถูกลบ - อาจเป็นของ snapshot ที่กำลังสร้าง
+GC_GRACE_SECONDS = float(os.environ.get('BACKUP_GC_GRACE_SECONDS', 3600))
+
+
+def chunk_hash(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=32).hexdigest()
+
+
+class IncrementalBackup:
+    """
+    ที่เก็บ: <store_dir>/chunks/<2 ตัวแรก>/<hash> (zlib) และ <store_dir>/snapshots/<id>.json (manifest)
+    - ชิ้นถูกเขียนแบบ atomic (ไฟล์ชั่วคราว + fsync + rename) ก่อน manifest - manifest ที่มีอยู่อ้างถึงชิ้นที่ครบเสมอ
+    - ชิ้นที่มีอยู่แล้วถูก touch แทนการเขียนใหม่ (gc ใช้ mtime กันลบชิ้นของ snapshot ที่กำลังสร้าง)
+    """
+
+    def __init__(self, db_path="database/data/โรงแรม.db", store_dir=INCREMENTAL_DIR, chunk_size=BACKUP_CHUNK_SIZE):
+        self.db_path = db_path
+        self.store_dir = store_dir
+        self.chunk_size = chunk_size
+        self.chunks_dir = os.path.join(store_dir, 'chunks')
+        self.snapshots_dir = os.path.join(store_dir, 'snapshots')
+        os.makedirs(self.chunks_dir, exist_ok=True)
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+
+    def chunk_path(self, digest: str) -> str:
+        return os.path.join(self.chunks_dir, digest[:2], digest)
+
+    def read_chunk(self, digest: str, check: bool = True) -> bytes:
+        with open(self.chunk_path(digest), 'rb') as f:
+            try:
+                data = zlib.decompress(f.read())
+            except zlib.error as e:
+                raise ValueError(f"ชิ้น {digest[:12]} เสียหาย ({e})") from None
+        if check and chunk_hash(data) != digest:
+            raise ValueError(f"ชิ้น {digest[:12]} เสียหาย (hash ไม่ตรง)")
+        return data
+
+    def write_chunk(self, digest: str, data: bytes) -> int:
+        """เขียนชิ้นใหม่ (คืนจำนวนไบต์ที่เก็บ) หรือ touch ชิ้นที่มีอยู่แล้ว (คืน 0)"""
+        path = self.chunk_path(digest)
+        try:
+            os.utime(path)
+            return 0
+        except FileNotFoundError:
+            pass
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        stored = zlib.compress(data, BACKUP_COMPRESSLEVEL)
+        temp = f"{path}.{os.getpid()}.tmp"
+        with open(temp, 'wb') as f:
+            f.write(stored)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, path)
+        return len(stored)
+
+    def create_snapshot(self, progress=print_progress) -> Dict:
+        """snapshot ใหม่: เก็บเฉพาะชิ้นที่ยังไม่มีในที่เก็บ แล้วเขียน manifest - คืน manifest (พร้อม stats)"""
+        started = time.monotonic()
+        snapshot_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        suffix = 1
+        while os.path.exists(self.manifest_path(snapshot_id)):
+            suffix += 1
+            snapshot_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{suffix}"
+
+        source = DatabaseBackup(self.db_path, backup_dir=self.store_dir)
+        chunks: List[str] = []
+        whole = hashlib.blake2b(digest_size=32)
+        new_chunks = new_bytes = 0
+        with source.open_snapshot(progress=progress) as (dest, image, size, page_count):
+            page_size = dest.execute("PRAGMA page_size").fetchone()[0]
+            chunk_size = max(page_size, self.chunk_size // page_size * page_size)
+            done = 0
+            while True:
+                data = image.read(chunk_size)
+                if not data:
+                    break
+                digest = chunk_hash(data)
+                stored = self.write_chunk(digest, data)
+                if stored:
+                    new_chunks += 1
+                    new_bytes += stored
+                chunks.append(digest)
+                whole.update(data)
+                done += len(data)
+                if progress:
+                    progress("chunks", done, size)
+
+        seconds = time.monotonic() - started
+        manifest = {
+            "id": snapshot_id,
+            "created": datetime.now().isoformat(timespec='seconds'),
+            "db_path": os.path.abspath(self.db_path),
+            "db_size": size,
+            "page_size": page_size,
+            "page_count": page_count,
+            "chunk_size": chunk_size,
+            "hash": whole.hexdigest(),
+            "chunks": chunks,
+            "stats": {
+                "chunks": len(chunks),
+                "new_chunks": new_chunks,
+                "new_bytes": new_bytes,
+                "seconds": round(seconds, 3),
+                "mb_per_second": round(size / 1024 / 1024 / seconds, 2) if seconds else None,
+            },
+        }
+        path = self.manifest_path(snapshot_id)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+        print(f"✅ snapshot {snapshot_id}: {len(chunks)} ชิ้น, ใหม่ {new_chunks} ชิ้น ({new_bytes / 1024:.1f} KB) "
+              f"จาก {size / 1024:.1f} KB ใน {seconds:.2f} วินาที")
+        return manifest
+
+    def manifest_path(self, snapshot_id: str) -> str:
+        return os.path.join(self.snapshots_dir, f"{snapshot_id}.json")
+
+    def load_manifest(self, snapshot_id: str) -> Dict:
+        try:
+            with open(self.manifest_path(snapshot_id), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise ValueError(f"ไม่พบ snapshot {snapshot_id}") from None
+
+    def list_snapshots(self) -> List[Dict]:
+        """manifest ทุกชุด เรียงจากเก่าไปใหม่"""
+        manifests = []
+        for name in sorted(os.listdir(self.snapshots_dir)):
+            if name.endswith('.json'):
+                manifests.append(self.load_manifest(name[:-len('.json')]))
+        manifests.sort(key=lambda m: (m["created"], m["id"]))
+        return manifests
+
+    def restore(self, snapshot_id: str, dest_path: str, overwrite: bool = False) -> Dict:
+        """
+        ประกอบไฟล์ฐานข้อมูลของ snapshot ที่ dest_path (ตรวจ hash ทุกชิ้นและทั้งไฟล์ + integrity_check ก่อน rename)
+        ไม่เขียนทับไฟล์ที่มีอยู่ถ้าไม่ระบุ overwrite - อย่ากู้คืนทับฐานข้อมูลที่ Bot/Web กำลังเปิดอยู่
+        """
+        manifest = self.load_manifest(snapshot_id)
+        if os.path.exists(dest_path) and not overwrite:
+            raise FileExistsError(f"มีไฟล์ {dest_path} อยู่แล้ว")
+        partial = dest_path + '.part'
+        whole = hashlib.blake2b(digest_size=32)
+        try:
+            with open(partial, 'wb') as f:
+                for digest in manifest["chunks"]:
+                    data = self.read_chunk(digest)
+                    whole.update(data)
+                    f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            if whole.hexdigest() != manifest["hash"]:
+                raise ValueError("hash ของไฟล์ที่ประกอบแล้วไม่ตรงกับ manifest")
+            check = sqlite3.connect(partial)
+            try:
+                result = check.execute("PRAGMA integrity_check").fetchone()[0]
+            finally:
+                check.close()
+            if result != 'ok':
+                raise ValueError(f"integrity_check: {result}")
+            for ext in ('-wal', '-shm'):
+                if os.path.exists(dest_path + ext):
+                    os.remove(dest_path + ext)
+            os.replace(partial, dest_path)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        print(f"✅ กู้คืน snapshot {snapshot_id} ไปที่ {dest_path} ({manifest['db_size'] / 1024:.1f} KB)")
+        return manifest
+
+    def verify(self, snapshot_id: Optional[str] = None, deep: bool = True) -> Dict:
+        """
+        ตรวจว่าทุก snapshot (หรือชุดที่ระบุ) กู้คืนได้: มีชิ้นครบ และ (deep) เนื้อหาแต่ละชิ้นตรงกับ hash
+        ชิ้นที่ใช้ร่วมกันหลาย snapshot ถูกอ่านครั้งเดียว
+        """
+        manifests = [self.load_manifest(snapshot_id)] if snapshot_id else self.list_snapshots()
+        checked: Dict[str, Optional[str]] = {}
+        report = {"snapshots": len(manifests), "chunks": 0, "missing": [], "corrupt": [], "broken_snapshots": []}
+        for manifest in manifests:
+            broken = False
+            for digest in manifest["chunks"]:
+                if digest not in checked:
+                    problem = None
+                    if not os.path.exists(self.chunk_path(digest)):
+                        problem = "missing"
+                    elif deep:
+                        try:
+                            self.read_chunk(digest)
+                        except ValueError:
+                            problem = "corrupt"
+                    checked[digest] = problem
+                    if problem:
+                        report[problem].append(digest)
+                broken = broken or checked[digest] is not None
+            if broken:
+                report["broken_snapshots"].append(manifest["id"])
+        report["chunks"] = len(checked)
+        report["ok"] = not report["broken_snapshots"]
+        return report
+
+    def prune(self, keep_last: int = BACKUP_KEEP_SNAPSHOTS, keep_daily: int = BACKUP_KEEP_DAILY) -> Dict:
+        """ลบ manifest ที่เกินนโยบายการเก็บ (ล่าสุด keep_last ชุด + ชุดสุดท้ายของแต่ละวัน keep_daily วัน) แล้ว gc()"""
+        manifests = self.list_snapshots()
+        keep = {m["id"] for m in manifests[-keep_last:]} if keep_last > 0 else set()
+        days = []
+        for manifest in reversed(manifests):
+            day = manifest["created"][:10]
+            if day not in days:
+                days.append(day)
+                if len(days) <= keep_daily:
+                    keep.add(manifest["id"])
+        removed = []
+        for manifest in manifests:
+            if manifest["id"] not in keep:
+                os.remove(self.manifest_path(manifest["id"]))
+                removed.append(manifest["id"])
+                print(f"🗑️ ลบ snapshot เก่า: {manifest['id']}")
+        return {"removed_snapshots": removed, **self.gc()}
+
+    def gc(self, grace_seconds: float = GC_GRACE_SECONDS) -> Dict:
+        """ลบชิ้นที่ไม่มี manifest ใดอ้างถึง (และไฟล์ชั่วคราวที่ค้าง) ที่เก่ากว่า grace_seconds"""
+        referenced = set()
+        for manifest in self.list_snapshots():
+            referenced.update(manifest["chunks"])
+        cutoff = time.time() - grace_seconds
+        removed = freed = 0
+        for prefix in os.listdir(self.chunks_dir):
+            folder = os.path.join(self.chunks_dir, prefix)
+            for name in os.listdir(folder):
+                if name in referenced:
+                    continue
+                path = os.path.join(folder, name)
+                try:
+                    stat = os.stat(path)
+                    if stat.st_mtime >= cutoff:
+                        continue
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                removed += 1
+                freed += stat.st_size
+        if removed:
+            print(f"🗑️ ลบชิ้นที่ไม่ได้ใช้ {removed} ชิ้น ({freed / 1024:.1f} KB)")
+        return {"removed_chunks": removed, "freed_bytes": freed}
+
+    def stats(self) -> Dict:
+        manifests = self.list_snapshots()
+        stored = sum(os.path.getsize(os.path.join(root, name))
+                     for root, _, names in os.walk(self.chunks_dir) for name in names)
+        logical = sum(m["db_size"] for m in manifests)
+        return {"snapshots": len(manifests), "stored_bytes": stored, "logical_bytes": logical,
+                "ratio": round(logical / stored, 2) if stored else None}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="สำรองข้อมูลแบบ incremental (content-addressed)")
+    parser.add_argument('--db', default="database/data/โรงแรม.db")
+    parser.add_argument('--store', default=INCREMENTAL_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    snapshot = commands.add_parser('snapshot', help="สร้าง snapshot ใหม่")
+    snapshot.add_argument('--prune', action='store_true', help="ลบ snapshot เก่าตามนโยบายและ gc หลังสร้าง")
+    commands.add_parser('list', help="แสดงรายการ snapshot")
+    verify = commands.add_parser('verify', help="ตรวจว่า snapshot กู้คืนได้")
+    verify.add_argument('snapshot_id', nargs='?')
+    verify.add_argument('--quick', action='store_true', help="ตรวจแค่ว่ามีชิ้นครบ ไม่อ่านเนื้อหา")
+    restore = commands.add_parser('restore', help="กู้คืน snapshot เป็นไฟล์ฐานข้อมูล")
+    restore.add_argument('snapshot_id')
+    restore.add_argument('dest')
+    restore.add_argument('--overwrite', action='store_true')
+    prune = commands.add_parser('prune', help="ลบ snapshot เก่าและชิ้นที่ไม่ได้ใช้")
+    prune.add_argument('--keep', type=int, default=BACKUP_KEEP_SNAPSHOTS)
+    prune.add_argument('--keep-daily', type=int, default=BACKUP_KEEP_DAILY)
+    args = parser.parse_args(argv)
+
+    store = IncrementalBackup(args.db, args.store)
+    if args.command == 'snapshot':
+        store.create_snapshot()
+        if args.prune:
+            store.prune()
+    elif args.command == 'list':
+        for m in store.list_snapshots():
+            print(f"  {m['id']}  {m['db_size'] / 1024:8.1f} KB  ใหม่ {m['stats']['new_chunks']}/{m['stats']['chunks']} ชิ้น")
+        print(f"📦 {json.dumps(store.stats(), ensure_ascii=False)}")
+    elif args.command == 'verify':
+        report = store.verify(args.snapshot_id, deep=not args.quick)
+        print(f"{'✅' if report['ok'] else '❌'} ตรวจ {report['snapshots']} snapshot, {report['chunks']} ชิ้น: "
+              f"หาย {len(report['missing'])}, เสียหาย {len(report['corrupt'])}")
+        for snapshot_id in report["broken_snapshots"]:
+            print(f"  ❌ {snapshot_id}")
+        return 0 if report["ok"] else 1
+    elif args.command == 'restore':
+        store.restore(args.snapshot_id, args.dest, overwrite=args.overwrite)
+    elif args.command == 'prune':
+        store.prune(args.keep, args.keep_daily)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+VIPAT Hotel ERP - SQLite Connection Pool
+Pool การเชื่อมต่อแบบจำกัดจำนวน ใช้ร่วมกันระหว่าง Bot, Web และสคริปต์ (แยก Pool ตามไฟล์ฐานข้อมูล)
+"""
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+try:
+    from database.models.storage_tuning import STORAGE_PRAGMAS
+except ImportError:  # รันตรงจาก database/models
+    from storage_tuning import STORAGE_PRAGMAS
+
+DEFAULT_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+DEFAULT_ACQUIRE_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+HEALTH_CHECK_INTERVAL = 30.0
+
+# WAL, synchronous=NORMAL, busy_timeout, cache/mmap และ foreign_keys (ดู storage_tuning.py)
+DEFAULT_PRAGMAS = dict(STORAGE_PRAGMAS)
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3.Connection ที่ close() แล้วคืนเข้า Pool แทนการปิดจริง (โค้ดเดิมที่เรียก conn.close() ใช้ได้ทันที)"""
+
+    def close(self):
+        pool = getattr(self, '_pool', None)
+        if pool is None:
+            super().close()
+        else:
+            pool.release(self)
+
+    def close_physical(self):
+        super().close()
+
+
+class ConnectionPool:
+    """
+    Pool การเชื่อมต่อ SQLite แบบ thread-aware
+    - จำกัดจำนวน connection สูงสุด (max_size) ผู้ขอเกินจะรอจนถึง timeout
+    - พยายามคืน connection เดิมให้ thread เดิม (ลดการสลับ cache ของ SQLite)
+    - ตั้งค่า PRAGMA ครั้งเดียวตอนสร้าง และตรวจสุขภาพ connection ที่ว่างนานเกิน HEALTH_CHECK_INTERVAL
+    """
+
+    def __init__(self, db_path: str, max_size: int = DEFAULT_POOL_SIZE, timeout: float = DEFAULT_ACQUIRE_TIMEOUT, pragmas: Optional[Dict[str, str]] = None):
+        self.db_path = db_path
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self.pragmas = dict(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+        self._idle = []
+        self._open_count = 0
+        self._cond = threading.Condition(threading.Lock())
+        self._stats = {"hits": 0, "misses": 0, "waits": 0, "timeouts": 0, "discarded": 0}
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+
+    def _create(self) -> PooledConnection:
+        conn = sqlite3.connect(self.db_path, factory=PooledConnection, check_same_thread=False)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        conn._pool = self
+        conn._owner = None
+        conn._last_used = time.monotonic()
+        return conn
+
+    def _discard(self, conn: PooledConnection):
+        conn._pool = None
+        try:
+            conn.close_physical()
+        except sqlite3.Error:
+            pass
+
+    def acquire(self, row_factory=None) -> PooledConnection:
+        """ยืม connection จาก Pool (ต้องคืนด้วย release() หรือ conn.close())"""
+        thread_id = threading.get_ident()
+        deadline = time.monotonic() + self.timeout
+        conn = None
+        with self._cond:
+            while True:
+                if self._idle:
+                    # ใช้ connection ล่าสุดของ thread นี้ก่อนถ้ามี
+                    index = next((i for i in range(len(self._idle) - 1, -1, -1) if self._idle[i]._owner == thread_id), len(self._idle) - 1)
+                    conn = self._idle.pop(index)
+                    self._stats["hits"] += 1
+                    break
+                if self._open_count < self.max_size:
+                    self._open_count += 1
+                    self._stats["misses"] += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise sqlite3.OperationalError(f"connection pool exhausted ({self.max_size} in use)")
+                self._stats["waits"] += 1
+                self._cond.wait(remaining)
+
+        try:
+            if conn is None:
+                conn = self._create()
+            elif time.monotonic() - conn._last_used > HEALTH_CHECK_INTERVAL:
+                conn = self._health_check(conn)
+        except Exception:
+            with self._cond:
+                self._open_count -= 1
+                self._cond.notify()
+            raise
+
+        conn._owner = thread_id
+        conn._in_use = True
+        conn.row_factory = row_factory
+        return conn
+
+    def _health_check(self, conn: PooledConnection) -> PooledConnection:
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return conn
+        except sqlite3.Error:
+            self._discard(conn)
+            with self._cond:
+                self._stats["discarded"] += 1
+            return self._create()
+
+    def release(self, conn: PooledConnection):
+        """คืน connection เข้า Pool (rollback งานที่ไม่ได้ commit เหมือนการปิด connection ปกติ)"""
+        if not getattr(conn, '_in_use', False):
+            return
+        conn._in_use = False
+        healthy = True
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            healthy = False
+
+        with self._cond:
+            if healthy and conn._pool is self:
+                conn._last_used = time.monotonic()
+                self._idle.append(conn)
+            else:
+                self._open_count -= 1
+                self._stats["discarded"] += 1
+                self._discard(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, row_factory=None):
+        conn = self.acquire(row_factory)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self) -> Dict:
+        """สถิติสำหรับ ops: hits, misses, waits, timeouts, open, idle, in_use"""
+        with self._cond:
+            return {
+                "db_path": self.db_path,
+                "max_size": self.max_size,
+                "open": self._open_count,
+                "idle": len(self._idle),
+                "in_use": self._open_count - len(self._idle),
+                **self._stats
+            }
+
+    def close_all(self):
+        """ปิด connection ที่ว่างอยู่ทั้งหมด (เช่น ก่อนกู้คืนไฟล์ฐานข้อมูล)"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open_count -= len(idle)
+            for conn in idle:
+                self._discard(conn)
+            self._cond.notify_all()
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str, **kwargs) -> ConnectionPool:
+    """คืน Pool ของไฟล์ฐานข้อมูล (หนึ่ง Pool ต่อไฟล์ต่อ process)"""
+    pool = _pools.get(db_path)
+    if pool is not None:
+        return pool
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(key, **kwargs)
+            _pools[key] = pool
+        _pools[db_path] = pool
+        return pool
+
+
+def pool_stats() -> Dict[str, Dict]:
+    """สถิติของทุก Pool ใน process"""
+    with _pools_lock:
+        pools = {id(p): p for p in _pools.values()}
+    return {p.db_path: p.stats() for p in pools.values()}
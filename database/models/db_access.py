@@ -2,14 +2,25 @@
 """
 สคริปต์เข้าถึงฐานข้อมูลโรงแรม SQLite
 """
+import os
 import sqlite3
 import sys
 import datetime
 import random
 
+try:
+    from database.models.connection_pool import get_pool, pool_stats
+except ImportError:  # รันตรงจาก database/models (python3 db_access.py ...)
+    # import ผ่าน package เสมอ: ถ้าใช้ "connection_pool" ตรงๆ จะได้โมดูลซ้ำกับของ db_access_v2 (Pool registry สองชุด)
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+    from database.models.connection_pool import get_pool, pool_stats
+from database.models.db_access_v2 import DashboardStats
+
+DB_PATH = 'database/data/โรงแรม.db'
+
 def เชื่อมต่อฐานข้อมูล():
-    """เชื่อมต่อฐานข้อมูล"""
-    return sqlite3.connect('database/data/โรงแรม.db')
+    """เชื่อมต่อฐานข้อมูล (ยืมจาก Connection Pool - conn.close() คืน connection เข้า Pool)"""
+    return get_pool(DB_PATH).acquire()
 
 def generate_id(prefix):
     """สร้าง ID ตามรูปแบบที่กำหนด (e.g., RES-20260122-001)"""
@@ -60,40 +71,21 @@ def ดูข้อมูลห้องพัก():
         print(f"   ห้อง {room[0]}: {room[1]} ({room[2]:,}฿) - {room[3]}{guest_info}")
 
 def ดูสถิติ():
-    """ดูสถิติโรงแรม"""
-    conn = เชื่อมต่อฐานข้อมูล()
-    cursor = conn.cursor()
-    
-    # สถิติห้องพัก
-    cursor.execute("SELECT COUNT(*) FROM ห้องพัก")
-    total_rooms = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM ห้องพัก WHERE สถานะ = 'มีผู้เข้าพัก'")
-    occupied_rooms = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM ผู้เข้าพัก WHERE สถานะ = 'เข้าพัก'")
-    total_guests = cursor.fetchone()[0]
-    
-    # สถิติตามประเภทห้อง
-    cursor.execute('''
-        SELECT ประเภท, COUNT(*) as จำนวน, 
-               SUM(CASE WHEN สถานะ = 'มีผู้เข้าพัก' THEN 1 ELSE 0 END) as เข้าพัก,
-               AVG(ราคา) as ราคาเฉลี่ย
-        FROM ห้องพัก 
-        GROUP BY ประเภท
-    ''')
-    room_stats = cursor.fetchall()
-    
-    conn.close()
+    """ดูสถิติโรงแรม (DashboardStats - query เดียว ใช้ร่วมกับ Bot และ Web)"""
+    stats = DashboardStats.get()
+    total_rooms = stats["rooms"]["total"]
+    occupied_rooms = stats["rooms"]["occupied"]
     
     print("📊 สถิติโรงแรม:")
     print(f"   🏠 ห้องทั้งหมด: {total_rooms} ห้อง")
-    print(f"   🔴 ห้องที่มีผู้เข้าพัก: {occupied_rooms} ห้อง ({occupied_rooms/total_rooms*100:.1f}%)")
-    print(f"   👥 ผู้เข้าพักทั้งหมด: {total_guests} คน")
+    print(f"   🔴 ห้องที่มีผู้เข้าพัก: {occupied_rooms} ห้อง ({stats['rooms']['occupancy_rate']:.1f}%)")
+    print(f"   👥 ผู้เข้าพักทั้งหมด: {stats['guests_in_house']} คน")
+    print(f"   📅 การจองที่ยัง Active: {stats['bookings']['active']} รายการ")
+    print(f"   📒 รายการบัญชี: {stats['journal_count']} รายการ")
     print()
     print("📋 สถิติตามประเภทห้อง:")
-    for ประเภท, จำนวน, เข้าพัก, ราคาเฉลี่ย in room_stats:
-        print(f"   {ประเภท}: {จำนวน} ห้อง | เข้าพัก {เข้าพัก} ห้อง | ราคาเฉลี่ย {ราคาเฉลี่ย:,.0f}฿")
+    for row in stats["by_type"]:
+        print(f"   {row['room_type']}: {row['rooms']} ห้อง | เข้าพัก {row['occupied']} ห้อง | ราคาเฉลี่ย {row['average_price']:,.0f}฿")
 
 def รัน_SQL(sql):
     """รัน SQL query"""
@@ -143,6 +135,12 @@ if __name__ == "__main__":
             ดูสถิติ()
         elif command == "sql" and len(sys.argv) > 2:
             รัน_SQL(" ".join(sys.argv[2:]))
+        elif command == "pool":
+            conn = เชื่อมต่อฐานข้อมูล()
+            conn.execute("SELECT 1")
+            conn.close()
+            for path, stats in pool_stats().items():
+                print(f"🔌 {path}: {stats}")
         else:
             print("Usage:")
             print("  python3 db_access.py tables    # ดูตารางทั้งหมด")
@@ -150,6 +148,7 @@ if __name__ == "__main__":
             print("  python3 db_access.py rooms     # ดูข้อมูลห้องพัก")
             print("  python3 db_access.py stats     # ดูสถิติ")
             print("  python3 db_access.py sql 'SELECT * FROM ผู้เข้าพัก'")
+            print("  python3 db_access.py pool      # ดูสถิติ Connection Pool")
     else:
         # รัน interactive mode
         while True:
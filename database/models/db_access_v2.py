@@ -3,50 +3,432 @@
 VIPAT Hotel ERP - Enhanced Core Engine v2.0
 """
 import sqlite3
+import ast
+import bisect
 import datetime
+import math
 import os
-from typing import Dict, List, Optional, Tuple
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
 from contextlib import contextmanager
+try:
+    from database.models import event_bus
+    from database.models.connection_pool import get_pool
+    from database.models.storage_tuning import with_write_retry
+except ImportError:  # รันตรงจาก database/models
+    import event_bus
+    from connection_pool import get_pool
+    from storage_tuning import with_write_retry
+
+T = TypeVar('T')
 
 DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'โรงแรม.db')
 
+# Index/ตารางเสริมด้านประสิทธิภาพ (idempotent) - ถูกสร้างครั้งแรกที่เปิด connection และโดย upgrade_to_erp_v2.py
+SCHEMA_EXTENSIONS = [
+    # Interval overlap lookup: WHERE room_number = ? AND status ... AND check_in < ? AND check_out > ?
+    "CREATE INDEX IF NOT EXISTS idx_bookings_room_status_dates ON Data_Bookings (room_number, status, check_in, check_out)",
+    # Keyset pagination: ORDER BY COALESCE(created_at, '') DESC, booking_id DESC / transaction_date DESC, entry_id DESC
+    # (NULL เป็น '' - ไม่งั้นการเทียบ row value กับ NULL ไม่เป็นจริงและแถวเหล่านั้นหายจาก cursor)
+    "DROP INDEX IF EXISTS idx_bookings_created",
+    "CREATE INDEX IF NOT EXISTS idx_bookings_created_key ON Data_Bookings (COALESCE(created_at, ''), booking_id)",
+    "CREATE INDEX IF NOT EXISTS idx_journal_date ON Data_Journal (transaction_date, journal_id)",
+    "CREATE INDEX IF NOT EXISTS idx_entries_journal ON Data_JournalEntries (journal_id)",
+    "CREATE INDEX IF NOT EXISTS idx_entries_account ON Data_JournalEntries (account_code, journal_id)",
+    # ยอดสะสมต่อบัญชี (Trial Balance แบบ O(accounts)) - ดูแลโดย trigger ใน transaction เดียวกับการลงบัญชี
+    '''CREATE TABLE IF NOT EXISTS Data_AccountBalances (
+        account_code TEXT PRIMARY KEY,
+        total_debit REAL NOT NULL DEFAULT 0,
+        total_credit REAL NOT NULL DEFAULT 0,
+        entry_count INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_entries_balance_insert AFTER INSERT ON Data_JournalEntries
+    BEGIN
+        INSERT INTO Data_AccountBalances (account_code, total_debit, total_credit, entry_count)
+        VALUES (NEW.account_code, COALESCE(NEW.debit, 0), COALESCE(NEW.credit, 0), 1)
+        ON CONFLICT(account_code) DO UPDATE SET
+            total_debit = total_debit + excluded.total_debit,
+            total_credit = total_credit + excluded.total_credit,
+            entry_count = entry_count + 1,
+            updated_at = CURRENT_TIMESTAMP;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_entries_balance_delete AFTER DELETE ON Data_JournalEntries
+    BEGIN
+        UPDATE Data_AccountBalances SET
+            total_debit = total_debit - COALESCE(OLD.debit, 0),
+            total_credit = total_credit - COALESCE(OLD.credit, 0),
+            entry_count = entry_count - 1,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE account_code = OLD.account_code;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_entries_balance_update AFTER UPDATE OF account_code, debit, credit ON Data_JournalEntries
+    BEGIN
+        UPDATE Data_AccountBalances SET
+            total_debit = total_debit - COALESCE(OLD.debit, 0),
+            total_credit = total_credit - COALESCE(OLD.credit, 0),
+            entry_count = entry_count - 1,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE account_code = OLD.account_code;
+        INSERT INTO Data_AccountBalances (account_code, total_debit, total_credit, entry_count)
+        VALUES (NEW.account_code, COALESCE(NEW.debit, 0), COALESCE(NEW.credit, 0), 1)
+        ON CONFLICT(account_code) DO UPDATE SET
+            total_debit = total_debit + excluded.total_debit,
+            total_credit = total_credit + excluded.total_credit,
+            entry_count = entry_count + 1,
+            updated_at = CURRENT_TIMESTAMP;
+    END''',
+    # ยอดรายวันต่อบัญชี (งบกำไรขาดทุนตามช่วงเวลา) - วันที่ของรายการ = date(Data_Journal.transaction_date)
+    '''CREATE TABLE IF NOT EXISTS Data_DailyAccountTotals (
+        day TEXT NOT NULL,
+        account_code TEXT NOT NULL,
+        total_debit REAL NOT NULL DEFAULT 0,
+        total_credit REAL NOT NULL DEFAULT 0,
+        entry_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, account_code)
+    ) WITHOUT ROWID''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_entries_daily_insert AFTER INSERT ON Data_JournalEntries
+    BEGIN
+        INSERT INTO Data_DailyAccountTotals (day, account_code, total_debit, total_credit, entry_count)
+        SELECT date(j.transaction_date), NEW.account_code, COALESCE(NEW.debit, 0), COALESCE(NEW.credit, 0), 1
+        FROM Data_Journal j WHERE j.journal_id = NEW.journal_id
+        ON CONFLICT(day, account_code) DO UPDATE SET
+            total_debit = total_debit + excluded.total_debit,
+            total_credit = total_credit + excluded.total_credit,
+            entry_count = entry_count + 1;
+    END''',
+    # FK journal_id → Data_Journal ไม่มี ON DELETE (NO ACTION) จึงไม่มีการลบแบบ cascade:
+    # - ทางปกติ (foreign_keys=ON): ลบบรรทัดก่อนแล้วค่อยลบหัว - trigger นี้หักยอดตามวันของหัวที่ยังอยู่
+    #   ส่วน trg_journal_daily_delete ตอนลบหัวไม่เหลือบรรทัดให้หักแล้ว
+    # - ลบหัวทั้งที่ยังมีบรรทัด: foreign_keys=ON ถูกปฏิเสธทั้งคำสั่ง; connection ที่ปิด foreign_keys
+    #   หักยอดใน trg_journal_daily_delete และบรรทัดกำพร้าที่ลบทีหลังหาวันไม่เจอ (day = NULL) จึงไม่ถูกหักซ้ำ
+    '''CREATE TRIGGER IF NOT EXISTS trg_entries_daily_delete AFTER DELETE ON Data_JournalEntries
+    BEGIN
+        UPDATE Data_DailyAccountTotals SET
+            total_debit = total_debit - COALESCE(OLD.debit, 0),
+            total_credit = total_credit - COALESCE(OLD.credit, 0),
+            entry_count = entry_count - 1
+        WHERE account_code = OLD.account_code
+          AND day = (SELECT date(transaction_date) FROM Data_Journal WHERE journal_id = OLD.journal_id);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_entries_daily_update AFTER UPDATE OF journal_id, account_code, debit, credit ON Data_JournalEntries
+    BEGIN
+        UPDATE Data_DailyAccountTotals SET
+            total_debit = total_debit - COALESCE(OLD.debit, 0),
+            total_credit = total_credit - COALESCE(OLD.credit, 0),
+            entry_count = entry_count - 1
+        WHERE account_code = OLD.account_code
+          AND day = (SELECT date(transaction_date) FROM Data_Journal WHERE journal_id = OLD.journal_id);
+        INSERT INTO Data_DailyAccountTotals (day, account_code, total_debit, total_credit, entry_count)
+        SELECT date(j.transaction_date), NEW.account_code, COALESCE(NEW.debit, 0), COALESCE(NEW.credit, 0), 1
+        FROM Data_Journal j WHERE j.journal_id = NEW.journal_id
+        ON CONFLICT(day, account_code) DO UPDATE SET
+            total_debit = total_debit + excluded.total_debit,
+            total_credit = total_credit + excluded.total_credit,
+            entry_count = entry_count + 1;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_journal_daily_delete BEFORE DELETE ON Data_Journal
+    BEGIN
+        UPDATE Data_DailyAccountTotals SET
+            total_debit = total_debit - (SELECT COALESCE(SUM(e.debit), 0) FROM Data_JournalEntries e WHERE e.journal_id = OLD.journal_id AND e.account_code = Data_DailyAccountTotals.account_code),
+            total_credit = total_credit - (SELECT COALESCE(SUM(e.credit), 0) FROM Data_JournalEntries e WHERE e.journal_id = OLD.journal_id AND e.account_code = Data_DailyAccountTotals.account_code),
+            entry_count = entry_count - (SELECT COUNT(*) FROM Data_JournalEntries e WHERE e.journal_id = OLD.journal_id AND e.account_code = Data_DailyAccountTotals.account_code)
+        WHERE day = date(OLD.transaction_date)
+          AND account_code IN (SELECT account_code FROM Data_JournalEntries WHERE journal_id = OLD.journal_id);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_journal_daily_redate AFTER UPDATE OF transaction_date ON Data_Journal
+    WHEN date(OLD.transaction_date) IS NOT date(NEW.transaction_date)
+    BEGIN
+        UPDATE Data_DailyAccountTotals SET
+            total_debit = total_debit - (SELECT COALESCE(SUM(e.debit), 0) FROM Data_JournalEntries e WHERE e.journal_id = OLD.journal_id AND e.account_code = Data_DailyAccountTotals.account_code),
+            total_credit = total_credit - (SELECT COALESCE(SUM(e.credit), 0) FROM Data_JournalEntries e WHERE e.journal_id = OLD.journal_id AND e.account_code = Data_DailyAccountTotals.account_code),
+            entry_count = entry_count - (SELECT COUNT(*) FROM Data_JournalEntries e WHERE e.journal_id = OLD.journal_id AND e.account_code = Data_DailyAccountTotals.account_code)
+        WHERE day = date(OLD.transaction_date)
+          AND account_code IN (SELECT account_code FROM Data_JournalEntries WHERE journal_id = OLD.journal_id);
+        INSERT INTO Data_DailyAccountTotals (day, account_code, total_debit, total_credit, entry_count)
+        SELECT date(NEW.transaction_date), account_code, COALESCE(SUM(debit), 0), COALESCE(SUM(credit), 0), COUNT(*)
+        FROM Data_JournalEntries WHERE journal_id = NEW.journal_id
+        GROUP BY account_code
+        ON CONFLICT(day, account_code) DO UPDATE SET
+            total_debit = total_debit + excluded.total_debit,
+            total_credit = total_credit + excluded.total_credit,
+            entry_count = entry_count + excluded.entry_count;
+    END''',
+    # การจองแบบกลุ่ม (ทัวร์/งานแต่ง): booking ใดอยู่กลุ่มไหน และ journal มัดจำรวมของกลุ่ม
+    '''CREATE TABLE IF NOT EXISTS Data_GroupBookings (
+        booking_id TEXT PRIMARY KEY,
+        group_ref TEXT NOT NULL,
+        journal_id TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''',
+    "CREATE INDEX IF NOT EXISTS idx_group_bookings_ref ON Data_GroupBookings (group_ref)",
+    # เลขเวอร์ชันของข้อมูลห้องว่าง (ห้องพัก + Data_Bookings) - ใช้ตรวจว่า AvailabilityCache ยังตรงกับฐานข้อมูล
+    '''CREATE TABLE IF NOT EXISTS Data_ChangeVersions (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )''',
+    "INSERT OR IGNORE INTO Data_ChangeVersions (name, version) VALUES ('availability', 0)",
+    "CREATE TRIGGER IF NOT EXISTS trg_bookings_version_insert AFTER INSERT ON Data_Bookings BEGIN UPDATE Data_ChangeVersions SET version = version + 1 WHERE name = 'availability'; END",
+    "CREATE TRIGGER IF NOT EXISTS trg_bookings_version_update AFTER UPDATE ON Data_Bookings BEGIN UPDATE Data_ChangeVersions SET version = version + 1 WHERE name = 'availability'; END",
+    "CREATE TRIGGER IF NOT EXISTS trg_bookings_version_delete AFTER DELETE ON Data_Bookings BEGIN UPDATE Data_ChangeVersions SET version = version + 1 WHERE name = 'availability'; END",
+    "CREATE TRIGGER IF NOT EXISTS trg_rooms_version_insert AFTER INSERT ON ห้องพัก BEGIN UPDATE Data_ChangeVersions SET version = version + 1 WHERE name = 'availability'; END",
+    "CREATE TRIGGER IF NOT EXISTS trg_rooms_version_update AFTER UPDATE ON ห้องพัก BEGIN UPDATE Data_ChangeVersions SET version = version + 1 WHERE name = 'availability'; END",
+    "CREATE TRIGGER IF NOT EXISTS trg_rooms_version_delete AFTER DELETE ON ห้องพัก BEGIN UPDATE Data_ChangeVersions SET version = version + 1 WHERE name = 'availability'; END",
+    # ฟอร์มหลายขั้นตอนของบอทที่ยังไม่จบ (bot/core/session_store.py) - อยู่รอดข้ามการรีสตาร์ท
+    '''CREATE TABLE IF NOT EXISTS Data_BotSessions (
+        chat_id TEXT PRIMARY KEY,
+        session TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    )''',
+]
+
+# ตารางสรุปที่คำนวณจากข้อมูลดิบ - เติมข้อมูลย้อนหลังเมื่อถูกสร้างครั้งแรก
+DERIVED_TABLES = [
+    ("Data_AccountBalances", lambda conn: AccountBalanceLedger.rebuild(conn)),
+    ("Data_DailyAccountTotals", lambda conn: DailyAccountTotals.rebuild(conn)),
+]
+_schema_checked = set()
+
+def ensure_schema_extensions(conn: sqlite3.Connection, force: bool = False):
+    """สร้าง index/ตารางเสริมที่ engine ต้องใช้ (ข้ามถ้าตารางหลักยังไม่มี)"""
+    if DB_PATH in _schema_checked and not force:
+        return
+    own_transaction = not conn.in_transaction
+    if own_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    try:
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for ddl in SCHEMA_EXTENSIONS:
+            try:
+                conn.execute(ddl)
+            except sqlite3.OperationalError as e:
+                # ฐานข้อมูลที่ยังไม่ได้อัปเกรด (ไม่มีตารางหลัก) - ให้ upgrade_to_erp_v2.py จัดการภายหลัง
+                if "no such table" not in str(e):
+                    raise
+        for table, backfill in DERIVED_TABLES:
+            if table not in existing:
+                try:
+                    backfill(conn)
+                except sqlite3.OperationalError as e:
+                    if "no such table" not in str(e):
+                        raise
+        if own_transaction:
+            conn.commit()
+    except Exception:
+        if own_transaction:
+            conn.rollback()
+        raise
+    _schema_checked.add(DB_PATH)
+
 @contextmanager
 def get_db_connection():
-    """Context Manager สำหรับ Database Connection พร้อม Transaction Support"""
-    db_dir = os.path.dirname(DB_PATH)
-    if not os.path.exists(db_dir):
-        os.makedirs(db_dir, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON")
+    """Context Manager สำหรับ Database Connection พร้อม Transaction Support (ยืมจาก Connection Pool)"""
+    pool = get_pool(DB_PATH)
+    conn = pool.acquire(row_factory=sqlite3.Row)
+    try:
+        ensure_schema_extensions(conn)
+        conn._id_tx = object()
+        conn._events = []
+        yield conn
+        conn.commit()
+        IDGenerator.allocator.committed(conn)
+        if conn._events:
+            event_bus.bus.publish_many(conn._events)
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn._id_tx = None
+        conn._events = None
+        pool.release(conn)
+
+@contextmanager
+def get_write_connection():
+    """Connection สำหรับงานเขียน: เริ่มด้วย BEGIN IMMEDIATE เพื่อจองล็อกเขียนตั้งแต่ต้น (ไม่ deadlock ตอนอัปเกรดล็อก)"""
+    pool = get_pool(DB_PATH)
+    conn = pool.acquire(row_factory=sqlite3.Row)
     try:
+        ensure_schema_extensions(conn)
+        conn.execute("BEGIN IMMEDIATE")
+        conn._id_tx = object()
+        conn._events = []
         yield conn
         conn.commit()
+        IDGenerator.allocator.committed(conn)
+        if conn._events:
+            event_bus.bus.publish_many(conn._events)
     except Exception as e:
         conn.rollback()
         raise e
     finally:
-        conn.close()
+        conn._id_tx = None
+        conn._events = None
+        pool.release(conn)
+
+def emit_event(conn: sqlite3.Connection, event_type: str, data: Dict):
+    """เหตุการณ์ของ transaction ใน conn: ส่งเข้า event bus หลัง commit เท่านั้น (rollback/ลองใหม่ = ทิ้ง)"""
+    pending = getattr(conn, '_events', None)
+    if pending is None:
+        # connection ที่ไม่ได้มาจาก get_*_connection - ผู้เรียกจัดการ transaction เอง ส่งทันที
+        event_bus.publish(event_type, data)
+    else:
+        pending.append((event_type, data))
+
+def run_write_transaction(work: Callable[[sqlite3.Connection], T]) -> T:
+    """รัน work(conn) ใน transaction แบบ IMMEDIATE และลองใหม่ (backoff + jitter) เมื่อฐานข้อมูลถูกล็อก"""
+    def attempt():
+        with get_write_connection() as conn:
+            return work(conn)
+    return with_write_retry(attempt)
+
+# จำนวนเลขที่ที่จองต่อครั้ง (1 = จองทีละเลข ไม่มีช่องว่าง) และ prefix ที่ต้องเรียงต่อเนื่องห้ามมีช่องว่าง เช่น "JNL"
+ID_BLOCK_SIZE = int(os.environ.get('ID_BLOCK_SIZE', 20))
+ID_GAPLESS_PREFIXES = {p.strip() for p in os.environ.get('ID_GAPLESS_PREFIXES', '').split(',') if p.strip()}
+_SUPPORTS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+class IDBlockAllocator:
+    """
+    จองเลขที่ (ID_Counters / Daily_Counters) ครั้งละหลายเลขด้วย UPDATE ... RETURNING แล้วแจกจากหน่วยความจำ
+
+    ความหมายของช่องว่างในเลขที่ (สำหรับผู้ตรวจสอบบัญชี):
+    - เลขที่ไม่ซ้ำกันเสมอ แต่ *อาจไม่ต่อเนื่อง* และอาจไม่เรียงตามเวลา เมื่อมีหลาย process (Bot/Web) ถือบล็อกคนละช่วง
+    - ช่องว่างเกิดจากเลขที่จองแล้วแต่ไม่ได้ใช้: process หยุด/รีสตาร์ท, ขึ้นวันใหม่ (เลขรายวัน) หรือ transaction
+      ที่ถือบล็อกจบโดยไม่ได้ commit ผ่าน get_db_connection/get_write_connection
+      แต่ละช่องว่างไม่เกิน block_size - 1 เลข และไม่มีเอกสารใดใช้เลขในช่องว่างนั้น
+    - transaction ที่ rollback จะคืนเลขที่ที่จองใน transaction นั้นทั้งหมด (บล็อกที่ยังไม่ commit จะไม่ถูกใช้ต่อ)
+    - prefix ใน ID_GAPLESS_PREFIXES หรือ block_size = 1 จองทีละเลขใน transaction ของเอกสาร = ไม่มีช่องว่าง
+    """
+
+    def __init__(self, block_size: int = ID_BLOCK_SIZE, gapless_prefixes=ID_GAPLESS_PREFIXES):
+        self.block_size = max(1, block_size)
+        self.block_sizes: Dict[str, int] = {}
+        self.gapless_prefixes = set(gapless_prefixes)
+        self._blocks: Dict[Tuple, Dict] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, prefix: str, block_size: Optional[int] = None, gapless: Optional[bool] = None):
+        """ตั้งขนาดบล็อกหรือโหมดไม่มีช่องว่างราย prefix"""
+        if block_size is not None:
+            self.block_sizes[prefix] = max(1, block_size)
+        if gapless is True:
+            self.gapless_prefixes.add(prefix)
+        elif gapless is False:
+            self.gapless_prefixes.discard(prefix)
+
+    def block_size_for(self, prefix: str) -> int:
+        if prefix in self.gapless_prefixes:
+            return 1
+        return self.block_sizes.get(prefix, self.block_size)
+
+    @staticmethod
+    def _reserve(conn: sqlite3.Connection, prefix: str, day: Optional[str], count: int) -> int:
+        """บวกตัวนับ count ใน transaction ของ conn แล้วคืนค่าล่าสุด"""
+        if day is None:
+            update = "UPDATE ID_Counters SET last_value = last_value + ? WHERE prefix = ?"
+            params = (count, prefix)
+            insert = ("INSERT OR IGNORE INTO ID_Counters (prefix, last_value) VALUES (?, 0)", (prefix,))
+            select = ("SELECT last_value FROM ID_Counters WHERE prefix = ?", (prefix,))
+        else:
+            update = "UPDATE Daily_Counters SET last_value = last_value + ? WHERE prefix = ? AND date = ?"
+            params = (count, prefix, day)
+            insert = ("INSERT OR IGNORE INTO Daily_Counters (prefix, date, last_value) VALUES (?, ?, 0)", (prefix, day))
+            select = ("SELECT last_value FROM Daily_Counters WHERE prefix = ? AND date = ?", (prefix, day))
+
+        if _SUPPORTS_RETURNING:
+            row = conn.execute(update + " RETURNING last_value", params).fetchone()
+            if row is None:
+                conn.execute(*insert)
+                row = conn.execute(update + " RETURNING last_value", params).fetchone()
+            return row[0]
+        if conn.execute(update, params).rowcount == 0:
+            conn.execute(*insert)
+            conn.execute(update, params)
+        return conn.execute(*select).fetchone()[0]
+
+    def take(self, conn: sqlite3.Connection, prefix: str, day: Optional[str], count: int = 1) -> List[int]:
+        """คืนเลขที่ count เลข (เรียงจากน้อยไปมาก) สำหรับ prefix/วัน"""
+        size = self.block_size_for(prefix)
+        token = getattr(conn, '_id_tx', None)
+        if size <= 1 or token is None:
+            # จองใน transaction ของผู้เรียกโดยตรง (connection ที่ไม่ได้มาจาก get_*_connection ก็ใช้ทางนี้)
+            last = self._reserve(conn, prefix, day, count)
+            return list(range(last - count + 1, last + 1))
+
+        key = (DB_PATH, prefix, day)
+        values: List[int] = []
+        with self._lock:
+            block = self._blocks.get(key)
+            if block is not None and block["token"] is not None and getattr(block["conn"], '_id_tx', None) is not block["token"]:
+                # transaction ที่จองบล็อกนี้จบโดยไม่ได้ commit - ทิ้งบล็อก
+                del self._blocks[key]
+                block = None
+            if block is not None and block["token"] in (None, token):
+                taken = min(count, block["end"] - block["next"] + 1)
+                values.extend(range(block["next"], block["next"] + taken))
+                block["next"] += taken
+                if block["next"] > block["end"]:
+                    del self._blocks[key]
+
+        remaining = count - len(values)
+        if remaining:
+            # ไม่ถือ lock ระหว่างรอฐานข้อมูล (thread ที่ถือล็อกเขียนอยู่ต้องแจกเลขต่อได้)
+            reserve = max(size, remaining)
+            last = self._reserve(conn, prefix, day, reserve)
+            start = last - reserve + 1
+            values.extend(range(start, start + remaining))
+            if start + remaining <= last:
+                with self._lock:
+                    self._blocks[key] = {"next": start + remaining, "end": last, "conn": conn, "token": token}
+        return values
+
+    def committed(self, conn: sqlite3.Connection):
+        """เรียกหลัง conn.commit(): บล็อกที่จองใน transaction นี้ใช้ร่วมกันได้ทุก thread"""
+        token = getattr(conn, '_id_tx', None)
+        if token is None:
+            return
+        with self._lock:
+            for block in self._blocks.values():
+                if block["token"] is token:
+                    block["token"] = None
+                    block["conn"] = None
+
+    def reset(self):
+        """ทิ้งบล็อกที่ถืออยู่ทั้งหมด (เช่น หลังกู้คืนไฟล์ฐานข้อมูล)"""
+        with self._lock:
+            self._blocks.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {f"{prefix}{'-' + day if day else ''}": block["end"] - block["next"] + 1
+                    for (_, prefix, day), block in self._blocks.items()}
 
 class IDGenerator:
+    allocator = IDBlockAllocator()
+
     @staticmethod
     def generate_sequential_id(prefix: str, conn: sqlite3.Connection) -> str:
-        cursor = conn.cursor()
-        cursor.execute("INSERT OR IGNORE INTO ID_Counters (prefix, last_value) VALUES (?, 0)", (prefix,))
-        cursor.execute("UPDATE ID_Counters SET last_value = last_value + 1 WHERE prefix = ?", (prefix,))
-        cursor.execute("SELECT last_value FROM ID_Counters WHERE prefix = ?", (prefix,))
-        new_value = cursor.fetchone()[0]
+        new_value = IDGenerator.allocator.take(conn, prefix, None)[0]
         return f"{prefix}-{new_value:05d}"
     
+    @staticmethod
+    def reserve_sequential_ids(prefix: str, conn: sqlite3.Connection, count: int) -> List[str]:
+        """จองเลขที่ต่อเนื่อง count เลข (ใช้ในการจองแบบกลุ่ม)"""
+        if count <= 0:
+            return []
+        return [f"{prefix}-{value:05d}" for value in IDGenerator.allocator.take(conn, prefix, None, count)]
+
     @staticmethod
     def generate_date_based_id(prefix: str, conn: sqlite3.Connection) -> str:
-        cursor = conn.cursor()
+        return IDGenerator.reserve_date_based_ids(prefix, conn, 1)[0]
+
+    @staticmethod
+    def reserve_date_based_ids(prefix: str, conn: sqlite3.Connection, count: int) -> List[str]:
+        """จองเลขที่รายวัน count เลข (ใช้ในการลงบัญชีแบบ batch)"""
+        if count <= 0:
+            return []
         today = datetime.datetime.now().strftime("%Y%m%d")
-        cursor.execute("INSERT OR IGNORE INTO Daily_Counters (prefix, date, last_value) VALUES (?, ?, 0)", (prefix, today))
-        cursor.execute("UPDATE Daily_Counters SET last_value = last_value + 1 WHERE prefix = ? AND date = ?", (prefix, today))
-        cursor.execute("SELECT last_value FROM Daily_Counters WHERE prefix = ? AND date = ?", (prefix, today))
-        new_value = cursor.fetchone()[0]
-        return f"{prefix}-{today}-{new_value:03d}"
+        return [f"{prefix}-{today}-{value:03d}" for value in IDGenerator.allocator.take(conn, prefix, today, count)]
 
 class DateFlatteningEngine:
     @staticmethod
@@ -63,29 +445,370 @@ class DateFlatteningEngine:
         return [f"{date.replace('-', '')}_{room_number}" for date in dates]
 
     @staticmethod
-    def check_conflict_advanced(conn: sqlite3.Connection, room_number: str, check_in: str, check_out: str, exclude_booking_id: Optional[str] = None) -> Tuple[bool, List[str]]:
-        cursor = conn.cursor()
-        requested_dates = DateFlatteningEngine.get_date_range(check_in, check_out)
-        requested_keys = DateFlatteningEngine.create_occupancy_keys(room_number, requested_dates)
-        
-        query = "SELECT check_in, check_out FROM Data_Bookings WHERE room_number = ? AND status NOT IN ('Cancelled', 'Checked-out')"
-        params = [room_number]
-        if exclude_booking_id:
-            query += " AND booking_id != ?"
-            params.append(exclude_booking_id)
-        
-        cursor.execute(query, params)
-        existing_bookings = cursor.fetchall()
-        occupied_keys = set()
-        for b in existing_bookings:
-            dates = DateFlatteningEngine.get_date_range(b['check_in'], b['check_out'])
-            occupied_keys.update(DateFlatteningEngine.create_occupancy_keys(room_number, dates))
-        
-        conflict_keys = set(requested_keys).intersection(occupied_keys)
-        if conflict_keys:
-            conflict_dates = sorted([f"{k[:4]}-{k[4:6]}-{k[6:8]}" for k in conflict_keys])
-            return True, conflict_dates
-        return False, []
+    def overlapping_nights(start_date: str, end_date: str, other_start: str, other_end: str) -> List[str]:
+        """คืนรายการคืนที่สองช่วง [start, end) ทับซ้อนกัน (คำนวณจากขอบช่วง ไม่ต้องแตกรายวันทั้งการจอง)"""
+        lo = max(start_date, other_start)
+        hi = min(end_date, other_end)
+        if lo >= hi:
+            return []
+        first = datetime.date.fromisoformat(lo)
+        nights = (datetime.date.fromisoformat(hi) - first).days
+        return [(first + datetime.timedelta(days=i)).isoformat() for i in range(nights)]
+
+    @staticmethod
+    def check_conflict_advanced(conn: sqlite3.Connection, room_number: str, check_in: str, check_out: str, exclude_booking_id: Optional[str] = None, interval_tree: Optional['RoomIntervalTree'] = None) -> Tuple[bool, List[str]]:
+        """
+        ตรวจสอบการจองซ้อนแบบ Interval Overlap (check_in < ? AND check_out > ?)
+        ใช้ index (room_number, status, check_in, check_out) หรือ RoomIntervalTree ที่โหลดไว้แล้ว
+        ผลลัพธ์เหมือน Date-Flattening เดิม: (มีการซ้อน, รายการวันที่ซ้อนเรียงลำดับ)
+        """
+        # ตรวจสอบช่วงวันที่ที่ขอจอง (raise ValueError เหมือนเดิมถ้าช่วงไม่ถูกต้อง)
+        DateFlatteningEngine.validate_range(check_in, check_out)
+
+        if interval_tree is not None:
+            overlaps = [(start, end) for start, end, _ in interval_tree.overlapping(room_number, check_in, check_out, exclude_booking_id)]
+        else:
+            query = ("SELECT check_in, check_out FROM Data_Bookings "
+                     "WHERE room_number = ? AND status NOT IN ('Cancelled', 'Checked-out') "
+                     "AND check_in < ? AND check_out > ?")
+            params = [room_number, check_out, check_in]
+            if exclude_booking_id:
+                query += " AND booking_id != ?"
+                params.append(exclude_booking_id)
+            overlaps = [(row[0], row[1]) for row in conn.execute(query, params)]
+
+        if not overlaps:
+            return False, []
+
+        conflict_dates = set()
+        for start, end in overlaps:
+            conflict_dates.update(DateFlatteningEngine.overlapping_nights(check_in, check_out, start, end))
+        return bool(conflict_dates), sorted(conflict_dates)
+
+    @staticmethod
+    def validate_range(start_date: str, end_date: str) -> int:
+        """ตรวจสอบรูปแบบและลำดับวันที่ คืนค่าจำนวนคืน"""
+        start = datetime.datetime.strptime(start_date, "%Y-%m-%d")
+        end = datetime.datetime.strptime(end_date, "%Y-%m-%d")
+        delta = (end - start).days
+        if delta <= 0:
+            raise ValueError(f"วันเช็คเอาท์ ({end_date}) ต้องมากกว่าวันเช็คอิน ({start_date})")
+        return delta
+
+class RoomIntervalTree:
+    """
+    ดัชนีช่วงเวลาการจองในหน่วยความจำ (Sorted Intervals ต่อห้อง)
+    เก็บ (check_in, check_out, booking_id) เรียงตาม check_in พร้อม prefix-max ของ check_out
+    ทำให้ค้นหาการทับซ้อนได้ใน O(log n + k)
+    คีย์ห้องเป็น str เสมอ (101 กับ "101" คือห้องเดียวกัน เหมือนคอลัมน์ TEXT ในฐานข้อมูล)
+    """
+
+    def __init__(self):
+        self._rooms: Dict[str, List[Tuple[str, str, str]]] = {}
+        self._max_end: Dict[str, List[str]] = {}
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection, room_number: Optional[str] = None) -> 'RoomIntervalTree':
+        """โหลดการจองที่ยัง Active จากฐานข้อมูล (ทุกห้อง หรือเฉพาะห้องที่ระบุ)"""
+        tree = cls()
+        query = "SELECT room_number, check_in, check_out, booking_id FROM Data_Bookings WHERE status NOT IN ('Cancelled', 'Checked-out')"
+        params: List[str] = []
+        if room_number is not None:
+            query += " AND room_number = ?"
+            params.append(room_number)
+        for row in conn.execute(query, params):
+            tree._rooms.setdefault(str(row[0]), []).append((row[1], row[2], row[3]))
+        for room in tree._rooms:
+            tree._rebuild(room)
+        return tree
+
+    def _rebuild(self, room_number: str):
+        intervals = self._rooms.get(room_number, [])
+        intervals.sort()
+        running, max_end = '', []
+        for _, end, _ in intervals:
+            running = max(running, end)
+            max_end.append(running)
+        self._max_end[room_number] = max_end
+
+    def add(self, room_number: str, check_in: str, check_out: str, booking_id: str):
+        room_number = str(room_number)
+        intervals = self._rooms.setdefault(room_number, [])
+        bisect.insort(intervals, (check_in, check_out, booking_id))
+        self._rebuild(room_number)
+
+    def remove(self, room_number: str, booking_id: str) -> bool:
+        room_number = str(room_number)
+        intervals = self._rooms.get(room_number, [])
+        kept = [iv for iv in intervals if iv[2] != booking_id]
+        if len(kept) == len(intervals):
+            return False
+        self._rooms[room_number] = kept
+        self._rebuild(room_number)
+        return True
+
+    def intervals(self, room_number: str) -> List[Tuple[str, str, str]]:
+        return list(self._rooms.get(str(room_number), []))
+
+    def overlapping(self, room_number: str, check_in: str, check_out: str, exclude_booking_id: Optional[str] = None) -> List[Tuple[str, str, str]]:
+        """คืนการจองที่ทับซ้อนกับช่วง [check_in, check_out)"""
+        room_number = str(room_number)
+        intervals = self._rooms.get(room_number)
+        if not intervals:
+            return []
+        max_end = self._max_end[room_number]
+        # ช่วงที่เริ่มก่อน check_out เท่านั้นที่อาจทับซ้อน
+        i = bisect.bisect_left(intervals, (check_out,)) - 1
+        result = []
+        while i >= 0 and max_end[i] > check_in:
+            start, end, booking_id = intervals[i]
+            if end > check_in and booking_id != exclude_booking_id:
+                result.append(intervals[i])
+            i -= 1
+        result.reverse()
+        return result
+
+AVAILABILITY_CACHE_ENABLED = os.environ.get('AVAILABILITY_CACHE', '1') != '0'
+# 1 = ทุกการค้นหาจาก cache ถูกเทียบกับ SQL (ใช้ตรวจสอบตอน deploy, ช้ากว่าปกติ)
+AVAILABILITY_CACHE_VERIFY = os.environ.get('AVAILABILITY_CACHE_VERIFY', '0') == '1'
+
+class AvailabilityCache:
+    """
+    Cache ห้องพัก + การจองที่ยัง Active ต่อ process (RoomIntervalTree ต่อห้อง)
+    - ตรวจความสดด้วย PRAGMA data_version บน connection เฉพาะ (เปลี่ยนเมื่อ connection อื่นหรือ process อื่น commit)
+      ถ้าเปลี่ยน อ่าน Data_ChangeVersions.availability (trigger บน ห้องพัก/Data_Bookings) ว่าข้อมูลห้องเปลี่ยนจริงหรือไม่
+    - write-through: EnhancedBookingEngine อัปเดต cache หลัง commit เมื่อเวอร์ชันก่อนเขียนตรงกับ cache
+    - verify=True: เทียบผลทุกครั้งกับ SQL และนับ mismatches (คืนผลจาก SQL)
+    """
+    ROOMS_QUERY = "SELECT เลขห้อง AS room_number, ประเภท AS room_type, ราคา AS nightly_price, สถานะ AS status FROM ห้องพัก ORDER BY เลขห้อง"
+    VERSION_QUERY = "SELECT version FROM Data_ChangeVersions WHERE name = 'availability'"
+
+    def __init__(self, db_path: str, verify: bool = AVAILABILITY_CACHE_VERIFY):
+        self.db_path = db_path
+        self.verify = verify
+        self._lock = threading.Lock()
+        self._watcher: Optional[sqlite3.Connection] = None
+        self._data_version = None
+        self._version = None
+        self._rooms: List[Dict] = []
+        self._tree = RoomIntervalTree()
+        self._stats = {"hits": 0, "misses": 0, "reloads": 0, "write_through": 0, "invalidations": 0, "mismatches": 0}
+
+    def _watcher_conn(self) -> sqlite3.Connection:
+        if self._watcher is None:
+            with get_db_connection():
+                pass  # สร้าง Data_ChangeVersions/trigger ก่อนอ่านครั้งแรก
+            self._watcher = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._watcher.row_factory = sqlite3.Row
+        return self._watcher
+
+    def _reload(self):
+        conn = self._watcher_conn()
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        # อ่านทั้งสามส่วนใน read transaction เดียว (snapshot เดียวกันใน WAL)
+        conn.execute("BEGIN")
+        try:
+            version_row = conn.execute(self.VERSION_QUERY).fetchone()
+            rooms = [dict(row) for row in conn.execute(self.ROOMS_QUERY)]
+            tree = RoomIntervalTree.load(conn)
+        finally:
+            conn.rollback()
+        self._data_version = data_version
+        self._version = version_row[0] if version_row else None
+        self._rooms = rooms
+        self._tree = tree
+        self._stats["reloads"] += 1
+
+    def _refresh(self):
+        """เรียกภายใต้ self._lock: ตรวจความสดแล้วโหลดใหม่ถ้าจำเป็น"""
+        if self._version is None:
+            self._stats["misses"] += 1
+            self._reload()
+            return
+        conn = self._watcher_conn()
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self._data_version:
+            row = conn.execute(self.VERSION_QUERY).fetchone()
+            if not row or row[0] != self._version:
+                self._stats["misses"] += 1
+                self._stats["invalidations"] += 1
+                self._reload()
+                return
+            # มีการ commit ตารางอื่น (เช่น สมุดรายวัน) แต่ข้อมูลห้องไม่เปลี่ยน
+            self._data_version = data_version
+        self._stats["hits"] += 1
+
+    def warm(self) -> 'AvailabilityCache':
+        """โหลดล่วงหน้าตอนเริ่ม process"""
+        with self._lock:
+            self._refresh()
+        return self
+
+    # ---------- การอ่าน ----------
+
+    def overlapping(self, room_number: str, check_in: str, check_out: str, exclude_booking_id: Optional[str] = None) -> List[Tuple[str, str, str]]:
+        with self._lock:
+            self._refresh()
+            return self._tree.overlapping(str(room_number), check_in, check_out, exclude_booking_id)
+
+    def available_rooms(self, check_in: str, check_out: str, room_type: Optional[str] = None, min_price: Optional[float] = None, max_price: Optional[float] = None, room_status: Optional[str] = None) -> List[Dict]:
+        """ผลลัพธ์แบบเดียวกับ query ของ AvailabilityService.search (ยังไม่รวม nights/total_price)"""
+        with self._lock:
+            self._refresh()
+            return [
+                dict(room) for room in self._rooms
+                if (room['status'] or '') != 'ซ่อมแซม'
+                and (room_type is None or room['room_type'] == room_type)
+                and (min_price is None or (room['nightly_price'] is not None and room['nightly_price'] >= min_price))
+                and (max_price is None or (room['nightly_price'] is not None and room['nightly_price'] <= max_price))
+                and (room_status is None or room['status'] == room_status)
+                and not self._tree.overlapping(str(room['room_number']), check_in, check_out)
+            ]
+
+    # ---------- write-through ----------
+
+    @classmethod
+    def current_version(cls, conn: sqlite3.Connection) -> Optional[int]:
+        row = conn.execute(cls.VERSION_QUERY).fetchone()
+        return row[0] if row else None
+
+    def tree_for_write(self, conn: sqlite3.Connection) -> Tuple[Optional[RoomIntervalTree], Optional[int]]:
+        """
+        ใช้ภายใน write transaction (ถือล็อกเขียนอยู่): คืน (tree, เวอร์ชัน)
+        tree เป็น None ถ้า cache ไม่ตรงกับฐานข้อมูล ณ ตอนนี้ (ให้ตรวจด้วย SQL แทน)
+        """
+        version = self.current_version(conn)
+        with self._lock:
+            if version is not None and version == self._version and not self.verify:
+                self._stats["hits"] += 1
+                return self._tree, version
+        return None, version
+
+    def write_through(self, before: Optional[int], after: Optional[int], mutate: Callable[['AvailabilityCache'], None]):
+        """เรียกหลัง commit: ถ้า cache อยู่ที่เวอร์ชัน before ให้ mutate แล้วขยับเป็น after, ไม่งั้นโหลดใหม่ครั้งถัดไป"""
+        with self._lock:
+            if before is not None and before == self._version:
+                mutate(self)
+                self._version = after
+                self._stats["write_through"] += 1
+            else:
+                self._version = None
+
+    def add_booking(self, room_number: str, check_in: str, check_out: str, booking_id: str):
+        self._tree.add(str(room_number), check_in, check_out, booking_id)
+
+    def remove_booking(self, room_number: str, booking_id: str):
+        self._tree.remove(str(room_number), booking_id)
+
+    def set_room_status(self, room_number: str, status: str):
+        for room in self._rooms:
+            if str(room['room_number']) == str(room_number):
+                room['status'] = status
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+
+    # ---------- ตรวจสอบ ----------
+
+    def check_consistency(self) -> Dict:
+        """เทียบข้อมูลใน cache กับ SQL: คืน {consistent, rooms, bookings} (ห้องที่ต่างกัน)"""
+        with self._lock:
+            self._refresh()
+            cached_rooms = {str(r['room_number']): r for r in self._rooms}
+            cached_tree = self._tree
+        with get_db_connection() as conn:
+            sql_rooms = {str(r['room_number']): dict(r) for r in conn.execute(self.ROOMS_QUERY)}
+            sql_tree = RoomIntervalTree.load(conn)
+        room_diff = sorted(room for room in set(cached_rooms) | set(sql_rooms) if cached_rooms.get(room) != sql_rooms.get(room))
+        booked_rooms = set(cached_tree._rooms) | set(sql_tree._rooms)
+        booking_diff = sorted(room for room in booked_rooms if cached_tree.intervals(room) != sql_tree.intervals(room))
+        return {"consistent": not room_diff and not booking_diff, "rooms": room_diff, "bookings": booking_diff}
+
+    def record_mismatch(self, what: str, cached, expected):
+        with self._lock:
+            self._stats["mismatches"] += 1
+        print(f"⚠️ AvailabilityCache ไม่ตรงกับฐานข้อมูล ({what}): cache={cached} sql={expected}")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "db_path": self.db_path,
+                "version": self._version,
+                "rooms": len(self._rooms),
+                "verify": self.verify,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else None,
+                **self._stats
+            }
+
+_availability_caches: Dict[str, AvailabilityCache] = {}
+_availability_caches_lock = threading.Lock()
+
+def get_availability_cache() -> Optional[AvailabilityCache]:
+    """AvailabilityCache ของ DB_PATH ปัจจุบัน (None ถ้าปิดด้วย AVAILABILITY_CACHE=0)"""
+    if not AVAILABILITY_CACHE_ENABLED:
+        return None
+    key = os.path.abspath(DB_PATH)
+    with _availability_caches_lock:
+        cache = _availability_caches.get(key)
+        if cache is None:
+            cache = _availability_caches[key] = AvailabilityCache(key)
+        return cache
+
+# ตัวดำเนินการที่อนุญาตใน amount_formula ของ template บัญชี
+_FORMULA_BINARY_OPS = {
+    ast.Add: lambda a, b: a + b,
+    ast.Sub: lambda a, b: a - b,
+    ast.Mult: lambda a, b: a * b,
+    ast.Div: lambda a, b: a / b,
+}
+_FORMULA_VARIABLES = ('main', 'vat_rate')
+
+def compile_amount_formula(formula: str) -> Callable[[float, float], float]:
+    """
+    แปลง amount_formula (เช่น "main / (1 + vat_rate)") เป็นฟังก์ชัน f(main, vat_rate) ครั้งเดียว
+    รองรับเฉพาะตัวเลข, ตัวแปร main/vat_rate, + - * / และวงเล็บ - ไม่ใช้ eval
+    """
+    def build(node):
+        if isinstance(node, ast.Expression):
+            return build(node.body)
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            value = float(node.value)
+            return lambda main, vat_rate: value
+        if isinstance(node, ast.Name) and node.id == 'main':
+            return lambda main, vat_rate: main
+        if isinstance(node, ast.Name) and node.id == 'vat_rate':
+            return lambda main, vat_rate: vat_rate
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            operand = build(node.operand)
+            if isinstance(node.op, ast.USub):
+                return lambda main, vat_rate: -operand(main, vat_rate)
+            return operand
+        if isinstance(node, ast.BinOp) and type(node.op) in _FORMULA_BINARY_OPS:
+            op, left, right = _FORMULA_BINARY_OPS[type(node.op)], build(node.left), build(node.right)
+            return lambda main, vat_rate: op(left(main, vat_rate), right(main, vat_rate))
+        raise ValueError(f"amount_formula ไม่รองรับ: {ast.dump(node)} (ใช้ได้เฉพาะ {', '.join(_FORMULA_VARIABLES)}, ตัวเลข และ + - * /)")
+
+    try:
+        tree = ast.parse(formula, mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f"amount_formula ผิดรูปแบบ: {formula!r}") from e
+    return build(tree)
+
+def compile_templates(templates: Dict[str, Dict]) -> Dict[str, Tuple[str, Tuple[Tuple[str, bool, Optional[Callable[[float, float], float]]], ...]]]:
+    """template -> (description, ((account, is_debit, amount_fn|None), ...)) - amount_fn None = ใช้ยอดหลัก"""
+    compiled = {}
+    for name, template in templates.items():
+        lines = tuple(
+            (entry['account'], entry['type'] == 'debit', compile_amount_formula(entry['amount_formula']) if 'amount_formula' in entry else None)
+            for entry in template['entries']
+        )
+        compiled[name] = (template['description'], lines)
+    return compiled
+
+DEFAULT_VAT_RATE = 0.07
+_vat_rate_cache: Dict[str, float] = {}
 
 class AccountingEngine:
     TEMPLATES = {
@@ -100,8 +823,8 @@ class AccountingEngine:
             "description": "รับรู้รายได้ค่าห้องพัก",
             "entries": [
                 {"account": "2050", "type": "debit"},
-                {"account": "4010", "type": "credit", "amount_formula": "main / 1.07"},
-                {"account": "2030", "type": "credit", "amount_formula": "main - (main / 1.07)"}
+                {"account": "4010", "type": "credit", "amount_formula": "main / (1 + vat_rate)"},
+                {"account": "2030", "type": "credit", "amount_formula": "main - main / (1 + vat_rate)"}
             ]
         },
         "utility_income": {
@@ -112,45 +835,252 @@ class AccountingEngine:
             ]
         }
     }
-    
+    # คอมไพล์ครั้งเดียวตอน import (เรียก reload_templates() หลังแก้ TEMPLATES)
+    COMPILED_TEMPLATES = compile_templates(TEMPLATES)
+
+    @staticmethod
+    def reload_templates():
+        AccountingEngine.COMPILED_TEMPLATES = compile_templates(AccountingEngine.TEMPLATES)
+
+    @staticmethod
+    def get_vat_rate(conn: sqlite3.Connection) -> float:
+        """อัตรา VAT จาก System_Config.vat_rate (cache ต่อไฟล์ฐานข้อมูล, ไม่มีค่า = 7%)"""
+        rate = _vat_rate_cache.get(DB_PATH)
+        if rate is None:
+            try:
+                row = conn.execute("SELECT config_value FROM System_Config WHERE config_key = 'vat_rate'").fetchone()
+                rate = float(row[0]) if row and row[0] not in (None, '') else DEFAULT_VAT_RATE
+            except sqlite3.OperationalError:
+                rate = DEFAULT_VAT_RATE
+            _vat_rate_cache[DB_PATH] = rate
+        return rate
+
+    @staticmethod
+    def clear_config_cache():
+        """ล้าง cache อัตรา VAT (เรียกหลังแก้ System_Config)"""
+        _vat_rate_cache.clear()
+
     @staticmethod
     def create_journal_entry(conn: sqlite3.Connection, template_name: str, amount: float, reference_id: str, additional_description: str = "") -> str:
-        template = AccountingEngine.TEMPLATES.get(template_name)
+        template = AccountingEngine.COMPILED_TEMPLATES.get(template_name)
         if not template: raise ValueError(f"Template '{template_name}' not found")
+        template_description, lines = template
         
+        vat_rate = AccountingEngine.get_vat_rate(conn)
         journal_id = IDGenerator.generate_date_based_id("JNL", conn)
-        description = f"{template['description']} {additional_description}".strip()
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO Data_Journal (journal_id, description, reference_id) VALUES (?, ?, ?)", (journal_id, description, reference_id))
-        
+        rows = []
         total_debit, total_credit = 0.0, 0.0
-        for entry in template['entries']:
-            entry_amount = eval(entry['amount_formula'], {'main': amount}) if 'amount_formula' in entry else amount
-            if entry['type'] == 'debit':
-                cursor.execute("INSERT INTO Data_JournalEntries (journal_id, account_code, debit, credit) VALUES (?, ?, ?, 0)", (journal_id, entry['account'], entry_amount))
+        for account, is_debit, amount_fn in lines:
+            entry_amount = amount_fn(amount, vat_rate) if amount_fn else amount
+            if is_debit:
+                rows.append((journal_id, account, entry_amount, 0))
                 total_debit += entry_amount
             else:
-                cursor.execute("INSERT INTO Data_JournalEntries (journal_id, account_code, debit, credit) VALUES (?, ?, 0, ?)", (journal_id, entry['account'], entry_amount))
+                rows.append((journal_id, account, 0, entry_amount))
                 total_credit += entry_amount
         
         if round(total_debit, 2) != round(total_credit, 2):
             raise ValueError(f"Balance Error: Dr={total_debit}, Cr={total_credit}")
+
+        description = f"{template_description} {additional_description}".strip()
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO Data_Journal (journal_id, description, reference_id) VALUES (?, ?, ?)", (journal_id, description, reference_id))
+        cursor.executemany("INSERT INTO Data_JournalEntries (journal_id, account_code, debit, credit) VALUES (?, ?, ?, ?)", rows)
+        emit_event(conn, "journal_posted", {"journal_id": journal_id, "template": template_name, "reference_id": reference_id,
+                                            "amount": amount, "description": description})
         return journal_id
 
+    @staticmethod
+    def post(template_name: str, amount: float, reference_id: str, additional_description: str = "") -> str:
+        """บันทึกบัญชีใน transaction ของตัวเอง (BEGIN IMMEDIATE + retry เมื่อฐานข้อมูลถูกล็อก)"""
+        return run_write_transaction(
+            lambda conn: AccountingEngine.create_journal_entry(conn, template_name, amount, reference_id, additional_description)
+        )
+
+    @staticmethod
+    def create_journal_batch(conn: sqlite3.Connection, items: List[Tuple], atomic: bool = False) -> Dict:
+        """
+        ลงบัญชีหลายรายการใน transaction ของผู้เรียก: items = [(template, amount, reference_id[, description]), ...]
+        ตรวจ template/ยอดเงิน/ผังบัญชี/ความสมดุลก่อนเขียน แล้ว INSERT หัวและบรรทัดด้วย executemany
+        รายการที่ไม่ผ่านถูกรายงานใน failed (atomic=True = ยกเลิกทั้งชุดด้วย ValueError)
+        """
+        vat_rate = AccountingEngine.get_vat_rate(conn)
+        accounts = {row[0] for row in conn.execute("SELECT account_code FROM Data_ChartOfAccounts")}
+        prepared, failed = [], []
+        for index, item in enumerate(items):
+            try:
+                if not isinstance(item, (tuple, list)) or not 3 <= len(item) <= 4:
+                    raise ValueError("รายการต้องเป็น (template, amount, reference_id[, description])")
+                template_name, amount, reference_id = item[:3]
+                template = AccountingEngine.COMPILED_TEMPLATES.get(template_name)
+                if not template:
+                    raise ValueError(f"Template '{template_name}' not found")
+                if isinstance(amount, bool) or not isinstance(amount, (int, float)) or not math.isfinite(amount) or amount < 0:
+                    raise ValueError(f"ยอดเงินไม่ถูกต้อง: {amount!r}")
+                template_description, lines = template
+                missing = sorted({account for account, _, _ in lines if account not in accounts})
+                if missing:
+                    raise ValueError(f"ไม่พบบัญชี {', '.join(missing)} ในผังบัญชี")
+
+                amounts = [amount_fn(amount, vat_rate) if amount_fn else amount for _, _, amount_fn in lines]
+                total_debit = math.fsum(value for value, (_, is_debit, _) in zip(amounts, lines) if is_debit)
+                total_credit = math.fsum(amounts) - total_debit
+                if round(total_debit, 2) != round(total_credit, 2):
+                    raise ValueError(f"Balance Error: Dr={total_debit}, Cr={total_credit}")
+
+                description = f"{template_description} {item[3] if len(item) > 3 else ''}".strip()
+                prepared.append((index, reference_id, description, lines, amounts))
+            except ValueError as e:
+                if atomic:
+                    raise ValueError(f"รายการที่ {index}: {e}") from e
+                reference_id = item[2] if isinstance(item, (tuple, list)) and len(item) > 2 else None
+                failed.append({"index": index, "reference_id": reference_id, "message": str(e)})
+
+        journal_ids = IDGenerator.reserve_date_based_ids("JNL", conn, len(prepared))
+        headers, rows, posted = [], [], []
+        for journal_id, (index, reference_id, description, lines, amounts) in zip(journal_ids, prepared):
+            headers.append((journal_id, description, reference_id))
+            emit_event(conn, "journal_posted", {"journal_id": journal_id, "template": items[index][0], "reference_id": reference_id,
+                                                "amount": items[index][1], "description": description})
+            for (account, is_debit, _), value in zip(lines, amounts):
+                rows.append((journal_id, account, value, 0) if is_debit else (journal_id, account, 0, value))
+            posted.append({"index": index, "reference_id": reference_id, "journal_id": journal_id})
+
+        cursor = conn.cursor()
+        cursor.executemany("INSERT INTO Data_Journal (journal_id, description, reference_id) VALUES (?, ?, ?)", headers)
+        cursor.executemany("INSERT INTO Data_JournalEntries (journal_id, account_code, debit, credit) VALUES (?, ?, ?, ?)", rows)
+        return {"success": not failed, "posted": posted, "failed": failed}
+
+    @staticmethod
+    def post_batch(items: List[Tuple], atomic: bool = False) -> Dict:
+        """create_journal_batch ใน transaction เดียวของตัวเอง (BEGIN IMMEDIATE + retry)"""
+        return run_write_transaction(lambda conn: AccountingEngine.create_journal_batch(conn, items, atomic))
+
 class EnhancedBookingEngine:
     @staticmethod
     def create_booking(customer_name: str, room_number: str, check_in: str, check_out: str, total_price: float) -> Dict:
+        cache = get_availability_cache()
+        versions = []
+
+        def book(conn: sqlite3.Connection) -> Dict:
+            versions.clear()
+            tree, before = cache.tree_for_write(conn) if cache else (None, None)
+            has_conflict, dates = DateFlatteningEngine.check_conflict_advanced(conn, room_number, check_in, check_out, interval_tree=tree)
+            if has_conflict: return {"success": False, "message": f"Conflict: {dates}"}
+            
+            booking_id = IDGenerator.generate_sequential_id("RES", conn)
+            conn.execute("INSERT INTO Data_Bookings (booking_id, customer_id, room_number, check_in, check_out, total_price, status) VALUES (?, ?, ?, ?, ?, ?, 'Confirmed')",
+                         (booking_id, customer_name, room_number, check_in, check_out, total_price))
+            
+            journal_id = AccountingEngine.create_journal_entry(conn, "deposit_received", total_price, booking_id, f"ห้อง {room_number}")
+            emit_event(conn, "booking_created", {"booking_id": booking_id, "customer_id": customer_name, "room_number": room_number,
+                                                 "check_in": check_in, "check_out": check_out, "total_price": total_price,
+                                                 "status": "Confirmed", "journal_id": journal_id})
+            if cache:
+                versions.extend([before, AvailabilityCache.current_version(conn), booking_id])
+            return {"success": True, "booking_id": booking_id, "journal_id": journal_id, "message": "Success"}
+
         try:
-            with get_db_connection() as conn:
-                has_conflict, dates = DateFlatteningEngine.check_conflict_advanced(conn, room_number, check_in, check_out)
-                if has_conflict: return {"success": False, "message": f"Conflict: {dates}"}
-                
-                booking_id = IDGenerator.generate_sequential_id("RES", conn)
-                conn.execute("INSERT INTO Data_Bookings (booking_id, customer_id, room_number, check_in, check_out, total_price, status) VALUES (?, ?, ?, ?, ?, ?, 'Confirmed')",
-                             (booking_id, customer_name, room_number, check_in, check_out, total_price))
-                
-                journal_id = AccountingEngine.create_journal_entry(conn, "deposit_received", total_price, booking_id, f"ห้อง {room_number}")
-                return {"success": True, "booking_id": booking_id, "journal_id": journal_id, "message": "Success"}
+            result = run_write_transaction(book)
+            if versions:
+                before, after, booking_id = versions
+                cache.write_through(before, after, lambda c: c.add_booking(room_number, check_in, check_out, booking_id))
+            if result.get("success"):
+                DashboardStats.invalidate()
+            return result
+        except Exception as e:
+            return {"success": False, "message": str(e)}
+
+    @staticmethod
+    def create_group_booking(rooms: List[str], check_in: str, check_out: str, prices, group_ref: str, customer_name: Optional[str] = None) -> Dict:
+        """
+        จองหลายห้องช่วงเดียวกันแบบ all-or-nothing (ทัวร์/งานแต่ง)
+        prices = ราคาต่อห้องเท่ากันทุกห้อง, list ตามลำดับ rooms หรือ dict {ห้อง: ราคา}
+        ตรวจการซ้อนทุกห้องใน query เดียว, จองเลขที่ครั้งเดียว และบันทึกมัดจำรวมเป็น journal เดียว
+        """
+        cache = get_availability_cache()
+        versions = []
+
+        def book(conn: sqlite3.Connection) -> Dict:
+            versions.clear()
+            before = AvailabilityCache.current_version(conn) if cache else None
+            placeholders = ", ".join("?" for _ in room_list)
+            rows = conn.execute(
+                "SELECT room_number, check_in, check_out FROM Data_Bookings "
+                f"WHERE room_number IN ({placeholders}) AND status NOT IN ('Cancelled', 'Checked-out') "
+                "AND check_in < ? AND check_out > ?",
+                (*room_list, check_out, check_in)
+            ).fetchall()
+            if rows:
+                conflicts: Dict[str, set] = {}
+                for row in rows:
+                    conflicts.setdefault(row['room_number'], set()).update(
+                        DateFlatteningEngine.overlapping_nights(check_in, check_out, row['check_in'], row['check_out']))
+                conflicts = {room: sorted(dates) for room, dates in sorted(conflicts.items())}
+                return {"success": False, "message": f"Conflict: {', '.join(conflicts)}", "conflicts": conflicts}
+
+            booking_ids = IDGenerator.reserve_sequential_ids("RES", conn, len(room_list))
+            conn.executemany(
+                "INSERT INTO Data_Bookings (booking_id, customer_id, room_number, check_in, check_out, total_price, status) VALUES (?, ?, ?, ?, ?, ?, 'Confirmed')",
+                [(booking_id, customer, room, check_in, check_out, price) for booking_id, room, price in zip(booking_ids, room_list, price_list)]
+            )
+            journal_id = AccountingEngine.create_journal_entry(
+                conn, "deposit_received", math.fsum(price_list), group_ref, f"กลุ่ม {group_ref} {len(room_list)} ห้อง ({', '.join(room_list)})")
+            conn.executemany(
+                "INSERT INTO Data_GroupBookings (booking_id, group_ref, journal_id) VALUES (?, ?, ?)",
+                [(booking_id, group_ref, journal_id) for booking_id in booking_ids]
+            )
+            for booking_id, room, price in zip(booking_ids, room_list, price_list):
+                emit_event(conn, "booking_created", {"booking_id": booking_id, "customer_id": customer, "room_number": room,
+                                                     "check_in": check_in, "check_out": check_out, "total_price": price,
+                                                     "status": "Confirmed", "journal_id": journal_id, "group_ref": group_ref})
+            if cache:
+                versions.extend([before, AvailabilityCache.current_version(conn), booking_ids])
+            return {
+                "success": True,
+                "group_ref": group_ref,
+                "bookings": [{"booking_id": b, "room_number": r, "total_price": p} for b, r, p in zip(booking_ids, room_list, price_list)],
+                "total_price": math.fsum(price_list),
+                "journal_id": journal_id,
+                "message": "Success"
+            }
+
+        try:
+            if not group_ref:
+                raise ValueError("ต้องระบุ group_ref")
+            room_list = [str(room) for room in rooms or []]
+            if not room_list:
+                raise ValueError("ต้องระบุห้องอย่างน้อย 1 ห้อง")
+            duplicates = sorted({room for room in room_list if room_list.count(room) > 1})
+            if duplicates:
+                raise ValueError(f"ห้องซ้ำในรายการ: {', '.join(duplicates)}")
+            if isinstance(prices, dict):
+                missing = [room for room in room_list if room not in prices]
+                if missing:
+                    raise ValueError(f"ไม่มีราคาของห้อง: {', '.join(missing)}")
+                price_list = [float(prices[room]) for room in room_list]
+            elif isinstance(prices, (list, tuple)):
+                if len(prices) != len(room_list):
+                    raise ValueError("จำนวนราคาไม่ตรงกับจำนวนห้อง")
+                price_list = [float(price) for price in prices]
+            else:
+                price_list = [float(prices)] * len(room_list)
+            if any(not math.isfinite(price) or price < 0 for price in price_list):
+                raise ValueError("ราคาต้องเป็นตัวเลขที่ไม่ติดลบ")
+            DateFlatteningEngine.validate_range(check_in, check_out)
+            customer = customer_name or group_ref
+            result = run_write_transaction(book)
+            if versions:
+                before, after, booking_ids = versions
+
+                def add_group(c: AvailabilityCache):
+                    for booking_id, room in zip(booking_ids, room_list):
+                        c.add_booking(room, check_in, check_out, booking_id)
+
+                cache.write_through(before, after, add_group)
+            if result.get("success"):
+                DashboardStats.invalidate()
+            return result
         except Exception as e:
             return {"success": False, "message": str(e)}
 
@@ -159,29 +1089,447 @@ class EnhancedBookingEngine:
         """
         Check-out และรับรู้รายได้ตามหลักบัญชี
         """
-        try:
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT * FROM Data_Bookings WHERE booking_id = ?", (booking_id,))
-                booking = cursor.fetchone()
-                if not booking: return {"success": False, "message": "Booking not found"}
-                if booking['status'] == 'Checked-out': return {"success": False, "message": "Already checked-out"}
-
-                journal_id = AccountingEngine.create_journal_entry(
-                    conn=conn,
-                    template_name="revenue_recognition",
-                    amount=booking['total_price'],
-                    reference_id=booking_id,
-                    additional_description=f"ห้อง {booking['room_number']}"
-                )
+        cache = get_availability_cache()
+        versions = []
+
+        def checkout(conn: sqlite3.Connection) -> Dict:
+            versions.clear()
+            before = AvailabilityCache.current_version(conn) if cache else None
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM Data_Bookings WHERE booking_id = ?", (booking_id,))
+            booking = cursor.fetchone()
+            if not booking: return {"success": False, "message": "Booking not found"}
+            if booking['status'] == 'Checked-out': return {"success": False, "message": "Already checked-out"}
 
-                cursor.execute("UPDATE Data_Bookings SET status = 'Checked-out' WHERE booking_id = ?", (booking_id,))
-                cursor.execute("UPDATE ห้องพัก SET สถานะ = 'ว่าง', วันที่อัพเดท = CURRENT_TIMESTAMP WHERE เลขห้อง = ?", (booking['room_number'],))
-                
-                return {"success": True, "journal_id": journal_id, "message": "Checkout and Revenue Recognition Success"}
+            journal_id = AccountingEngine.create_journal_entry(
+                conn=conn,
+                template_name="revenue_recognition",
+                amount=booking['total_price'],
+                reference_id=booking_id,
+                additional_description=f"ห้อง {booking['room_number']}"
+            )
+
+            cursor.execute("UPDATE Data_Bookings SET status = 'Checked-out' WHERE booking_id = ?", (booking_id,))
+            cursor.execute("UPDATE ห้องพัก SET สถานะ = 'ว่าง', วันที่อัพเดท = CURRENT_TIMESTAMP WHERE เลขห้อง = ?", (booking['room_number'],))
+            emit_event(conn, "checkout_done", {"booking_id": booking_id, "room_number": booking['room_number'],
+                                               "total_price": booking['total_price'], "journal_id": journal_id})
+            emit_event(conn, "room_status_changed", {"room_number": booking['room_number'], "status": 'ว่าง'})
+            if cache:
+                versions.extend([before, AvailabilityCache.current_version(conn), booking['room_number']])
+            
+            return {"success": True, "journal_id": journal_id, "message": "Checkout and Revenue Recognition Success"}
+
+        def release_room(c: AvailabilityCache, room_number: str):
+            c.remove_booking(room_number, booking_id)
+            c.set_room_status(room_number, 'ว่าง')
+
+        try:
+            result = run_write_transaction(checkout)
+            if versions:
+                before, after, room_number = versions
+                cache.write_through(before, after, lambda c: release_room(c, room_number))
+            if result.get("success"):
+                DashboardStats.invalidate()
+            return result
         except Exception as e:
             return {"success": False, "message": str(e)}
 
+class AvailabilityService:
+    """
+    ค้นหาห้องว่างทุกห้องในช่วงวันที่ด้วย Query เดียว (Anti-join ห้องพัก กับ Data_Bookings ที่ทับซ้อน)
+    """
+
+    @staticmethod
+    def search(check_in: str, check_out: str, room_type: Optional[str] = None, min_price: Optional[float] = None, max_price: Optional[float] = None, room_status: Optional[str] = None, use_cache: bool = True) -> List[Dict]:
+        """
+        คืนรายการห้องที่ว่างตลอดช่วง [check_in, check_out) พร้อมราคาต่อคืนและราคารวม
+        ห้องที่สถานะ 'ซ่อมแซม' จะไม่ถูกนำมาเสนอ, room_status ใช้กรองสถานะปัจจุบันเพิ่มเติม (เช่น 'ว่าง')
+        ตอบจาก AvailabilityCache เมื่อเปิดใช้ (use_cache=False = query ตรง)
+        """
+        nights = DateFlatteningEngine.validate_range(check_in, check_out)
+
+        query = '''
+            SELECT r.เลขห้อง AS room_number, r.ประเภท AS room_type, r.ราคา AS nightly_price, r.สถานะ AS status
+            FROM ห้องพัก r
+            WHERE COALESCE(r.สถานะ, '') != 'ซ่อมแซม'
+              AND NOT EXISTS (
+                  SELECT 1 FROM Data_Bookings b
+                  WHERE b.room_number = r.เลขห้อง
+                    AND b.status NOT IN ('Cancelled', 'Checked-out')
+                    AND b.check_in < ? AND b.check_out > ?
+              )
+        '''
+        params: List = [check_out, check_in]
+        if room_type is not None:
+            query += " AND r.ประเภท = ?"
+            params.append(room_type)
+        if min_price is not None:
+            query += " AND r.ราคา >= ?"
+            params.append(min_price)
+        if max_price is not None:
+            query += " AND r.ราคา <= ?"
+            params.append(max_price)
+        if room_status is not None:
+            query += " AND r.สถานะ = ?"
+            params.append(room_status)
+        query += " ORDER BY r.เลขห้อง"
+
+        cache = get_availability_cache() if use_cache else None
+        if cache and not cache.verify:
+            rows = cache.available_rooms(check_in, check_out, room_type, min_price, max_price, room_status)
+        else:
+            with get_db_connection() as conn:
+                rows = [dict(row) for row in conn.execute(query, params).fetchall()]
+            if cache:
+                cached = cache.available_rooms(check_in, check_out, room_type, min_price, max_price, room_status)
+                if cached != rows:
+                    cache.record_mismatch(f"search {check_in}..{check_out}", [r['room_number'] for r in cached], [r['room_number'] for r in rows])
+
+        results = []
+        for row in rows:
+            room = dict(row)
+            room['nights'] = nights
+            room['total_price'] = (room['nightly_price'] or 0) * nights
+            results.append(room)
+        return results
+
+DASHBOARD_CACHE_TTL = float(os.environ.get('DASHBOARD_CACHE_TTL', 5))
+
+class DashboardStats:
+    """
+    ตัวเลขแดชบอร์ด (ห้องพัก/การจอง/ผู้เข้าพัก/รายการบัญชี) จาก query เดียว ใช้ร่วมกันระหว่าง Bot, Web และ CLI
+    cache ผลไว้ DASHBOARD_CACHE_TTL วินาที และล้างทันทีเมื่อมีการจอง/เช็คเอาท์ผ่าน EnhancedBookingEngine
+    """
+    QUERY = '''
+        WITH bookings AS (
+            SELECT COUNT(*) AS total_bookings,
+                   COALESCE(SUM(CASE WHEN status IN ('Confirmed', 'Checked-in') THEN 1 ELSE 0 END), 0) AS active_bookings,
+                   COALESCE(SUM(CASE WHEN status = 'Checked-in' THEN 1 ELSE 0 END), 0) AS checked_in
+            FROM Data_Bookings
+        ),
+        journals AS (
+            SELECT COUNT(*) AS journal_count FROM Data_Journal
+        ),
+        guests AS (
+            SELECT COUNT(*) AS guests_in_house FROM ผู้เข้าพัก WHERE สถานะ = 'เข้าพัก'
+        ),
+        room_types AS (
+            SELECT ประเภท AS room_type,
+                   COUNT(*) AS rooms,
+                   SUM(CASE WHEN สถานะ = 'มีผู้เข้าพัก' THEN 1 ELSE 0 END) AS occupied,
+                   SUM(CASE WHEN สถานะ = 'ว่าง' THEN 1 ELSE 0 END) AS vacant,
+                   AVG(ราคา) AS average_price
+            FROM ห้องพัก
+            GROUP BY ประเภท
+        )
+        SELECT b.*, j.*, g.*, t.*
+        FROM bookings b CROSS JOIN journals j CROSS JOIN guests g
+        LEFT JOIN room_types t ON 1
+        ORDER BY t.room_type
+    '''
+
+    _cache: Dict[str, Tuple[float, Dict]] = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def compute(conn: sqlite3.Connection) -> Dict:
+        rows = [dict(row) for row in conn.execute(DashboardStats.QUERY)]
+        first = rows[0]
+        by_type = [
+            {key: row[key] for key in ('room_type', 'rooms', 'occupied', 'vacant', 'average_price')}
+            for row in rows if row['room_type'] is not None
+        ]
+        total = sum(t['rooms'] for t in by_type)
+        occupied = sum(t['occupied'] for t in by_type)
+        vacant = sum(t['vacant'] for t in by_type)
+        return {
+            "rooms": {
+                "total": total,
+                "occupied": occupied,
+                "vacant": vacant,
+                "other": total - occupied - vacant,
+                "occupancy_rate": round(occupied / total * 100, 1) if total else 0.0
+            },
+            "by_type": by_type,
+            "bookings": {"total": first['total_bookings'], "active": first['active_bookings'], "checked_in": first['checked_in']},
+            "guests_in_house": first['guests_in_house'],
+            "journal_count": first['journal_count'],
+            "generated_at": datetime.datetime.now().isoformat(timespec='seconds')
+        }
+
+    @staticmethod
+    def get(max_age: float = DASHBOARD_CACHE_TTL) -> Dict:
+        """คืนสถิติที่ cache ไว้ถ้าอายุไม่เกิน max_age วินาที ไม่งั้นคำนวณใหม่ (ผู้เรียกพร้อมกันรอผลเดียวกัน)"""
+        with DashboardStats._lock:
+            cached = DashboardStats._cache.get(DB_PATH)
+            if cached and time.monotonic() - cached[0] < max_age:
+                return cached[1]
+            with get_db_connection() as conn:
+                stats = DashboardStats.compute(conn)
+            DashboardStats._cache[DB_PATH] = (time.monotonic(), stats)
+            return stats
+
+    @staticmethod
+    def invalidate():
+        with DashboardStats._lock:
+            DashboardStats._cache.pop(DB_PATH, None)
+
+class OccupancyCalendar:
+    """
+    ตารางการเข้าพักห้อง × วัน แบบ Run-Length Encoded คำนวณด้วยการกวาดการจองรอบเดียว
+    """
+    MAX_DAYS = 366
+
+    @staticmethod
+    def build_matrix(conn: sqlite3.Connection, start_date: str, end_date: str) -> Dict:
+        """
+        สร้าง matrix ช่วง [start_date, end_date) - แต่ละห้องเป็นลิสต์ของ [จำนวนวัน, booking_id หรือ None]
+        ผลรวมจำนวนวันของแต่ละห้องเท่ากับ days เสมอ
+        """
+        days = DateFlatteningEngine.validate_range(start_date, end_date)
+        if days > OccupancyCalendar.MAX_DAYS:
+            raise ValueError(f"ช่วงวันที่ยาวเกินไป (สูงสุด {OccupancyCalendar.MAX_DAYS} วัน)")
+        origin = datetime.date.fromisoformat(start_date).toordinal()
+
+        rooms: Dict[str, List[list]] = {
+            str(row[0]): [] for row in conn.execute("SELECT เลขห้อง FROM ห้องพัก ORDER BY เลขห้อง")
+        }
+        filled: Dict[str, int] = {}
+
+        # กวาดการจองที่ทับช่วงเวลา เรียงตามห้องและวันเข้าพัก (ใช้ index room_number, status, check_in, check_out)
+        cursor = conn.execute('''
+            SELECT room_number, check_in, check_out, booking_id FROM Data_Bookings
+            WHERE status NOT IN ('Cancelled', 'Checked-out') AND check_in < ? AND check_out > ?
+            ORDER BY room_number, check_in
+        ''', (end_date, start_date))
+        for room_number, check_in, check_out, booking_id in cursor:
+            room = str(room_number)
+            pos = filled.get(room, 0)
+            start = max(datetime.date.fromisoformat(check_in).toordinal() - origin, pos)
+            end = min(datetime.date.fromisoformat(check_out).toordinal() - origin, days)
+            if end <= start:
+                continue
+            runs = rooms.setdefault(room, [])
+            if start > pos:
+                runs.append([start - pos, None])
+            runs.append([end - start, booking_id])
+            filled[room] = end
+
+        for room, runs in rooms.items():
+            pos = filled.get(room, 0)
+            if pos < days:
+                runs.append([days - pos, None])
+
+        return {"from": start_date, "to": end_date, "days": days, "rooms": rooms}
+
+class PaginatedQueries:
+    """
+    Keyset pagination สำหรับรายการจองและสมุดรายวัน (ไม่ใช้ OFFSET - หน้าลึกๆ ยังเร็วเท่าหน้าแรก)
+    cursor เป็นสตริง "<ค่าเรียงลำดับ>,<id>" ของแถวสุดท้ายในหน้าก่อน - ค่าเรียงลำดับที่เป็น NULL ใช้ '' (อยู่ท้ายสุด)
+    """
+    DEFAULT_LIMIT = 50
+    MAX_LIMIT = 500
+
+    @staticmethod
+    def _limit(limit: Optional[int]) -> int:
+        if not limit:
+            return PaginatedQueries.DEFAULT_LIMIT
+        return max(1, min(int(limit), PaginatedQueries.MAX_LIMIT))
+
+    @staticmethod
+    def _split_cursor(after: str) -> Tuple[str, str]:
+        sort_value, sep, row_id = after.rpartition(',')
+        if not sep or not row_id:
+            raise ValueError(f"cursor ไม่ถูกต้อง: {after}")
+        return sort_value, row_id
+
+    @staticmethod
+    def _page(conn: sqlite3.Connection, select: str, where: List[str], params: List, order: str, limit: int, cursor_of, with_total: bool, count_from: str, count_where: List[str], count_params: List) -> Dict:
+        query = select
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += f" ORDER BY {order} LIMIT ?"
+        rows = [dict(row) for row in conn.execute(query, params + [limit + 1])]
+
+        page = {"items": rows[:limit], "limit": limit, "next_cursor": cursor_of(rows[limit - 1]) if len(rows) > limit else None}
+        if with_total:
+            count_query = f"SELECT COUNT(*) FROM {count_from}"
+            if count_where:
+                count_query += " WHERE " + " AND ".join(count_where)
+            page["total"] = conn.execute(count_query, count_params).fetchone()[0]
+        return page
+
+    @staticmethod
+    def bookings(conn: sqlite3.Connection, after: Optional[str] = None, limit: Optional[int] = None, status: Optional[str] = None, room_number: Optional[str] = None, date_from: Optional[str] = None, date_to: Optional[str] = None, with_total: bool = False) -> Dict:
+        """
+        รายการจองเรียงจากใหม่ไปเก่า (COALESCE(created_at, '') DESC, booking_id DESC)
+        date_from/date_to กรองการจองที่ช่วงเข้าพักทับ [date_from, date_to)
+        """
+        limit = PaginatedQueries._limit(limit)
+        where, params = [], []
+        if status:
+            where.append("status = ?")
+            params.append(status)
+        if room_number:
+            where.append("room_number = ?")
+            params.append(room_number)
+        if date_from:
+            where.append("check_out > ?")
+            params.append(date_from)
+        if date_to:
+            where.append("check_in < ?")
+            params.append(date_to)
+        filter_where, filter_params = list(where), list(params)
+        if after:
+            created_at, booking_id = PaginatedQueries._split_cursor(after)
+            where.append("(COALESCE(created_at, ''), booking_id) < (?, ?)")
+            params.extend([created_at, booking_id])
+
+        return PaginatedQueries._page(
+            conn, "SELECT * FROM Data_Bookings", where, params,
+            "COALESCE(created_at, '') DESC, booking_id DESC", limit,
+            lambda row: f"{row['created_at'] or ''},{row['booking_id']}",
+            with_total, "Data_Bookings", filter_where, filter_params
+        )
+
+    @staticmethod
+    def journal_lines(conn: sqlite3.Connection, after: Optional[str] = None, limit: Optional[int] = None, account_code: Optional[str] = None, date_from: Optional[str] = None, date_to: Optional[str] = None, with_total: bool = False) -> Dict:
+        """
+        รายการบัญชีรายบรรทัดเรียงจากใหม่ไปเก่า (COALESCE(transaction_date, '') DESC, entry_id DESC)
+        date_from/date_to กรอง transaction_date ในช่วง [date_from, date_to)
+        """
+        limit = PaginatedQueries._limit(limit)
+        where, params = [], []
+        if account_code:
+            where.append("e.account_code = ?")
+            params.append(account_code)
+        if date_from:
+            where.append("j.transaction_date >= ?")
+            params.append(date_from)
+        if date_to:
+            where.append("j.transaction_date < ?")
+            params.append(date_to)
+        filter_where, filter_params = list(where), list(params)
+        if after:
+            transaction_date, entry_id = PaginatedQueries._split_cursor(after)
+            where.append("(COALESCE(j.transaction_date, ''), e.entry_id) < (?, ?)")
+            params.extend([transaction_date, int(entry_id)])
+
+        return PaginatedQueries._page(
+            conn,
+            '''SELECT j.journal_id, j.transaction_date, j.description, e.entry_id,
+                      e.account_code, c.account_name, e.debit, e.credit
+               FROM Data_Journal j
+               JOIN Data_JournalEntries e ON j.journal_id = e.journal_id
+               JOIN Data_ChartOfAccounts c ON e.account_code = c.account_code''',
+            where, params,
+            "COALESCE(j.transaction_date, '') DESC, e.entry_id DESC", limit,
+            lambda row: f"{row['transaction_date'] or ''},{row['entry_id']}",
+            with_total, "Data_Journal j JOIN Data_JournalEntries e ON j.journal_id = e.journal_id", filter_where, filter_params
+        )
+
+class AccountBalanceLedger:
+    """
+    ยอดสะสมต่อบัญชีใน Data_AccountBalances (อัปเดตโดย trigger ของ Data_JournalEntries)
+    verify() เทียบกับการคำนวณใหม่จากรายการดิบ, rebuild() คำนวณใหม่ทั้งหมด
+    """
+
+    @staticmethod
+    def rebuild(conn: sqlite3.Connection) -> int:
+        """คำนวณยอดสะสมใหม่จาก Data_JournalEntries (ใช้ใน transaction ของผู้เรียก)"""
+        conn.execute("DELETE FROM Data_AccountBalances")
+        conn.execute('''
+            INSERT INTO Data_AccountBalances (account_code, total_debit, total_credit, entry_count)
+            SELECT account_code, COALESCE(SUM(debit), 0), COALESCE(SUM(credit), 0), COUNT(*)
+            FROM Data_JournalEntries
+            GROUP BY account_code
+        ''')
+        return conn.execute("SELECT COUNT(*) FROM Data_AccountBalances").fetchone()[0]
+
+    @staticmethod
+    def verify(conn: sqlite3.Connection) -> List[Dict]:
+        """คืนรายการบัญชีที่ยอดใน ledger ไม่ตรงกับผลรวมจากรายการดิบ (ว่าง = ถูกต้อง)"""
+        cursor = conn.execute('''
+            WITH raw AS (
+                SELECT account_code, COALESCE(SUM(debit), 0) AS total_debit, COALESCE(SUM(credit), 0) AS total_credit, COUNT(*) AS entry_count
+                FROM Data_JournalEntries GROUP BY account_code
+            ),
+            codes AS (
+                SELECT account_code FROM raw UNION SELECT account_code FROM Data_AccountBalances
+            )
+            SELECT k.account_code,
+                   COALESCE(r.total_debit, 0) AS raw_debit, COALESCE(b.total_debit, 0) AS ledger_debit,
+                   COALESCE(r.total_credit, 0) AS raw_credit, COALESCE(b.total_credit, 0) AS ledger_credit,
+                   COALESCE(r.entry_count, 0) AS raw_count, COALESCE(b.entry_count, 0) AS ledger_count
+            FROM codes k
+            LEFT JOIN raw r ON r.account_code = k.account_code
+            LEFT JOIN Data_AccountBalances b ON b.account_code = k.account_code
+        ''')
+        mismatches = []
+        for row in cursor:
+            row = dict(row)
+            if (round(row['raw_debit'] - row['ledger_debit'], 2) != 0
+                    or round(row['raw_credit'] - row['ledger_credit'], 2) != 0
+                    or row['raw_count'] != row['ledger_count']):
+                mismatches.append(row)
+        return mismatches
+
+class DailyAccountTotals:
+    """
+    ยอดรายวันต่อบัญชีใน Data_DailyAccountTotals (อัปเดตโดย trigger ตอนลงบัญชี)
+    ใช้ทำงบกำไรขาดทุนตามช่วงเวลาโดยไม่ต้องอ่านรายการบัญชีย้อนหลังทั้งหมด
+    """
+
+    @staticmethod
+    def rebuild(conn: sqlite3.Connection) -> int:
+        """คำนวณยอดรายวันใหม่จาก Data_Journal + Data_JournalEntries (ใช้ใน transaction ของผู้เรียก)"""
+        conn.execute("DELETE FROM Data_DailyAccountTotals")
+        conn.execute('''
+            INSERT INTO Data_DailyAccountTotals (day, account_code, total_debit, total_credit, entry_count)
+            SELECT date(j.transaction_date), e.account_code, COALESCE(SUM(e.debit), 0), COALESCE(SUM(e.credit), 0), COUNT(*)
+            FROM Data_JournalEntries e
+            JOIN Data_Journal j ON j.journal_id = e.journal_id
+            GROUP BY date(j.transaction_date), e.account_code
+        ''')
+        return conn.execute("SELECT COUNT(*) FROM Data_DailyAccountTotals").fetchone()[0]
+
+    @staticmethod
+    def verify(conn: sqlite3.Connection) -> List[Dict]:
+        """คืนรายการ (วัน, บัญชี) ที่ยอดรายวันไม่ตรงกับผลรวมจากรายการดิบ (ว่าง = ถูกต้อง)"""
+        cursor = conn.execute('''
+            WITH raw AS (
+                SELECT date(j.transaction_date) AS day, e.account_code,
+                       COALESCE(SUM(e.debit), 0) AS total_debit, COALESCE(SUM(e.credit), 0) AS total_credit, COUNT(*) AS entry_count
+                FROM Data_JournalEntries e
+                JOIN Data_Journal j ON j.journal_id = e.journal_id
+                GROUP BY date(j.transaction_date), e.account_code
+            ),
+            rollup AS (
+                SELECT * FROM Data_DailyAccountTotals WHERE entry_count != 0 OR total_debit != 0 OR total_credit != 0
+            ),
+            keys AS (
+                SELECT day, account_code FROM raw UNION SELECT day, account_code FROM rollup
+            )
+            SELECT k.day, k.account_code,
+                   COALESCE(r.total_debit, 0) AS raw_debit, COALESCE(t.total_debit, 0) AS ledger_debit,
+                   COALESCE(r.total_credit, 0) AS raw_credit, COALESCE(t.total_credit, 0) AS ledger_credit,
+                   COALESCE(r.entry_count, 0) AS raw_count, COALESCE(t.entry_count, 0) AS ledger_count
+            FROM keys k
+            LEFT JOIN raw r ON r.day = k.day AND r.account_code = k.account_code
+            LEFT JOIN rollup t ON t.day = k.day AND t.account_code = k.account_code
+        ''')
+        mismatches = []
+        for row in cursor:
+            row = dict(row)
+            if (round(row['raw_debit'] - row['ledger_debit'], 2) != 0
+                    or round(row['raw_credit'] - row['ledger_credit'], 2) != 0
+                    or row['raw_count'] != row['ledger_count']):
+                mismatches.append(row)
+        return mismatches
+
+# คอลัมน์ที่ใช้จัดกลุ่มงวดของงบกำไรขาดทุน
+INCOME_STATEMENT_BUCKETS = {'day': 't.day', 'month': 'substr(t.day, 1, 7)'}
+
 class FinancialReporting:
     """
     ระบบรายงานทางการเงินแบบ Real-time
@@ -193,96 +1541,174 @@ class FinancialReporting:
         ดึงงบทดลอง (Trial Balance) เพื่อตรวจสอบความสมดุล
         """
         cursor = conn.cursor()
+        # อ่านจากยอดสะสม Data_AccountBalances (หนึ่งแถวต่อบัญชี) แทนการ SUM ทุกรายการ
         cursor.execute('''
             SELECT 
                 c.account_code,
                 c.account_name,
                 c.category,
-                COALESCE(SUM(e.debit), 0) as total_debit,
-                COALESCE(SUM(e.credit), 0) as total_credit,
-                COALESCE(SUM(e.debit - e.credit), 0) as balance
+                COALESCE(b.total_debit, 0) as total_debit,
+                COALESCE(b.total_credit, 0) as total_credit,
+                COALESCE(b.total_debit - b.total_credit, 0) as balance
             FROM Data_ChartOfAccounts c
-            LEFT JOIN Data_JournalEntries e ON c.account_code = e.account_code
-            GROUP BY c.account_code, c.account_name, c.category
+            LEFT JOIN Data_AccountBalances b ON c.account_code = b.account_code
             ORDER BY c.account_code
         ''')
         
         return [dict(row) for row in cursor.fetchall()]
     
     @staticmethod
-    def get_income_statement(conn: sqlite3.Connection) -> Dict:
+    def get_income_statement(conn: sqlite3.Connection, start: Optional[str] = None, end: Optional[str] = None, granularity: str = 'day') -> Dict:
         """
-        งบกำไรขาดทุน (Income Statement)
+        งบกำไรขาดทุน (Income Statement) ช่วง start..end (รวมทั้งสองวัน, YYYY-MM-DD; ไม่ระบุ = ทั้งหมด)
+        แยกยอดตามงวด granularity = 'day' | 'month' จาก Data_DailyAccountTotals
         """
+        bucket = INCOME_STATEMENT_BUCKETS.get(granularity)
+        if bucket is None:
+            raise ValueError(f"granularity ต้องเป็น {' หรือ '.join(INCOME_STATEMENT_BUCKETS)}")
+        for value in (start, end):
+            if value:
+                datetime.date.fromisoformat(value)
+        if start and end and start > end:
+            raise ValueError("วันที่เริ่มต้องไม่อยู่หลังวันที่สิ้นสุด")
+
         cursor = conn.cursor()
-        
-        # รายได้ (Revenue - Category 4)
-        cursor.execute('''
-            SELECT COALESCE(SUM(e.credit - e.debit), 0) as revenue
-            FROM Data_JournalEntries e
-            JOIN Data_ChartOfAccounts c ON e.account_code = c.account_code
-            WHERE c.category = 'Revenue'
-        ''')
-        row = cursor.fetchone()
-        revenue = row['revenue'] if row else 0
-        
-        # ค่าใช้จ่าย (Expenses - Category 5)
-        cursor.execute('''
-            SELECT COALESCE(SUM(e.debit - e.credit), 0) as expenses
-            FROM Data_JournalEntries e
-            JOIN Data_ChartOfAccounts c ON e.account_code = c.account_code
-            WHERE c.category = 'Expenses'
-        ''')
-        row = cursor.fetchone()
-        expenses = row['expenses'] if row else 0
+        # รายได้ (Revenue - Category 4) และค่าใช้จ่าย (Expenses - Category 5) ต่องวด
+        cursor.execute(f'''
+            SELECT 
+                {bucket} as period,
+                COALESCE(SUM(CASE WHEN c.category = 'Revenue' THEN t.total_credit - t.total_debit END), 0) as revenue,
+                COALESCE(SUM(CASE WHEN c.category = 'Expenses' THEN t.total_debit - t.total_credit END), 0) as expenses
+            FROM Data_DailyAccountTotals t
+            JOIN Data_ChartOfAccounts c ON t.account_code = c.account_code
+            WHERE c.category IN ('Revenue', 'Expenses') AND t.day >= ? AND t.day <= ?
+            GROUP BY period
+            ORDER BY period
+        ''', (start or '0000-01-01', end or '9999-12-31'))
+
+        periods = []
+        revenue, expenses = 0, 0
+        for row in cursor.fetchall():
+            net = row['revenue'] - row['expenses']
+            periods.append({"period": row['period'], "revenue": row['revenue'], "expenses": row['expenses'], "net_profit": net})
+            revenue += row['revenue']
+            expenses += row['expenses']
         
         net_profit = revenue - expenses
         
         return {
+            "start": start,
+            "end": end,
+            "granularity": granularity,
             "revenue": revenue,
             "expenses": expenses,
             "net_profit": net_profit,
-            "profit_margin": (net_profit / revenue * 100) if revenue > 0 else 0
+            "profit_margin": (net_profit / revenue * 100) if revenue > 0 else 0,
+            "periods": periods
         }
 
 class HospitalityOperations:
+    @staticmethod
+    def utility_charge(room_number: str, electricity_old: float, electricity_new: float, water_old: float, water_new: float, electricity_rate: float = 8.0, water_rate: float = 20.0) -> Dict:
+        """คำนวณหน่วยและค่าไฟน้ำของห้อง (ยังไม่ลงบัญชี)"""
+        elec_unit = electricity_new - electricity_old
+        water_unit = water_new - water_old
+        
+        if elec_unit < 0 or water_unit < 0:
+            raise ValueError("ค่าใหม่ต้องไม่น้อยกว่าค่าเก่า")
+        
+        elec_price = elec_unit * electricity_rate
+        water_price = water_unit * water_rate
+        return {
+            "room": room_number,
+            "units": {"elec": elec_unit, "water": water_unit},
+            "prices": {"elec": elec_price, "water": water_price},
+            "total": elec_price + water_price
+        }
+
+    @staticmethod
+    def utility_journal_item(charge: Dict) -> Tuple:
+        return (
+            "utility_income",
+            charge["total"],
+            f"UTIL-{charge['room']}",
+            f"ค่าไฟ {charge['units']['elec']}u, ค่าน้ำ {charge['units']['water']}u ห้อง {charge['room']}"
+        )
+
     @staticmethod
     def calculate_utilities(room_number: str, electricity_old: float, electricity_new: float, water_old: float, water_new: float, electricity_rate: float = 8.0, water_rate: float = 20.0) -> Dict:
         """
         คำนวณค่าไฟน้ำและบันทึกบัญชีรายได้
         """
         try:
-            elec_unit = electricity_new - electricity_old
-            water_unit = water_new - water_old
-            
-            if elec_unit < 0 or water_unit < 0:
-                return {"success": False, "message": "ค่าใหม่ต้องไม่น้อยกว่าค่าเก่า"}
-            
-            elec_price = elec_unit * electricity_rate
-            water_price = water_unit * water_rate
-            total = elec_price + water_price
-            
-            with get_db_connection() as conn:
-                journal_id = AccountingEngine.create_journal_entry(
-                    conn=conn,
-                    template_name="utility_income",
-                    amount=total,
-                    reference_id=f"UTIL-{room_number}",
-                    additional_description=f"ค่าไฟ {elec_unit}u, ค่าน้ำ {water_unit}u ห้อง {room_number}"
+            charge = HospitalityOperations.utility_charge(room_number, electricity_old, electricity_new, water_old, water_new, electricity_rate, water_rate)
+            template_name, amount, reference_id, description = HospitalityOperations.utility_journal_item(charge)
+
+            def post(conn: sqlite3.Connection) -> str:
+                journal_id = AccountingEngine.create_journal_entry(conn, template_name, amount, reference_id, description)
+                emit_event(conn, "utility_charged", {**charge, "journal_id": journal_id})
+                return journal_id
+
+            charge["journal_id"] = run_write_transaction(post)
+            return {"success": True, "data": charge}
+        except Exception as e:
+            return {"success": False, "message": str(e)}
+
+    @staticmethod
+    def calculate_utilities_batch(readings: List[Dict], electricity_rate: float = 8.0, water_rate: float = 20.0) -> Dict:
+        """
+        วางบิลค่าไฟน้ำทั้งอาคารใน transaction เดียว
+        readings = [{"room_number", "electricity_old", "electricity_new", "water_old", "water_new"}, ...]
+        """
+        results: List[Optional[Dict]] = [None] * len(readings)
+        charges, positions = [], []
+        for index, reading in enumerate(readings):
+            try:
+                charge = HospitalityOperations.utility_charge(
+                    reading["room_number"], reading["electricity_old"], reading["electricity_new"],
+                    reading["water_old"], reading["water_new"], electricity_rate, water_rate
                 )
-                
-            return {
-                "success": True,
-                "data": {
-                    "room": room_number,
-                    "units": {"elec": elec_unit, "water": water_unit},
-                    "prices": {"elec": elec_price, "water": water_price},
-                    "total": total,
-                    "journal_id": journal_id
-                }
-            }
+            except KeyError as e:
+                results[index] = {"success": False, "room": reading.get("room_number"), "message": f"ไม่มีข้อมูล {e.args[0]}"}
+                continue
+            except (TypeError, ValueError, AttributeError) as e:
+                results[index] = {"success": False, "room": reading.get("room_number") if isinstance(reading, dict) else None, "message": str(e)}
+                continue
+            charges.append(charge)
+            positions.append(index)
+
+        def post_batch(conn: sqlite3.Connection) -> Dict:
+            batch = AccountingEngine.create_journal_batch(conn, [HospitalityOperations.utility_journal_item(c) for c in charges])
+            for posted in batch["posted"]:
+                emit_event(conn, "utility_charged", {**charges[posted["index"]], "journal_id": posted["journal_id"]})
+            return batch
+
+        try:
+            batch = run_write_transaction(post_batch)
         except Exception as e:
             return {"success": False, "message": str(e)}
+        for posted in batch["posted"]:
+            charge = charges[posted["index"]]
+            charge["journal_id"] = posted["journal_id"]
+            results[positions[posted["index"]]] = {"success": True, "data": charge}
+        for failure in batch["failed"]:
+            results[positions[failure["index"]]] = {"success": False, "room": charges[failure["index"]]["room"], "message": failure["message"]}
+        return {"success": all(r["success"] for r in results), "results": results}
 
 if __name__ == "__main__":
-    print("VIPAT ERP Core Engine v2.0 Integrated")
+    import sys
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "verify-balances":
+        with get_db_connection() as conn:
+            mismatches = AccountBalanceLedger.verify(conn) + DailyAccountTotals.verify(conn)
+        for row in mismatches:
+            print(f"❌ {row.get('day', 'total')} {row['account_code']}: Dr {row['ledger_debit']:,.2f} (raw {row['raw_debit']:,.2f}) | Cr {row['ledger_credit']:,.2f} (raw {row['raw_credit']:,.2f})")
+        print("✅ Account balances match journal entries" if not mismatches else f"⚠️ {len(mismatches)} account(s) out of sync - run rebuild-balances")
+        sys.exit(1 if mismatches else 0)
+    elif command == "rebuild-balances":
+        accounts = run_write_transaction(AccountBalanceLedger.rebuild)
+        days = run_write_transaction(DailyAccountTotals.rebuild)
+        print(f"✅ Rebuilt balances for {accounts} account(s) and {days} daily account total(s)")
+    else:
+        print("VIPAT ERP Core Engine v2.0 Integrated")
+        print("Usage: python3 -m database.models.db_access_v2 [verify-balances|rebuild-balances]")
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+VIPAT Hotel ERP - In-process Event Bus
+เหตุการณ์ที่เกิดจากการเขียนที่ commit แล้ว (จองห้อง, check-out, สถานะห้อง, ลงบัญชี) ส่งต่อให้ผู้ติดตามใน process เดียวกัน
+เช่น /api/events (SSE) - แต่ละผู้ติดตามมีคิวขนาดจำกัด และต่อใหม่จาก Last-Event-ID ได้ตราบที่เหตุการณ์ยังอยู่ในประวัติ
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# จำนวนเหตุการณ์ล่าสุดที่เก็บไว้ให้ผู้ติดตามที่หลุดไปต่อใหม่ได้ และขนาดคิวต่อผู้ติดตาม
+EVENT_HISTORY = int(os.environ.get('EVENT_HISTORY', 1000))
+EVENT_CLIENT_BUFFER = int(os.environ.get('EVENT_CLIENT_BUFFER', 256))
+
+# ผู้ติดตามต้องโหลดข้อมูลใหม่ทั้งหมด: คิวล้น, Last-Event-ID เก่ากว่าประวัติ หรือมาจาก process ก่อนรีสตาร์ท
+RESYNC = "resync"
+
+
+class Event:
+    """เหตุการณ์หนึ่งรายการ - frame ของ SSE ถูกสร้างครั้งเดียวแล้วใช้ร่วมกันทุกผู้ติดตาม"""
+    __slots__ = ("id", "seq", "type", "data", "time", "frame")
+
+    def __init__(self, event_id: str, seq: int, event_type: str, data: Dict):
+        self.id = event_id
+        self.seq = seq
+        self.type = event_type
+        self.data = data
+        self.time = time.time()
+        payload = json.dumps(data, ensure_ascii=False, default=str)
+        self.frame = f"id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n".encode('utf-8')
+
+
+class Subscription:
+    """
+    คิวของผู้ติดตามหนึ่งราย (ไม่เกิน max_buffer เหตุการณ์)
+    ผู้ติดตามที่อ่านไม่ทันจนคิวล้น: ทิ้งคิวทั้งหมดแล้วใส่ resync แทน - ไม่กินหน่วยความจำไม่จำกัด และไม่บล็อกผู้เขียน
+    """
+
+    def __init__(self, bus: "EventBus", max_buffer: int):
+        self.bus = bus
+        self.max_buffer = max(1, max_buffer)
+        self.overflows = 0
+        self._queue: deque = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def _push(self, events: List[Event]):
+        with self._cond:
+            if self._closed:
+                return
+            for event in events:
+                if len(self._queue) >= self.max_buffer:
+                    self._queue.clear()
+                    self._queue.append(self.bus.resync_event("overflow", event.seq))
+                    self.overflows += 1
+                else:
+                    self._queue.append(event)
+            self._cond.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[List[Event]]:
+        """รอและคืนเหตุการณ์ทั้งหมดในคิว ([] = หมดเวลา, None = ถูกปิดแล้ว)"""
+        with self._cond:
+            if not self._queue and not self._closed:
+                self._cond.wait(timeout)
+            if self._closed:
+                return None
+            events = list(self._queue)
+            self._queue.clear()
+            return events
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._queue.clear()
+            self._cond.notify_all()
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """
+    pub/sub ใน process: publish() หลัง commit, subscribe(last_event_id) สำหรับผู้ติดตาม
+    id ของเหตุการณ์ = "<boot>-<seq>" - boot เปลี่ยนทุกครั้งที่ process เริ่ม จึงรู้ว่า id ที่ client ส่งมาใช้ต่อได้หรือไม่
+    """
+
+    def __init__(self, history: int = EVENT_HISTORY, client_buffer: int = EVENT_CLIENT_BUFFER):
+        self.client_buffer = client_buffer
+        self.boot = format(time.time_ns() // 1_000_000, 'x')
+        self._seq = 0
+        self._history: deque = deque(maxlen=max(1, history))
+        self._subscribers: List[Subscription] = []
+        self._lock = threading.Lock()
+        self._stats = {"published": 0, "resumed": 0, "resyncs": 0}
+
+    def _event_id(self, seq: int) -> str:
+        return f"{self.boot}-{seq}"
+
+    def resync_event(self, reason: str, seq: Optional[int] = None) -> Event:
+        """เหตุการณ์ resync ที่มี id ของเหตุการณ์ล่าสุด - client โหลดข้อมูลใหม่แล้วรับต่อจากจุดนี้ได้"""
+        seq = self._seq if seq is None else seq
+        self._stats["resyncs"] += 1
+        return Event(self._event_id(seq), seq, RESYNC, {"reason": reason})
+
+    def publish(self, event_type: str, data: Dict) -> Event:
+        return self.publish_many([(event_type, data)])[-1]
+
+    def publish_many(self, items: Iterable[Tuple[str, Dict]]) -> List[Event]:
+        """ส่งหลายเหตุการณ์ (เช่น ทั้งหมดของ transaction หนึ่ง) ต่อกันโดยไม่มีเหตุการณ์อื่นแทรก"""
+        with self._lock:
+            events = []
+            for event_type, data in items:
+                self._seq += 1
+                event = Event(self._event_id(self._seq), self._seq, event_type, data)
+                self._history.append(event)
+                events.append(event)
+            self._stats["published"] += len(events)
+            subscribers = list(self._subscribers) if events else []
+            # ส่งเข้าคิวภายใต้ lock เพื่อให้ทุกผู้ติดตามเห็นลำดับเดียวกับ history
+            for subscription in subscribers:
+                subscription._push(events)
+        return events
+
+    def subscribe(self, last_event_id: Optional[str] = None, max_buffer: Optional[int] = None) -> Subscription:
+        """
+        ผู้ติดตามใหม่ - last_event_id (Last-Event-ID ของ EventSource) = ส่งเหตุการณ์ที่พลาดไปจากประวัติก่อน
+        ถ้าต่อจากจุดนั้นไม่ได้ (id เก่ากว่าประวัติหรือมาจาก process อื่น) เริ่มด้วย resync
+        """
+        subscription = Subscription(self, self.client_buffer if max_buffer is None else max_buffer)
+        with self._lock:
+            if last_event_id:
+                boot, _, seq = last_event_id.strip().rpartition('-')
+                oldest = self._history[0].seq if self._history else self._seq + 1
+                if boot != self.boot or not seq.isdigit() or int(seq) > self._seq or int(seq) < oldest - 1:
+                    subscription._push([self.resync_event("expired")])
+                else:
+                    missed = [event for event in self._history if event.seq > int(seq)]
+                    if missed:
+                        subscription._push(missed)
+                    self._stats["resumed"] += 1
+            self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    def last_event_id(self) -> str:
+        with self._lock:
+            return self._event_id(self._seq)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self._stats, "last_event_id": self._event_id(self._seq), "history": len(self._history),
+                    "subscribers": len(self._subscribers),
+                    "overflows": sum(s.overflows for s in self._subscribers)}
+
+
+bus = EventBus()
+
+
+def publish(event_type: str, data: Dict) -> Event:
+    """ส่งเหตุการณ์เข้า bus ของ process นี้"""
+    return bus.publish(event_type, data)
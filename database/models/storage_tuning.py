@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+VIPAT Hotel ERP - SQLite Storage Tuning
+ตั้งค่า WAL / PRAGMA สำหรับการเขียนพร้อมกันระหว่าง Bot และ Web, retry เมื่อฐานข้อมูลถูกล็อก และ WAL checkpoint
+"""
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional, TypeVar
+
+T = TypeVar('T')
+
+BUSY_TIMEOUT_MS = int(os.environ.get('DB_BUSY_TIMEOUT_MS', 5000))
+WRITE_RETRIES = int(os.environ.get('DB_WRITE_RETRIES', 5))
+CHECKPOINT_INTERVAL = float(os.environ.get('DB_CHECKPOINT_INTERVAL', 60))
+# WAL ที่ใหญ่เกินค่านี้จะถูก checkpoint แบบ TRUNCATE เพื่อคืนพื้นที่ดิสก์
+WAL_TRUNCATE_BYTES = int(os.environ.get('DB_WAL_TRUNCATE_BYTES', 16 * 1024 * 1024))
+
+# ลำดับมีผล: journal_mode ต้องตั้งก่อนเริ่ม transaction ใดๆ
+STORAGE_PRAGMAS: Dict[str, str] = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": str(BUSY_TIMEOUT_MS),
+    "cache_size": os.environ.get('DB_CACHE_SIZE', '-16000'),      # ค่าลบ = KiB (~16MB)
+    "mmap_size": os.environ.get('DB_MMAP_SIZE', str(256 * 1024 * 1024)),
+    "temp_store": "MEMORY",
+    "foreign_keys": "ON",
+}
+
+
+def is_busy_error(error: BaseException) -> bool:
+    """ข้อผิดพลาดชั่วคราวจากการแย่งล็อก (database is locked / busy) ที่ลองใหม่ได้"""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+def with_write_retry(operation: Callable[[], T], retries: int = WRITE_RETRIES, base_delay: float = 0.05, max_delay: float = 1.0) -> T:
+    """
+    รัน operation (ซึ่งเปิด/ปิด transaction เอง) ใหม่เมื่อเจอ database is locked
+    หน่วงเวลาแบบ exponential backoff + full jitter เพื่อไม่ให้ Bot และ Web ชนกันซ้ำ
+    """
+    attempt = 0
+    while True:
+        try:
+            return operation()
+        except sqlite3.OperationalError as e:
+            if not is_busy_error(e) or attempt >= retries:
+                raise
+            delay = min(max_delay, base_delay * (2 ** attempt))
+            time.sleep(random.uniform(0, delay))
+            attempt += 1
+
+
+class CheckpointScheduler(threading.Thread):
+    """
+    Background thread ที่ทำ WAL checkpoint เป็นระยะ
+    PASSIVE ตามปกติ (ไม่บล็อกผู้อ่าน/ผู้เขียน) และ TRUNCATE เมื่อไฟล์ -wal ใหญ่เกิน WAL_TRUNCATE_BYTES
+    """
+
+    def __init__(self, db_path: str, interval: float = CHECKPOINT_INTERVAL, truncate_bytes: int = WAL_TRUNCATE_BYTES):
+        super().__init__(name=f"wal-checkpoint:{os.path.basename(db_path)}", daemon=True)
+        self.db_path = db_path
+        self.interval = interval
+        self.truncate_bytes = truncate_bytes
+        self._stop_event = threading.Event()
+        self.last_result: Optional[Dict] = None
+
+    def checkpoint(self) -> Dict:
+        wal_path = f"{self.db_path}-wal"
+        wal_size = os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+        mode = "TRUNCATE" if wal_size > self.truncate_bytes else "PASSIVE"
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000)
+        try:
+            busy, log_frames, checkpointed = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+        finally:
+            conn.close()
+        self.last_result = {
+            "mode": mode,
+            "wal_bytes_before": wal_size,
+            "busy": busy,
+            "log_frames": log_frames,
+            "checkpointed_frames": checkpointed,
+            "at": time.time()
+        }
+        return self.last_result
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.checkpoint()
+            except sqlite3.Error as e:
+                print(f"⚠️ WAL checkpoint ล้มเหลว: {e}")
+
+    def stop(self):
+        self._stop_event.set()
+
+
+_schedulers: Dict[str, CheckpointScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def start_checkpoint_scheduler(db_path: str, interval: float = CHECKPOINT_INTERVAL) -> CheckpointScheduler:
+    """เริ่ม CheckpointScheduler หนึ่งตัวต่อไฟล์ฐานข้อมูลต่อ process"""
+    key = os.path.abspath(db_path)
+    with _schedulers_lock:
+        scheduler = _schedulers.get(key)
+        if scheduler is None or not scheduler.is_alive():
+            scheduler = CheckpointScheduler(key, interval)
+            scheduler.start()
+            _schedulers[key] = scheduler
+        return scheduler
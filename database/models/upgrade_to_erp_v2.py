@@ -7,7 +7,9 @@ import sqlite3
 import os
 from datetime import datetime
 import shutil
+import sys
 
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
 DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'โรงแรม.db')
 
 def backup_database():
@@ -82,6 +84,7 @@ def upgrade_schema():
         ('3110', 'กำไรสะสม', 'Equity', 'Retained Earnings'),
         ('3210', 'กำไร(ขาดทุน)สุทธิปีปัจจุบัน', 'Equity', 'Current Year'),
         ('4010', 'รายได้ค่าห้องพัก', 'Revenue', 'Room Revenue'),
+        ('4020', 'รายได้ค่าสาธารณูปโภค', 'Revenue', 'Utility Revenue'),
         ('4110', 'รายได้อาหารและเครื่องดื่ม', 'Revenue', 'F&B Revenue'),
         ('4210', 'รายได้บริการซักรีด', 'Revenue', 'Laundry Revenue'),
         ('4910', 'รายได้อื่นๆ', 'Revenue', 'Other Revenue'),
@@ -181,12 +184,16 @@ def upgrade_schema():
     ]
     cursor.executemany('INSERT OR REPLACE INTO System_Config (config_key, config_value, description) VALUES (?, ?, ?)', configs)
     
+    # ==================== PERFORMANCE INDEXES & SUPPORT TABLES ====================
+    sys.path.insert(0, PROJECT_ROOT)
+    from database.models.db_access_v2 import ensure_schema_extensions
+    ensure_schema_extensions(conn, force=True)
+    
     conn.commit()
     conn.close()
     print("✅ Schema Upgrade Integrated at Target!")
 
 if __name__ == "__main__":
-    import sys
     if len(sys.argv) > 1 and sys.argv[1] == "auto":
         upgrade_schema()
     else:
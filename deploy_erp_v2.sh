@@ -13,7 +13,11 @@ case "${1:-help}" in
         echo "Running Integrated System Test..."
         python3 scripts/maintenance/master_system_test.py
         ;;
+    verify-balances|rebuild-balances)
+        echo "Account balance ledger: $1..."
+        python3 -m database.models.db_access_v2 "$1"
+        ;;
     *)
-        echo "Usage: $0 [upgrade|test]"
+        echo "Usage: $0 [upgrade|test|verify-balances|rebuild-balances]"
         ;;
 esac
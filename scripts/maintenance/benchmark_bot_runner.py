@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+VIPAT Hotel ERP - Bot Runner Benchmark
+เปรียบเทียบลูป getUpdates แบบ thread (เริ่มทำงาน) กับ asyncio runner บน Fake Telegram API
+รันออฟไลน์บนสำเนาฐานข้อมูลชั่วคราว ไม่แตะข้อมูลจริงและไม่ต่อ api.telegram.org
+
+    python3 scripts/maintenance/benchmark_bot_runner.py [จำนวนข้อความ] [จำนวนแชท] [latency_ms]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, PROJECT_ROOT)
+os.environ.setdefault('BOT_POLL_TIMEOUT', '1')
+
+from bot.core.fake_telegram import FakeTelegramServer
+
+COMMANDS = ["🏠 ห้องพัก", "👥 ผู้เข้าพัก", "/start", "💾 ฐานข้อมูล"]
+
+
+def run_once(mode: str, messages: int, chats: int, latency: float, db_path: str) -> float:
+    server = FakeTelegramServer(latency=latency)
+    os.environ['TELEGRAM_API_URL'] = server.start()
+
+    import bot.core.telegram_client as telegram_client
+    telegram_client.API_URL = server.url
+    bot_module = __import__('bot.core.บอทโรงแรมSQLite', fromlist=['ระบบจัดการโรงแรมSQLite'])
+    bot_module.API_URL = server.url
+    bot = bot_module.ระบบจัดการโรงแรมSQLite()
+    bot.db_path = db_path
+
+    if mode == "async":
+        from bot.core.async_runner import AsyncBotRunner
+        import asyncio
+        runner = AsyncBotRunner(bot, api_url=server.url)
+        thread = threading.Thread(target=lambda: asyncio.run(runner.run()), daemon=True)
+    else:
+        thread = threading.Thread(target=bot.เริ่มทำงาน, daemon=True)
+
+    start = time.perf_counter()
+    thread.start()
+    for i in range(messages):
+        last_update = server.push_message(1000 + i % chats, COMMANDS[i % len(COMMANDS)])
+    # ข้อความตอบกลับของแชทเดียวกันอาจถูกรวม - วัดจนอัพเดทถูกรับ ประมวลผล และส่งออกหมด
+    deadline = time.monotonic() + 120
+    delivered = False
+    while time.monotonic() < deadline and not delivered:
+        pending = runner.stats()["pending"] if mode == "async" else getattr(bot, "dispatcher", None) and bot.dispatcher.stats()["pending"]
+        delivered = bot.offset > last_update and pending == 0 and bot.outbox.stats()["pending"] == 0
+        time.sleep(0.005)
+    elapsed = time.perf_counter() - start
+    bot.หยุดทำงาน()
+    thread.join(10)
+    server.stop()
+    status = f"  ส่ง {len(server.sent)} ข้อความ" if delivered else "  ⚠️ หมดเวลา"
+    print(f"  {mode:<10} {elapsed * 1000:9.1f} ms  ({messages / elapsed:7.1f} อัพเดท/วินาที){status}")
+    return elapsed
+
+
+def run_benchmark(messages: int = 200, chats: int = 50, latency_ms: float = 30):
+    print("=" * 80)
+    print(f"⏱️  BOT RUNNER BENCHMARK - {messages:,} ข้อความ / {chats} แชท / API latency {latency_ms:.0f} ms")
+    print("=" * 80)
+
+    import database.models.db_access_v2 as erp
+    workdir = tempfile.mkdtemp(prefix="bot-bench-")
+    try:
+        db_path = os.path.join(workdir, "bench.db")
+        shutil.copy(erp.DB_PATH, db_path)
+        erp.DB_PATH = db_path
+        threaded = run_once("threaded", messages, chats, latency_ms / 1000, db_path)
+        try:
+            import aiohttp  # noqa: F401
+        except ImportError:
+            print("  async      ข้าม - ไม่ได้ติดตั้ง aiohttp")
+            return
+        asynchronous = run_once("async", messages, chats, latency_ms / 1000, db_path)
+        print(f"  → async/threaded = {threaded / asynchronous:.2f}x")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run_benchmark(int(args[0]) if args else 200, int(args[1]) if len(args) > 1 else 50,
+                  float(args[2]) if len(args) > 2 else 30)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+VIPAT ERP v2.0 - Journal Posting Micro-benchmark
+เปรียบเทียบการลงบัญชีแบบเดิม (eval + INSERT ทีละบรรทัด) กับ template ที่คอมไพล์แล้ว + executemany
+รันบนสำเนาฐานข้อมูลชั่วคราว ไม่แตะข้อมูลจริง
+
+    python3 scripts/maintenance/benchmark_journal_posting.py [จำนวนรายการ]
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+import database.models.db_access_v2 as erp
+from database.models.db_access_v2 import AccountingEngine, IDGenerator
+
+TEMPLATE = "revenue_recognition"
+AMOUNT = 1500.0
+LEGACY_FORMULAS = {"main / (1 + vat_rate)": "main / 1.07", "main - main / (1 + vat_rate)": "main - (main / 1.07)"}
+
+
+def legacy_journal_entry(conn: sqlite3.Connection, template_name: str, amount: float, reference_id: str) -> str:
+    """เส้นทางเดิมก่อนคอมไพล์ template: eval ต่อบรรทัด และ cursor.execute ต่อบรรทัด"""
+    template = AccountingEngine.TEMPLATES[template_name]
+    journal_id = IDGenerator.generate_date_based_id("JNL", conn)
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO Data_Journal (journal_id, description, reference_id) VALUES (?, ?, ?)", (journal_id, template['description'], reference_id))
+    total_debit, total_credit = 0.0, 0.0
+    for entry in template['entries']:
+        entry_amount = eval(LEGACY_FORMULAS[entry['amount_formula']], {'main': amount}) if 'amount_formula' in entry else amount
+        if entry['type'] == 'debit':
+            cursor.execute("INSERT INTO Data_JournalEntries (journal_id, account_code, debit, credit) VALUES (?, ?, ?, 0)", (journal_id, entry['account'], entry_amount))
+            total_debit += entry_amount
+        else:
+            cursor.execute("INSERT INTO Data_JournalEntries (journal_id, account_code, debit, credit) VALUES (?, ?, 0, ?)", (journal_id, entry['account'], entry_amount))
+            total_credit += entry_amount
+    if round(total_debit, 2) != round(total_credit, 2):
+        raise ValueError(f"Balance Error: Dr={total_debit}, Cr={total_credit}")
+    return journal_id
+
+
+def legacy_amounts(amount: float):
+    return [eval(LEGACY_FORMULAS[e['amount_formula']], {'main': amount}) if 'amount_formula' in e else amount
+            for e in AccountingEngine.TEMPLATES[TEMPLATE]['entries']]
+
+
+def compiled_amounts(amount: float, vat_rate: float):
+    return [fn(amount, vat_rate) if fn else amount for _, _, fn in AccountingEngine.COMPILED_TEMPLATES[TEMPLATE][1]]
+
+
+def timed(label: str, count: int, work) -> float:
+    start = time.perf_counter()
+    for i in range(count):
+        work(i)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<28} {elapsed * 1000:9.1f} ms  ({elapsed / count * 1e6:8.1f} µs/รายการ)")
+    return elapsed
+
+
+def run_benchmark(count: int = 2000):
+    print("=" * 80)
+    print(f"⏱️  JOURNAL POSTING BENCHMARK - {TEMPLATE} x {count:,}")
+    print("=" * 80)
+
+    workdir = tempfile.mkdtemp(prefix="journal-bench-")
+    try:
+        db_path = os.path.join(workdir, "bench.db")
+        shutil.copy(erp.DB_PATH, db_path)
+        erp.DB_PATH = db_path
+        with erp.get_db_connection() as conn:
+            vat_rate = AccountingEngine.get_vat_rate(conn)
+        assert legacy_amounts(AMOUNT) == compiled_amounts(AMOUNT, 0.07), "ผลลัพธ์ไม่ตรงกัน"
+
+        print("\n📐 คำนวณยอด (ไม่รวมฐานข้อมูล)")
+        legacy = timed("eval ต่อบรรทัด", count, lambda i: legacy_amounts(AMOUNT + i))
+        compiled = timed("template คอมไพล์แล้ว", count, lambda i: compiled_amounts(AMOUNT + i, vat_rate))
+        print(f"  → เร็วขึ้น {legacy / compiled:.1f}x")
+
+        print("\n🗄️  ลงบัญชีจริง (transaction เดียว, rollback หลังวัด)")
+        results = []
+        for label, post in (
+            ("eval + execute ทีละบรรทัด", lambda conn, i: legacy_journal_entry(conn, TEMPLATE, AMOUNT + i, f"BENCH-{i}")),
+            ("compiled + executemany", lambda conn, i: AccountingEngine.create_journal_entry(conn, TEMPLATE, AMOUNT + i, f"BENCH-{i}")),
+        ):
+            with erp.get_write_connection() as conn:
+                results.append(timed(label, count, lambda i: post(conn, i)))
+                conn.rollback()
+        print(f"  → เร็วขึ้น {results[0] / results[1]:.2f}x")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
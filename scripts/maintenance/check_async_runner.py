@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+VIPAT Hotel ERP - AsyncBotRunner Offline Check
+ตรวจพฤติกรรมของ asyncio runner บน Fake Telegram API (ไม่ต่อ api.telegram.org ไม่แตะฐานข้อมูล) - exit 1 ถ้ามีข้อใดไม่ผ่าน
+- แชทเดียวกันประมวลผลและตอบกลับตามลำดับ ต่างแชททำขนานกันได้
+- getUpdates ล้มเหลวแล้วรอแบบ exponential backoff (นับใหม่หลังสำเร็จ) และไม่ทำอัพเดทหาย
+- stop() รอ handler ที่ค้างและคิวส่งข้อความให้หมดก่อนจบ
+
+    python3 scripts/maintenance/check_async_runner.py
+"""
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+from bot.core.fake_telegram import FakeTelegramServer
+from bot.core.telegram_client import OutboundQueue, TelegramClient
+from bot.core.update_dispatcher import update_chat_id
+
+failures = []
+
+
+def check(label, ok, detail=""):
+    if ok:
+        print(f"✅ {label}")
+    else:
+        failures.append(label)
+        print(f"❌ {label}{': ' + str(detail) if detail else ''}")
+
+
+class RecordingBot:
+    """บอทขั้นต่ำที่ AsyncBotRunner ใช้ - บันทึกลำดับที่ประมวลผลต่อแชท แล้วตอบข้อความเดิมกลับผ่าน outbox"""
+
+    def __init__(self, api_url: str, handler_delay: float = 0.0):
+        self.token = "TEST"
+        self.offset = 0
+        self.running = False
+        self.async_runner = None
+        self.telegram = TelegramClient(self.token, api_url=api_url)
+        self.outbox = OutboundQueue(self.telegram)
+        self.user_sessions = SimpleNamespace(close=lambda: None)
+        self.handler_delay = handler_delay
+        self.handled = defaultdict(list)
+        self.overlaps = 0
+        self.max_parallel = 0
+        self._active = set()
+        self._lock = threading.Lock()
+
+    def จัดการอัพเดท(self, update):
+        chat_id = update_chat_id(update)
+        with self._lock:
+            if chat_id in self._active:
+                self.overlaps += 1
+            self._active.add(chat_id)
+            self.max_parallel = max(self.max_parallel, len(self._active))
+        time.sleep(random.uniform(0, self.handler_delay))
+        with self._lock:
+            self._active.discard(chat_id)
+            self.handled[chat_id].append(update["message"]["text"])
+        self.outbox.send(chat_id, update["message"]["text"])
+
+
+def start_runner(server: FakeTelegramServer, handler_delay: float, workers: int = 8):
+    from bot.core.async_runner import AsyncBotRunner
+    bot = RecordingBot(server.url, handler_delay)
+    runner = AsyncBotRunner(bot, workers=workers, api_url=server.url, poll_timeout=1)
+    thread = threading.Thread(target=lambda: asyncio.run(runner.run()), name="async-runner", daemon=True)
+    thread.start()
+    return bot, runner, thread
+
+
+def wait_until(condition, timeout: float = 20) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def delivered_texts(server: FakeTelegramServer):
+    """ข้อความที่ส่งถึงแต่ละแชทตามลำดับ (แยกข้อความที่ outbox รวมกันออกเป็นรายการเดิม)"""
+    texts = defaultdict(list)
+    for message in server.sent:
+        texts[message["chat_id"]].extend(message["text"].split("\n\n"))
+    return texts
+
+
+def check_per_chat_ordering(chats: int = 8, per_chat: int = 6):
+    print("\n🔀 ลำดับต่อแชท")
+    server = FakeTelegramServer(latency=0.005)
+    server.start()
+    bot, runner, thread = start_runner(server, handler_delay=0.02)
+    try:
+        expected = defaultdict(list)
+        for i in range(per_chat):
+            for chat in range(chats):
+                text = f"m{i}"
+                server.push_message(2000 + chat, text)
+                expected[2000 + chat].append(text)
+        total = chats * per_chat
+        done = wait_until(lambda: runner.stats()["completed"] == total and sum(len(t) for t in delivered_texts(server).values()) == total)
+        check("ทุกอัพเดทถูกประมวลผลและตอบกลับ", done, runner.stats())
+        check("handler ของแชทเดียวกันไม่ทำงานซ้อนกัน", bot.overlaps == 0, f"{bot.overlaps} overlaps")
+        check("ต่างแชทประมวลผลขนานกัน", bot.max_parallel > 1, f"max_parallel={bot.max_parallel}")
+        check("ลำดับการประมวลผลต่อแชทตรงกับลำดับที่ส่ง", dict(bot.handled) == dict(expected))
+        check("ลำดับข้อความตอบกลับต่อแชทตรงกับลำดับที่ส่ง", dict(delivered_texts(server)) == dict(expected))
+    finally:
+        runner.stop()
+        thread.join(15)
+        server.stop()
+
+
+def check_poll_backoff():
+    print("\n⏳ backoff หลัง getUpdates ล้มเหลว")
+    import bot.core.async_runner as async_runner
+    original_backoff = async_runner.backoff_delay
+    delays = []
+
+    def recording_backoff(attempt, base=0.5, cap=30.0):
+        # ไม่สุ่ม (jitter) และย่อเวลาลง 20 เท่า - ตรวจเวลารอจริงได้โดยไม่ต้องรอนาน
+        delay = min(cap, base * (2 ** attempt)) / 20
+        delays.append((attempt, delay))
+        return delay
+
+    async_runner.backoff_delay = recording_backoff
+    server = FakeTelegramServer(fail_get_updates=3)
+    server.start()
+    bot, runner, thread = start_runner(server, handler_delay=0)
+    try:
+        server.push_message(3000, "หลังล้มเหลว")
+        recovered = wait_until(lambda: runner.stats()["completed"] == 1)
+        check("อัพเดทที่ค้างระหว่างล้มเหลวถูกประมวลผลหลังกลับมาได้", recovered, runner.stats())
+        check("นับ poll_errors ครบ 3 ครั้ง", runner.stats()["poll_errors"] == 3, runner.stats())
+        check("ครั้งที่ล้มเหลวติดกันรอนานขึ้นแบบ exponential", [a for a, _ in delays] == [1, 2, 3], delays)
+        gaps = [later - earlier for earlier, later in zip(server.poll_times, server.poll_times[1:4])]
+        check("รอครบเวลา backoff ก่อน getUpdates ครั้งถัดไป",
+              len(gaps) == 3 and all(gap >= delay - 0.01 for gap, (_, delay) in zip(gaps, delays)),
+              [f"{gap:.3f}>={delay:.3f}" for gap, (_, delay) in zip(gaps, delays)])
+
+        # ล้มเหลวรอบใหม่หลังสำเร็จแล้ว: เริ่มนับ backoff ใหม่
+        delays.clear()
+        server.fail_get_updates = 2
+        failed_again = wait_until(lambda: runner.stats()["poll_errors"] == 5)
+        server.push_message(3000, "รอบสอง")
+        recovered = wait_until(lambda: runner.stats()["completed"] == 2)
+        check("backoff เริ่มนับใหม่หลัง getUpdates สำเร็จ", failed_again and recovered and [a for a, _ in delays] == [1, 2], delays)
+    finally:
+        runner.stop()
+        thread.join(15)
+        server.stop()
+        async_runner.backoff_delay = original_backoff
+
+
+def check_graceful_shutdown(chats: int = 4, per_chat: int = 3):
+    print("\n🛑 stop() แบบ graceful")
+    server = FakeTelegramServer(latency=0.05)
+    server.start()
+    bot, runner, thread = start_runner(server, handler_delay=0.2, workers=chats)
+    total = chats * per_chat
+    for i in range(per_chat):
+        for chat in range(chats):
+            server.push_message(4000 + chat, f"m{i}")
+    submitted = wait_until(lambda: runner.stats()["submitted"] == total)
+    pending_at_stop = runner.stats()["pending"]
+    runner.stop()
+    thread.join(30)
+    polls_after_stop = len(server.poll_times)
+    time.sleep(0.2)
+    try:
+        check("stop() ถูกเรียกขณะยังมี handler ค้าง", submitted and pending_at_stop > 0, f"pending={pending_at_stop}")
+        check("run() จบหลัง stop()", not thread.is_alive())
+        stats = runner.stats()
+        check("handler ที่ค้างทำงานจนครบก่อนจบ", stats["completed"] == total and stats["pending"] == 0, stats)
+        outbox = bot.outbox.stats()
+        check("คิวส่งข้อความว่างและส่งครบทุกข้อความ",
+              outbox["pending"] == 0 and outbox["failed"] == 0 and sum(len(t) for t in delivered_texts(server).values()) == total,
+              outbox)
+        check("ไม่ poll getUpdates อีกหลังจบ", len(server.poll_times) == polls_after_stop)
+    finally:
+        server.stop()
+
+
+def run_checks():
+    print("=" * 80)
+    print("🤖 ASYNC BOT RUNNER - OFFLINE CHECK (Fake Telegram API)")
+    print("=" * 80)
+    try:
+        import aiohttp  # noqa: F401
+    except ImportError:
+        print("⚠️ ข้าม - ไม่ได้ติดตั้ง aiohttp")
+        return failures
+    for run_check in (check_per_chat_ordering, check_poll_backoff, check_graceful_shutdown):
+        try:
+            run_check()
+        except Exception as e:
+            check(run_check.__name__, False, repr(e))
+    return failures
+
+
+if __name__ == "__main__":
+    if run_checks():
+        print(f"\n❌ {len(failures)} check(s) failed")
+        sys.exit(1)
+    print("\n✅ All async runner checks passed")
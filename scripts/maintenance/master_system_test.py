@@ -4,18 +4,25 @@ VIPAT ERP v2.0 - Master System Integration Test (Target Integrated)
 """
 import sqlite3
 import os
+import shutil
 import sys
+import tempfile
+from contextlib import contextmanager
 
 # Add project root to path to allow absolute imports
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
 sys.path.insert(0, PROJECT_ROOT)
 
 # Import from the integrated location
+from database.models import db_access_v2
 from database.models.db_access_v2 import (
     get_db_connection, 
+    get_write_connection,
     IDGenerator, 
     EnhancedBookingEngine, 
-    FinancialReporting
+    FinancialReporting,
+    IDBlockAllocator,
+    PaginatedQueries
 )
 
 def run_integrated_test():
@@ -65,5 +72,150 @@ def run_integrated_test():
         import traceback
         traceback.print_exc()
 
+# ---------------------------------------------------------------------------
+# Regression checks - รันบนสำเนาฐานข้อมูลชั่วคราว (ไม่แตะไฟล์จริง) และ exit 1 ถ้ามีข้อใดไม่ผ่าน
+# ---------------------------------------------------------------------------
+failures = []
+
+def check(label, ok, detail=""):
+    if ok:
+        print(f"✅ {label}")
+    else:
+        failures.append(label)
+        print(f"❌ {label}{': ' + str(detail) if detail else ''}")
+
+@contextmanager
+def scratch_database():
+    """สำเนาฐานข้อมูลใน temp dir แล้วชี้ db_access_v2.DB_PATH ไปที่สำเนาระหว่าง with"""
+    temp_dir = tempfile.mkdtemp(prefix="vipat_test_")
+    path = os.path.join(temp_dir, "test.db")
+    src, dest = sqlite3.connect(db_access_v2.DB_PATH), sqlite3.connect(path)
+    try:
+        src.backup(dest)
+    finally:
+        src.close()
+        dest.close()
+    original = db_access_v2.DB_PATH
+    db_access_v2.DB_PATH = path
+    try:
+        yield path
+    finally:
+        db_access_v2.DB_PATH = original
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def check_room_conflicts():
+    """ห้อง 101 (int) กับ "101" (str) คือห้องเดียวกัน - ทั้งตอนเปิดและปิด AvailabilityCache"""
+    cache_enabled = db_access_v2.AVAILABILITY_CACHE_ENABLED
+    try:
+        for enabled in (True, False):
+            db_access_v2.AVAILABILITY_CACHE_ENABLED = enabled
+            with scratch_database():
+                first = EnhancedBookingEngine.create_booking("Room Str", "101", "2027-01-01", "2027-01-05", 1000)
+                check(f"[cache={enabled}] booking '101' succeeds", first['success'], first.get('message'))
+                cache = db_access_v2.get_availability_cache()
+                if cache:
+                    cache.warm()  # ให้การจองถัดไปตรวจจาก interval tree ไม่ใช่ SQL
+                overlap = EnhancedBookingEngine.create_booking("Room Int", 101, "2027-01-02", "2027-01-04", 1000)
+                check(f"[cache={enabled}] overlapping booking 101 (int) is a conflict",
+                      not overlap['success'] and 'Conflict' in overlap.get('message', ''), overlap)
+                group = EnhancedBookingEngine.create_group_booking([101], "2027-01-03", "2027-01-06", 1000, "GRP-INT", "Group Int")
+                check(f"[cache={enabled}] group booking [101] (int) is a conflict", not group['success'], group)
+                after = EnhancedBookingEngine.create_booking("Room Int", 101, "2027-01-05", "2027-01-07", 1000)
+                check(f"[cache={enabled}] back-to-back booking 101 (int) succeeds", after['success'], after.get('message'))
+    finally:
+        db_access_v2.AVAILABILITY_CACHE_ENABLED = cache_enabled
+
+class _Rollback(Exception):
+    pass
+
+def check_id_block_allocator():
+    """IDBlockAllocator: ช่องว่างไม่เกิน block_size - 1, rollback คืนเลขที่, prefix แบบ gapless ไม่มีช่องว่าง"""
+    def take(allocator, prefix, count=1, rollback=False):
+        # get_*_connection แจ้ง commit ให้ IDGenerator.allocator - สลับ allocator ที่ทดสอบเข้าไประหว่าง transaction
+        original, IDGenerator.allocator = IDGenerator.allocator, allocator
+        taken = []
+        try:
+            with get_write_connection() as conn:
+                taken = allocator.take(conn, prefix, None, count)
+                if rollback:
+                    raise _Rollback()
+        except _Rollback:
+            pass
+        finally:
+            IDGenerator.allocator = original
+        return taken
+
+    def counter(prefix):
+        with get_db_connection() as conn:
+            row = conn.execute("SELECT last_value FROM ID_Counters WHERE prefix = ?", (prefix,)).fetchone()
+            return row[0] if row else 0
+
+    with scratch_database():
+        allocator = IDBlockAllocator(block_size=5)
+        values = [take(allocator, "TSTB")[0] for _ in range(6)]
+        check("block allocator hands out consecutive numbers across transactions", values == [1, 2, 3, 4, 5, 6], values)
+        check("block allocator reserves a whole block per database round trip", counter("TSTB") == 10, counter("TSTB"))
+        batch = take(allocator, "TSTB", count=7)
+        check("multi-number take is consecutive", batch == list(range(7, 14)), batch)
+
+        # process ใหม่ (allocator ใหม่) ข้ามเลขที่ที่เหลือในบล็อกเดิม - ช่องว่างไม่เกิน block_size - 1
+        restarted = take(IDBlockAllocator(block_size=5), "TSTB")[0]
+        check("gap after restart is at most block_size - 1", batch[-1] < restarted <= batch[-1] + 5, (batch[-1], restarted))
+
+        fresh = IDBlockAllocator(block_size=5)
+        rolled_back = take(fresh, "TSTR", rollback=True)
+        check("rolled-back transaction leaves the counter untouched", counter("TSTR") == 0, counter("TSTR"))
+        after = take(fresh, "TSTR")
+        check("numbers from a rolled-back block are reissued, never duplicated", rolled_back == after == [1], (rolled_back, after))
+        check("next committed take continues the new block", take(fresh, "TSTR") == [2])
+
+        gapless = IDBlockAllocator(block_size=5)
+        gapless.configure("TSTG", gapless=True)
+        sequence = take(gapless, "TSTG") + take(gapless, "TSTG", rollback=True) + take(gapless, "TSTG")
+        sequence += take(IDBlockAllocator(block_size=5, gapless_prefixes={"TSTG"}), "TSTG")
+        check("gapless prefix reserves one number per document (no gaps, rollback reissues)",
+              sequence == [1, 2, 2, 3] and counter("TSTG") == 3, (sequence, counter("TSTG")))
+
+def check_pagination_cursor():
+    """เดิน cursor ของ PaginatedQueries.bookings ทีละ 2 แถว: ได้ทุกแถวครั้งเดียว ตามลำดับ แม้ created_at เป็น NULL"""
+    with scratch_database():
+        booked = [EnhancedBookingEngine.create_booking(f"Page {i}", "201", f"2028-0{i + 1}-01", f"2028-0{i + 1}-03", 100)['success']
+                  for i in range(6)]
+        check("pagination fixtures booked", all(booked), booked)
+        with get_write_connection() as conn:
+            conn.execute("UPDATE Data_Bookings SET created_at = NULL WHERE customer_id IN ('Page 1', 'Page 4')")
+        with get_db_connection() as conn:
+            expected = [row[0] for row in conn.execute(
+                "SELECT booking_id FROM Data_Bookings ORDER BY COALESCE(created_at, '') DESC, booking_id DESC")]
+            for room_number in (None, "201"):
+                seen, after, pages = [], None, 0
+                while pages <= len(expected):
+                    page = PaginatedQueries.bookings(conn, after=after, limit=2, room_number=room_number)
+                    seen += [row['booking_id'] for row in page['items']]
+                    after, pages = page['next_cursor'], pages + 1
+                    if not after:
+                        break
+                wanted = expected if room_number is None else [
+                    row[0] for row in conn.execute(
+                        "SELECT booking_id FROM Data_Bookings WHERE room_number = ? "
+                        "ORDER BY COALESCE(created_at, '') DESC, booking_id DESC", (room_number,))]
+                check(f"bookings cursor (room={room_number}) returns every row once in order, NULL created_at last",
+                      seen == wanted and len(wanted) >= 6, f"{len(seen)}/{len(wanted)} rows")
+
+def run_regression_checks():
+    print("=" * 80)
+    print("🧪 REGRESSION CHECKS (scratch database)")
+    print("=" * 80)
+    for regression in (check_room_conflicts, check_id_block_allocator, check_pagination_cursor):
+        try:
+            regression()
+        except Exception as e:
+            check(regression.__name__, False, repr(e))
+    return failures
+
 if __name__ == "__main__":
     run_integrated_test()
+    if run_regression_checks():
+        print(f"\n❌ {len(failures)} regression check(s) failed")
+        sys.exit(1)
+    print("\n✅ All regression checks passed")
@@ -1,23 +1,35 @@
 #!/usr/bin/env python3
 import http.server
-import socketserver
 import json
-import sqlite3
 from urllib.parse import urlparse, parse_qs
 from database.models.db_access_v2 import (
+    AvailabilityService,
+    DashboardStats,
     EnhancedBookingEngine, 
     HospitalityOperations, 
     FinancialReporting,
-    get_db_connection
+    OccupancyCalendar,
+    PaginatedQueries,
+    get_availability_cache,
+    get_db_connection,
+    DB_PATH
 )
+from database.models.connection_pool import pool_stats
+from database.models.event_bus import bus as event_bus
+from database.models.storage_tuning import start_checkpoint_scheduler
+from web.interface.event_stream import serve_event_stream
+from web.interface.http_server import KeepAliveHandlerMixin, serve
+from web.interface.response_cache import cache_key, get_response_cache, make_etag
+from web.interface.static_assets import STATIC_CACHE_CONTROL, load_asset, preload
 
 import os
 
 import threading
 import time
+from datetime import date, timedelta
 
 PORT = int(os.environ.get('PORT', 8000))
-DB_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'database', 'data', 'โรงแรม.db')
+INTERFACE_ASSET = 'erp_dashboard.html'
 
 def start_telegram_bot():
     """Starts the Telegram bot in a separate thread"""
@@ -37,7 +49,7 @@ def start_telegram_bot():
     except Exception as e:
         print(f"❌ Failed to start Telegram Bot: {e}")
 
-class DatabaseWebInterface(http.server.BaseHTTPRequestHandler):
+class DatabaseWebInterface(KeepAliveHandlerMixin, http.server.BaseHTTPRequestHandler):
     def do_POST(self):
         """จัดการการส่งข้อมูลจากฟอร์ม (เช่น การจองห้อง)"""
         if self.path == '/api/create_booking':
@@ -54,6 +66,21 @@ class DatabaseWebInterface(http.server.BaseHTTPRequestHandler):
             )
             self.send_json(result)
 
+        elif self.path == '/api/create_group_booking':
+            content_length = int(self.headers['Content-Length'])
+            post_data = self.rfile.read(content_length)
+            params = json.loads(post_data.decode('utf-8'))
+            
+            result = EnhancedBookingEngine.create_group_booking(
+                rooms=params.get('rooms', []),
+                check_in=params.get('check_in'),
+                check_out=params.get('check_out'),
+                prices=params.get('prices', params.get('price', 0)),
+                group_ref=params.get('group_ref'),
+                customer_name=params.get('customer_name')
+            )
+            self.send_json(result)
+
         elif self.path == '/api/calculate_utilities':
             content_length = int(self.headers['Content-Length'])
             post_data = self.rfile.read(content_length)
@@ -67,352 +94,165 @@ class DatabaseWebInterface(http.server.BaseHTTPRequestHandler):
                 water_new=float(params.get('water_new', params.get('น้ำใหม่', 0)))
             )
             self.send_json(result)
-            
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(result).encode())
+
+        else:
+            self.send_error(404)
 
     def do_GET(self):
-        if self.path == '/':
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+
+        if parsed.path == '/api/availability':
+            self.serve_availability(query)
+        elif parsed.path == '/api/pool_stats':
+            self.send_json(pool_stats())
+        elif parsed.path == '/api/dashboard_stats':
+            self.send_json(DashboardStats.get())
+        elif parsed.path == '/api/events':
+            # SSE: booking_created, checkout_done, room_status_changed, journal_posted, utility_charged, resync
+            serve_event_stream(self, event_bus, query.get('last_event_id', [None])[0])
+        elif parsed.path == '/api/event_stats':
+            self.send_json({**event_bus.stats(), "streams": self.server.detached_count()})
+        elif parsed.path == '/api/cache_stats':
+            self.serve_cache_stats(query)
+        elif parsed.path == '/api/occupancy':
+            self.serve_occupancy(query)
+        elif parsed.path == '/':
             self.serve_interface()
-        elif self.path == '/api/bookings':
-            self.serve_bookings()
-        elif self.path == '/api/accounting':
-            self.serve_accounting()
-        elif self.path == '/api/rooms':
+        elif parsed.path == '/api/bookings':
+            self.serve_bookings(query)
+        elif parsed.path == '/api/accounting':
+            self.serve_accounting(query)
+        elif parsed.path == '/api/rooms':
             self.serve_rooms()
-        elif self.path == '/api/income_statement':
-            with get_db_connection() as conn:
-                report = FinancialReporting.get_income_statement(conn)
-                self.send_json(report)
-        elif self.path == '/api/trial_balance':
-            with get_db_connection() as conn:
-                tb = FinancialReporting.get_trial_balance(conn)
-                self.send_json(tb)
+        elif parsed.path == '/api/income_statement':
+            self.serve_income_statement(query)
+        elif parsed.path == '/api/trial_balance':
+            self.serve_trial_balance()
         else:
             self.send_error(404)
 
-    def serve_rooms(self):
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute("SELECT เลขห้อง, ประเภท, ราคา, สถานะ FROM ห้องพัก ORDER BY เลขห้อง")
-        rows = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        self.send_json(rows)
-
-    def serve_bookings(self):
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM Data_Bookings ORDER BY created_at DESC")
-        rows = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        self.send_json(rows)
-
-    def serve_accounting(self):
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT j.journal_id, j.transaction_date, j.description, 
-                   e.account_code, c.account_name, e.debit, e.credit
-            FROM Data_Journal j
-            JOIN Data_JournalEntries e ON j.journal_id = e.journal_id
-            JOIN Data_ChartOfAccounts c ON e.account_code = c.account_code
-            ORDER BY j.transaction_date DESC
-        ''')
-        rows = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        self.send_json(rows)
-
-    def send_json(self, data):
-        self.send_response(200)
-        self.send_header('Content-type', 'application/json; charset=utf-8')
-        self.end_headers()
-        self.wfile.write(json.dumps(data, ensure_ascii=False).encode('utf-8'))
-
-    def serve_interface(self):
-        html = """
-<!DOCTYPE html>
-<html lang="th">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>VIPAT HOTEL - Full ERP System</title>
-    <script src="https://cdn.tailwindcss.com"></script>
-    <script src="https://unpkg.com/lucide@latest"></script>
-    <style>
-        .tab-content.hidden { display: none; }
-        .calendar-day { min-height: 100px; border: 1px solid #e2e8f0; padding: 4px; font-size: 0.75rem; transition: all 0.2s; }
-        .calendar-day:hover { background-color: #f8fafc; }
-        .has-booking { background-color: #fee2e2; border-top: 4px solid #ef4444; }
-        .status-badge { padding: 2px 8px; border-radius: 12px; font-size: 0.7rem; font-weight: bold; }
-    </style>
-</head>
-<body class="bg-slate-50 font-sans text-slate-800">
-    <div class="flex h-screen overflow-hidden">
-        <!-- Sidebar -->
-        <aside class="w-64 bg-slate-900 text-slate-300 flex flex-col shrink-0">
-            <div class="p-6 border-b border-slate-700">
-                <h1 class="text-xl font-bold text-white">VIPAT ERP v2.1</h1>
-                <div class="flex items-center gap-2 mt-2">
-                    <div class="w-2 h-2 bg-green-500 rounded-full animate-pulse"></div>
-                    <span class="text-xs text-green-400">System 100% Ready</span>
-                </div>
-            </div>
-            <nav class="flex-1 p-4 space-y-2 overflow-y-auto">
-                <button onclick="showTab('dashboard')" class="w-full flex items-center gap-3 px-4 py-3 rounded-lg hover:bg-slate-800 transition-colors" data-tab="dashboard">
-                    <i data-lucide="layout-dashboard" class="w-5 h-5"></i> ภาพรวม
-                </button>
-                <button onclick="showTab('booking-form')" class="w-full flex items-center gap-3 px-4 py-3 rounded-lg hover:bg-slate-800 transition-colors text-blue-400 font-bold" data-tab="booking-form">
-                    <i data-lucide="plus-circle" class="w-5 h-5"></i> จองห้องพักใหม่
-                </button>
-                <button onclick="showTab('gantt')" class="w-full flex items-center gap-3 px-4 py-3 rounded-lg hover:bg-slate-800 transition-colors" data-tab="gantt">
-                    <i data-lucide="calendar" class="w-5 h-5"></i> ปฏิทิน Gantt
-                </button>
-                <button onclick="showTab('accounting')" class="w-full flex items-center gap-3 px-4 py-3 rounded-lg hover:bg-slate-800 transition-colors" data-tab="accounting">
-                    <i data-lucide="dollar-sign" class="w-5 h-5"></i> ระบบบัญชีคู่
-                </button>
-            </nav>
-        </aside>
-
-        <!-- Main Content -->
-        <main class="flex-1 overflow-y-auto p-8">
-            <!-- Dashboard -->
-            <div id="dashboard" class="tab-content space-y-6">
-                <h2 class="text-3xl font-bold text-slate-800">แผงควบคุมหลัก</h2>
-                <div class="grid grid-cols-1 md:grid-cols-4 gap-6">
-                    <div class="bg-white p-6 rounded-2xl shadow-sm border border-slate-100">
-                        <p class="text-sm text-slate-500 mb-1">ยอดเงินสด (1020)</p>
-                        <h3 id="stat-cash" class="text-2xl font-black text-blue-600">0฿</h3>
-                    </div>
-                    <div class="bg-white p-6 rounded-2xl shadow-sm border border-slate-100">
-                        <p class="text-sm text-slate-500 mb-1">รายได้สะสม</p>
-                        <h3 id="stat-revenue" class="text-2xl font-black text-green-600">0฿</h3>
-                    </div>
-                    <div class="bg-white p-6 rounded-2xl shadow-sm border border-slate-100">
-                        <p class="text-sm text-slate-500 mb-1">การจองทั้งหมด</p>
-                        <h3 id="stat-bookings" class="text-2xl font-black text-slate-800">0</h3>
-                    </div>
-                    <div class="bg-white p-6 rounded-2xl shadow-sm border border-slate-100">
-                        <p class="text-sm text-slate-500 mb-1">ความเสถียรระบบ</p>
-                        <h3 class="text-2xl font-black text-indigo-600">100%</h3>
-                    </div>
-                </div>
-
-                <div class="grid grid-cols-1 lg:grid-cols-2 gap-8 mt-8">
-                    <div class="bg-white p-6 rounded-2xl shadow-sm border">
-                        <h4 class="font-bold text-lg mb-4">รายการจองล่าสุด</h4>
-                        <div id="recent-bookings-list" class="space-y-3"></div>
-                    </div>
-                    <div class="bg-white p-6 rounded-2xl shadow-sm border">
-                        <h4 class="font-bold text-lg mb-4">สถานะห้องพักด่วน</h4>
-                        <div id="room-status-grid" class="grid grid-cols-5 gap-2"></div>
-                    </div>
-                </div>
-            </div>
-
-            <!-- Booking Form -->
-            <div id="booking-form" class="tab-content hidden max-w-2xl mx-auto">
-                <div class="bg-white p-8 rounded-3xl shadow-xl border border-blue-100">
-                    <h2 class="text-2xl font-bold mb-6 flex items-center gap-2 text-blue-700">
-                        <i data-lucide="plus-circle"></i> สร้างการจองใหม่ (ERP)
-                    </h2>
-                    <form id="new-booking-form" class="space-y-4">
-                        <div class="grid grid-cols-2 gap-4">
-                            <div>
-                                <label class="block text-sm font-medium mb-1">ชื่อลูกค้า</label>
-                                <input type="text" id="cust_name" required class="w-full p-3 bg-slate-50 border rounded-xl outline-blue-500">
-                            </div>
-                            <div>
-                                <label class="block text-sm font-medium mb-1">เลขห้อง</label>
-                                <select id="room_select" required class="w-full p-3 bg-slate-50 border rounded-xl"></select>
-                            </div>
-                        </div>
-                        <div class="grid grid-cols-2 gap-4">
-                            <div>
-                                <label class="block text-sm font-medium mb-1">วันเช็คอิน</label>
-                                <input type="date" id="check_in" required class="w-full p-3 bg-slate-50 border rounded-xl">
-                            </div>
-                            <div>
-                                <label class="block text-sm font-medium mb-1">วันเช็คเอาท์</label>
-                                <input type="date" id="check_out" required class="w-full p-3 bg-slate-50 border rounded-xl">
-                            </div>
-                        </div>
-                        <div>
-                            <label class="block text-sm font-medium mb-1">ราคารวม (เงินมัดจำ)</label>
-                            <input type="number" id="total_price" required class="w-full p-3 bg-slate-50 border rounded-xl text-xl font-bold text-blue-600">
-                        </div>
-                        <button type="submit" class="w-full bg-blue-600 text-white py-4 rounded-xl font-bold text-lg hover:bg-blue-700 transition-all shadow-lg shadow-blue-200">
-                            ยืนยันการจองและลงบัญชีอัตโนมัติ
-                        </button>
-                    </form>
-                    <div id="booking-result" class="mt-4 hidden p-4 rounded-xl text-center font-bold"></div>
-                </div>
-            </div>
-
-            <!-- Gantt -->
-            <div id="gantt" class="tab-content hidden">
-                <h2 class="text-2xl font-bold mb-6">ปฏิทินสถานะการเข้าพัก (Gantt View)</h2>
-                <div class="bg-white p-6 rounded-2xl shadow-sm border overflow-x-auto">
-                    <div id="gantt-container" class="grid grid-cols-7 gap-2"></div>
-                </div>
-            </div>
+    def serve_availability(self, query):
+        """ค้นหาห้องว่างทุกห้อง: /api/availability?check_in=&check_out=&room_type=&min_price=&max_price="""
+        def param(name):
+            return query.get(name, [None])[0] or None
+        try:
+            min_price, max_price = param('min_price'), param('max_price')
+            rooms = AvailabilityService.search(
+                check_in=param('check_in') or '',
+                check_out=param('check_out') or '',
+                room_type=param('room_type'),
+                min_price=float(min_price) if min_price else None,
+                max_price=float(max_price) if max_price else None
+            )
+            self.send_json({"success": True, "rooms": rooms})
+        except ValueError as e:
+            self.send_json({"success": False, "message": str(e)})
 
-            <!-- Accounting -->
-            <div id="accounting" class="tab-content hidden">
-                <h2 class="text-2xl font-bold mb-6">บัญชีแยกประเภท (General Journal)</h2>
-                <div class="bg-white rounded-2xl shadow-sm border overflow-hidden">
-                    <table class="w-full text-left">
-                        <thead class="bg-slate-900 text-white">
-                            <tr>
-                                <th class="p-4">วันที่</th>
-                                <th class="p-4">รายการบันทึก</th>
-                                <th class="p-4">รหัสบัญชี</th>
-                                <th class="p-4 text-right">Debit</th>
-                                <th class="p-4 text-right">Credit</th>
-                            </tr>
-                        </thead>
-                        <tbody id="accounting-body"></tbody>
-                    </table>
-                </div>
-            </div>
-        </main>
-    </div>
+    def serve_occupancy(self, query):
+        """ตารางห้อง × วัน (RLE): /api/occupancy?from=YYYY-MM-DD&to=YYYY-MM-DD (to ไม่รวม, ค่าเริ่มต้น 28 วัน)"""
+        try:
+            start = query.get('from', [''])[0] or date.today().isoformat()
+            end = query.get('to', [''])[0] or (date.fromisoformat(start) + timedelta(days=28)).isoformat()
+            with get_db_connection() as conn:
+                matrix = OccupancyCalendar.build_matrix(conn, start, end)
+            self.send_json({"success": True, **matrix})
+        except ValueError as e:
+            self.send_json({"success": False, "message": str(e)})
 
-    <script>
-        lucide.createIcons();
+    def serve_income_statement(self, query):
+        """งบกำไรขาดทุน: /api/income_statement?from=YYYY-MM-DD&to=YYYY-MM-DD&granularity=day|month"""
+        def compute():
+            with get_db_connection() as conn:
+                return FinancialReporting.get_income_statement(
+                    conn,
+                    query.get('from', [''])[0] or None,
+                    query.get('to', [''])[0] or None,
+                    query.get('granularity', ['day'])[0]
+                )
+        try:
+            self.send_cached_json(compute)
+        except ValueError as e:
+            self.send_json({"success": False, "message": str(e)})
 
-        function showTab(tabId) {
-            document.querySelectorAll('.tab-content').forEach(t => t.classList.add('hidden'));
-            document.querySelectorAll('nav button').forEach(b => b.classList.remove('bg-slate-800', 'text-white'));
-            
-            document.getElementById(tabId).classList.remove('hidden');
-            document.querySelector(`[data-tab="${tabId}"]`).classList.add('bg-slate-800', 'text-white');
-            refreshData();
-        }
+    def serve_cache_stats(self, query):
+        """สถิติ AvailabilityCache และ ResponseCache: /api/cache_stats (check=1 = เทียบ AvailabilityCache กับ SQL ด้วย)"""
+        cache = get_availability_cache()
+        response_cache = get_response_cache(DB_PATH)
+        stats = {"enabled": cache is not None, **(cache.stats() if cache else {}),
+                 "responses": response_cache.stats() if response_cache else None}
+        if cache is not None and query.get('check', ['0'])[0] in ('1', 'true'):
+            stats["consistency"] = cache.check_consistency()
+        self.send_json(stats)
 
-        async function refreshData() {
-            const [bookRes, accRes, roomRes] = await Promise.all([
-                fetch('/api/bookings'),
-                fetch('/api/accounting'),
-                fetch('/api/rooms')
-            ]);
-            
-            const bookings = await bookRes.json();
-            const journal = await accRes.json();
-            const rooms = await roomRes.json();
+    def serve_rooms(self):
+        def compute():
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT เลขห้อง, ประเภท, ราคา, สถานะ FROM ห้องพัก ORDER BY เลขห้อง")
+                return [dict(row) for row in cursor.fetchall()]
+        self.send_cached_json(compute)
 
-            // Dashboard Stats
-            document.getElementById('stat-bookings').textContent = bookings.length;
-            
-            let cash = 0, revenue = 0;
-            journal.forEach(e => {
-                if(e.account_code === '1020') cash += (e.debit - e.credit);
-                if(e.account_code === '4010') revenue += (e.credit - e.debit);
-            });
-            document.getElementById('stat-cash').textContent = cash.toLocaleString() + '฿';
-            document.getElementById('stat-revenue').textContent = revenue.toLocaleString() + '฿';
+    def serve_trial_balance(self):
+        def compute():
+            with get_db_connection() as conn:
+                return FinancialReporting.get_trial_balance(conn)
+        self.send_cached_json(compute)
 
-            // Room Select Option
-            const roomSelect = document.getElementById('room_select');
-            roomSelect.innerHTML = rooms.map(r => `<option value="${r.เลขห้อง}">ห้อง ${r.เลขห้อง} (${r.ประเภท})</option>`).join('');
+    @staticmethod
+    def page_params(query, *names):
+        """อ่านพารามิเตอร์ของ endpoint แบบแบ่งหน้า (after, limit, with_total และตัวกรองที่ระบุ)"""
+        params = {name: query.get(key, [None])[0] or None for name, key in names}
+        params['after'] = query.get('after', [None])[0] or None
+        limit = query.get('limit', [None])[0]
+        params['limit'] = int(limit) if limit else None
+        params['with_total'] = query.get('with_total', ['0'])[0] in ('1', 'true')
+        return params
 
-            // Room Status Grid
-            document.getElementById('room-status-grid').innerHTML = rooms.map(r => `
-                <div class="p-2 border rounded-lg text-center ${r.สถานะ === 'ว่าง' ? 'bg-green-50' : 'bg-red-50'}">
-                    <div class="text-xs font-bold">${r.เลขห้อง}</div>
-                    <div class="w-2 h-2 mx-auto rounded-full ${r.สถานะ === 'ว่าง' ? 'bg-green-500' : 'bg-red-500'}"></div>
-                </div>
-            `).join('');
+    def serve_bookings(self, query):
+        """/api/bookings?after=<created_at,booking_id>&limit=&status=&room=&from=&to=&with_total=1"""
+        try:
+            params = self.page_params(query, ('status', 'status'), ('room_number', 'room'), ('date_from', 'from'), ('date_to', 'to'))
+            with get_db_connection() as conn:
+                page = PaginatedQueries.bookings(conn, **params)
+            self.send_json(page)
+        except ValueError as e:
+            self.send_json({"success": False, "message": str(e)})
 
-            // Recent Bookings
-            document.getElementById('recent-bookings-list').innerHTML = bookings.slice(0, 5).map(b => `
-                <div class="flex justify-between items-center p-3 bg-slate-50 rounded-xl border">
-                    <div>
-                        <div class="font-bold text-sm">${b.customer_id}</div>
-                        <div class="text-xs text-slate-500">ห้อง ${b.room_number} | ${b.check_in} - ${b.check_out}</div>
-                    </div>
-                    <span class="status-badge bg-blue-100 text-blue-700">${b.status}</span>
-                </div>
-            `).join('');
+    def serve_accounting(self, query):
+        """/api/accounting?after=<transaction_date,entry_id>&limit=&account=&from=&to=&with_total=1"""
+        try:
+            params = self.page_params(query, ('account_code', 'account'), ('date_from', 'from'), ('date_to', 'to'))
+            with get_db_connection() as conn:
+                page = PaginatedQueries.journal_lines(conn, **params)
+            self.send_json(page)
+        except ValueError as e:
+            self.send_json({"success": False, "message": str(e)})
 
-            // Gantt Chart
-            const gantt = document.getElementById('gantt-container');
-            gantt.innerHTML = '';
-            for(let i=0; i<28; i++) {
-                const date = new Date();
-                date.setDate(date.getDate() + i);
-                const dateStr = date.toISOString().split('T')[0];
-                const activeBookings = bookings.filter(b => dateStr >= b.check_in && dateStr < b.check_out);
-                
-                const div = document.createElement('div');
-                div.className = `calendar-day ${activeBookings.length > 0 ? 'has-booking' : ''}`;
-                div.innerHTML = `<div class="font-bold border-b mb-1">${date.getDate()} ${date.toLocaleString('th-TH',{month:'short'})}</div>`;
-                activeBookings.forEach(b => {
-                    div.innerHTML += `<div class="text-[10px] text-red-700 truncate">Rm ${b.room_number}</div>`;
-                });
-                gantt.appendChild(div);
-            }
+    def send_json(self, data):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_validated(body, 'application/json; charset=utf-8', make_etag(body))
 
-            // Accounting Table
-            document.getElementById('accounting-body').innerHTML = journal.map(e => `
-                <tr class="border-b hover:bg-slate-50 transition-colors">
-                    <td class="p-4 text-xs font-mono">${new Date(e.transaction_date).toLocaleString('th-TH')}</td>
-                    <td class="p-4">
-                        <div class="font-bold text-slate-700">${e.description}</div>
-                        <div class="text-xs text-slate-500 italic">${e.account_name}</div>
-                    </td>
-                    <td class="p-4 font-mono text-sm">${e.account_code}</td>
-                    <td class="p-4 text-right text-blue-600 font-bold">${e.debit ? e.debit.toLocaleString() : '-'}</td>
-                    <td class="p-4 text-right text-red-600 font-bold">${e.credit ? e.credit.toLocaleString() : '-'}</td>
-                </tr>
-            `).join('');
-        }
+    def send_cached_json(self, compute):
+        """
+        GET ที่ผลขึ้นกับฐานข้อมูลอย่างเดียว: ใช้ body จาก ResponseCache (key = route + query) ถ้าฐานข้อมูลยังไม่เปลี่ยน
+        ไม่เรียก compute() และตอบ 304 ถ้า If-None-Match ตรง
+        """
+        cache = get_response_cache(DB_PATH)
+        if cache is None:
+            self.send_json(compute())
+            return
+        entry = cache.get_or_compute(cache_key(self.path), lambda: json.dumps(compute(), ensure_ascii=False).encode('utf-8'))
+        self.send_validated(entry.body, 'application/json; charset=utf-8', entry.etag, entry.last_modified,
+                                variants=entry.variants)
 
-        // Handle Booking Form
-        document.getElementById('new-booking-form').onsubmit = async (e) => {
-            e.preventDefault();
-            const data = {
-                customer_name: document.getElementById('cust_name').value,
-                room_number: document.getElementById('room_select').value,
-                check_in: document.getElementById('check_in').value,
-                check_out: document.getElementById('check_out').value,
-                total_price: document.getElementById('total_price').value
-            };
-            
-            const res = await fetch('/api/create_booking', {
-                method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify(data)
-            });
-            const result = await res.json();
-            
-            const resDiv = document.getElementById('booking-result');
-            resDiv.classList.remove('hidden', 'bg-green-100', 'text-green-700', 'bg-red-100', 'text-red-700');
-            if(result.success) {
-                resDiv.textContent = "✅ จองสำเร็จและลงบัญชีเรียบร้อย!";
-                resDiv.classList.add('bg-green-100', 'text-green-700');
-                e.target.reset();
-                refreshData();
-            } else {
-                resDiv.textContent = "❌ " + result.message;
-                resDiv.classList.add('bg-red-100', 'text-red-700');
-            }
-        };
+    def serve_interface(self):
+        self.send_asset(load_asset(INTERFACE_ASSET))
 
-        // Initialize
-        document.addEventListener('DOMContentLoaded', () => showTab('dashboard'));
-    </script>
-</body>
-</html>
-        """
-        self.send_response(200)
-        self.send_header('Content-type', 'text/html; charset=utf-8')
-        self.end_headers()
-        self.wfile.write(html.encode('utf-8'))
+    def send_asset(self, asset):
+        """ไฟล์ static ที่บีบอัดไว้แล้ว + ETag (hash) และ cache header แบบยาว"""
+        self.send_validated(asset.body, asset.content_type, asset.etag, asset.last_modified,
+                            variants=asset.variants, cache_control=STATIC_CACHE_CONTROL)
 
 if __name__ == '__main__':
     # กำหนด PYTHONPATH ให้หา Module database เจอ
@@ -422,7 +262,13 @@ if __name__ == '__main__':
     # Start bot in background
     start_telegram_bot()
     
+    # WAL checkpoint เป็นระยะ (Bot + Web เขียนไฟล์เดียวกัน)
+    start_checkpoint_scheduler(DB_PATH)
+    if get_availability_cache():
+        get_availability_cache().warm()
+    preload(INTERFACE_ASSET)
+    
     print(f"🏨 VIPAT ERP Web Server starting on port {PORT}...")
-    with socketserver.TCPServer(("", PORT), DatabaseWebInterface) as httpd:
-        print(f"✅ Web Server active and Bot initialized.")
-        httpd.serve_forever()
+    serve(DatabaseWebInterface, port=PORT,
+          on_started=lambda httpd: print(f"✅ Web Server active ({httpd.max_workers} workers) and Bot initialized."))
+    print("👋 Web Server stopped gracefully.")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+VIPAT Hotel ERP - Server-Sent Events
+ส่งเหตุการณ์จาก event bus (จองห้อง, check-out, สถานะห้อง, ลงบัญชี) ให้เบราว์เซอร์แบบ push แทนการ poll ทั้งตาราง
+แต่ละการเชื่อมต่อถูก detach ออกจาก worker pool และมี thread เล็กๆ ของตัวเอง (จำกัด SSE_MAX_CLIENTS)
+"""
+import os
+import select
+import socket
+import threading
+import time
+
+from database.models.event_bus import EventBus, Subscription
+
+SSE_MAX_CLIENTS = int(os.environ.get('SSE_MAX_CLIENTS', 100))
+# comment ว่างเป็นระยะ: กัน proxy ตัดการเชื่อมต่อ และตรวจพบ client ที่หายไป
+SSE_HEARTBEAT = float(os.environ.get('SSE_HEARTBEAT', 15))
+SSE_RETRY_MS = int(os.environ.get('SSE_RETRY_MS', 3000))
+
+
+def _client_gone(request) -> bool:
+    """client ปิดการเชื่อมต่อแล้ว (SSE ไม่มีข้อมูลขาเข้า - อ่านได้แปลว่า EOF)"""
+    readable, _, _ = select.select([request], [], [], 0)
+    if not readable:
+        return False
+    try:
+        return request.recv(1, socket.MSG_PEEK) == b""
+    except (BlockingIOError, socket.timeout):
+        return False
+
+
+def _pump(server, request, subscription: Subscription):
+    try:
+        request.sendall(b"retry: %d\n\n" % SSE_RETRY_MS)
+        last_sent = time.monotonic()
+        # ตื่นทุกวินาที: ตรวจ client ที่ปิดไปและการหยุดเซิร์ฟเวอร์ได้เร็วโดยไม่ต้องรอ heartbeat
+        while not server.stopping.is_set() and not _client_gone(request):
+            events = subscription.get(1.0)
+            if events is None:
+                break
+            if not events and time.monotonic() - last_sent < SSE_HEARTBEAT:
+                continue
+            # client ที่รับไม่ทันจะค้างที่ sendall จนหมด timeout ของ socket แล้วถูกตัด (คิวของมันล้นเป็น resync ระหว่างนั้น)
+            request.sendall(b"".join(event.frame for event in events) if events else b": ping\n\n")
+            last_sent = time.monotonic()
+    except OSError:
+        pass
+    finally:
+        subscription.close()
+        server.release_detached(request)
+
+
+def serve_event_stream(handler, bus: EventBus, last_event_id: str = None):
+    """ตอบ GET ด้วย text/event-stream แล้วส่งต่อจาก thread เฉพาะ - ต่อใหม่จาก header Last-Event-ID (หรือ last_event_id) ได้"""
+    server = handler.server
+    request = handler.request
+    if not server.detach(request, SSE_MAX_CLIENTS):
+        handler.send_bytes(b"Too many event streams\n", 'text/plain; charset=utf-8', status=503, headers={'Retry-After': '5'})
+        return
+    subscription = None
+    try:
+        subscription = bus.subscribe(handler.headers.get('Last-Event-ID') or last_event_id)
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+        handler.send_header('Cache-Control', 'no-cache')
+        handler.send_header('X-Accel-Buffering', 'no')
+        handler.send_header('Connection', 'close')
+        handler.end_headers()
+        handler.wfile.flush()
+    except Exception:
+        if subscription is not None:
+            subscription.close()
+        server.release_detached(request)
+        raise
+    handler.close_connection = True
+    threading.Thread(target=_pump, args=(server, request, subscription), name='sse-client', daemon=True).start()
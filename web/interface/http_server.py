@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+VIPAT Hotel ERP - Concurrent HTTP Server
+HTTPServer ที่ส่งแต่ละการเชื่อมต่อให้ worker pool ขนาดจำกัด รองรับ keep-alive, request timeout และ graceful shutdown
+"""
+import gzip
+import http.server
+import os
+import select
+import signal
+import socket
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+try:
+    import brotli  # ตัวเลือก: pip install brotli
+except ImportError:
+    brotli = None
+
+MAX_WORKERS = int(os.environ.get('HTTP_MAX_WORKERS', 16))
+MAX_PENDING = int(os.environ.get('HTTP_MAX_PENDING', 64))
+REQUEST_TIMEOUT = float(os.environ.get('HTTP_REQUEST_TIMEOUT', 15))
+# keep-alive ที่ว่าง (รอคำขอถัดไป) ถือ worker ได้ไม่เกินนี้ - แยกจาก REQUEST_TIMEOUT ที่ใช้ระหว่างอ่าน/เขียนคำขอ
+IDLE_TIMEOUT = float(os.environ.get('HTTP_IDLE_TIMEOUT', 2))
+MAX_KEEPALIVE_REQUESTS = int(os.environ.get('HTTP_MAX_KEEPALIVE_REQUESTS', 100))
+IDLE_POLL = 0.05
+CHUNK_SIZE = 64 * 1024
+# body เล็กกว่านี้ไม่บีบอัด (header ของ gzip/br ทำให้ไม่คุ้ม)
+COMPRESS_MIN_SIZE = int(os.environ.get('HTTP_COMPRESS_MIN_SIZE', 1024))
+# ลำดับที่เลือกเมื่อ client รองรับหลายแบบ
+ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+
+OVERLOADED_RESPONSE = (
+    b"HTTP/1.1 503 Service Unavailable\r\n"
+    b"Content-Type: text/plain; charset=utf-8\r\n"
+    b"Content-Length: 12\r\n"
+    b"Retry-After: 1\r\n"
+    b"Connection: close\r\n\r\n"
+    b"Server busy\n"
+)
+
+
+def compress_body(body: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    """บีบอัด body เป็น gzip หรือ br (level ไม่ระบุ = ระดับที่เร็วพอสำหรับ response ที่สร้างสด)"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=5 if level is None else level)
+    return gzip.compress(body, 6 if level is None else level, mtime=0)
+
+
+def encoding_etag(etag: str, encoding: Optional[str]) -> str:
+    """ETag ของแต่ละ representation เช่น "abc" → "abc-gzip" """
+    return f'{etag[:-1]}-{encoding}"' if encoding else etag
+
+
+class ChunkedWriter:
+    """
+    เขียน response แบบ Transfer-Encoding: chunked (บีบอัด gzip ระหว่างส่งได้)
+    สะสมข้อมูลจนถึง chunk_size แล้วส่งออก - หน่วยความจำคงที่ไม่ขึ้นกับขนาดข้อมูลทั้งหมด
+    send_body=False (ตอบ HEAD): ไม่เขียนอะไรเลย ทั้ง body และ framing ของ chunk
+    """
+
+    def __init__(self, wfile, compress: bool = False, chunk_size: int = CHUNK_SIZE, send_body: bool = True):
+        self.wfile = wfile
+        self.send_body = send_body
+        self.chunk_size = chunk_size
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._buffer = bytearray()
+        # wbits=31 = รูปแบบ gzip (header + crc)
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def write(self, data: bytes):
+        self.bytes_in += len(data)
+        if not self.send_body:
+            return
+        if self._compressor:
+            data = self._compressor.compress(data)
+        self._buffer += data
+        if len(self._buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self.wfile.write(b"%X\r\n" % len(self._buffer) + bytes(self._buffer) + b"\r\n")
+            self.bytes_out += len(self._buffer)
+            self._buffer.clear()
+
+    def close(self):
+        if not self.send_body:
+            return
+        if self._compressor:
+            self._buffer += self._compressor.flush()
+        self.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class KeepAliveHandlerMixin:
+    """
+    ใส่ก่อน BaseHTTPRequestHandler: เปิด HTTP/1.1 keep-alive และ timeout ต่อการเชื่อมต่อ
+    ทุก response ต้องมี Content-Length (ใช้ send_bytes) หรือปิดการเชื่อมต่อเอง
+    worker รอคำขอถัดไปบนการเชื่อมต่อเดิมได้ไม่เกิน IDLE_TIMEOUT และไม่เกิน MAX_KEEPALIVE_REQUESTS คำขอ
+    (การเชื่อมต่อที่ว่างค้างไว้ไม่กิน worker จนคำขอใหม่ต้องรอ)
+    """
+    protocol_version = "HTTP/1.1"
+    timeout = REQUEST_TIMEOUT
+    idle_timeout = IDLE_TIMEOUT
+    max_keepalive_requests = MAX_KEEPALIVE_REQUESTS
+
+    def handle(self):
+        self.close_connection = True
+        self.requests_handled = 0
+        while self.requests_handled < self.max_keepalive_requests and self.wait_for_request():
+            self.handle_one_request()
+            self.requests_handled += 1
+            if self.close_connection:
+                break
+
+    def wait_for_request(self) -> bool:
+        """
+        รอไบต์แรกของคำขอถัดไป (ข้อมูลที่ pipeline มาแล้วใน buffer ผ่านทันที) - False = ปิดการเชื่อมต่อ
+        คำขอแรกรอได้ตาม timeout, keep-alive ที่ว่างรอไม่เกิน idle_timeout และคืน worker ทันที
+        ถ้ามีการเชื่อมต่ออื่นรอ worker อยู่หรือเซิร์ฟเวอร์กำลังหยุด
+        """
+        server = self.server
+        keep_alive = self.requests_handled > 0
+        stopping = getattr(server, 'stopping', None)
+        deadline = time.monotonic() + (self.idle_timeout if keep_alive else self.timeout)
+        self.connection.settimeout(0)
+        try:
+            while True:
+                if self.rfile.peek(1):
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                if keep_alive and (getattr(server, 'waiting', 0) or (stopping is not None and stopping.is_set())):
+                    return False
+                readable, _, _ = select.select([self.connection], [], [], min(remaining, IDLE_POLL))
+                if readable:
+                    return bool(self.rfile.peek(1))  # b"" = client ปิดการเชื่อมต่อแล้ว
+        except OSError:
+            return False
+        finally:
+            self.connection.settimeout(self.timeout)
+
+    def send_response(self, code, message=None):
+        super().send_response(code, message)
+        # คำขอสุดท้ายที่รับบนการเชื่อมต่อนี้: บอก client ก่อนปิด แทนการตัดทิ้งเฉยๆ
+        if getattr(self, 'requests_handled', 0) + 1 >= self.max_keepalive_requests:
+            self.send_header('Connection', 'close')
+
+    def send_bytes(self, body: bytes, content_type: str, status: int = 200, headers=None):
+        self.send_response(status)
+        self.send_header('Content-type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def not_modified(self, etag: str, last_modified: str = None, cache_control: str = 'no-cache') -> bool:
+        """GET/HEAD แบบมีเงื่อนไข: If-None-Match (ถ้ามี) หรือ If-Modified-Since ตรง - ส่ง 304 แล้วคืน True"""
+        if self.command not in ('GET', 'HEAD'):
+            return False
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            base = etag
+            for encoding in ENCODINGS:
+                base = base.replace(f'-{encoding}"', '"')
+            # เทียบแบบ weak: W/"x" ตรงกับ "x" และ "x-gzip"/"x-br" ตรงกับ "x" (เนื้อหาเดียวกัน ต่างแค่การบีบอัด)
+            candidates = set()
+            for tag in if_none_match.split(','):
+                tag = tag.strip()
+                tag = tag[2:] if tag.startswith('W/') else tag
+                for encoding in ENCODINGS:
+                    tag = tag.replace(f'-{encoding}"', '"')
+                candidates.add(tag)
+            matched = '*' in candidates or base in candidates
+        else:
+            matched = last_modified is not None and self.headers.get('If-Modified-Since') == last_modified
+        if not matched:
+            return False
+        self.send_response(304)
+        self.send_header('ETag', etag)
+        if last_modified:
+            self.send_header('Last-Modified', last_modified)
+        self.send_header('Cache-Control', cache_control)
+        self.send_header('Vary', 'Accept-Encoding')
+        self.end_headers()
+        return True
+
+    def send_validated(self, body: bytes, content_type: str, etag: str, last_modified: str = None,
+                       variants: Optional[Dict[str, bytes]] = None, cache_control: str = 'no-cache'):
+        """
+        ส่ง body พร้อม ETag/Last-Modified หรือ 304 ถ้า client มีอยู่แล้ว
+        บีบอัดตาม Accept-Encoding (br/gzip) เมื่อ body ใหญ่พอ - variants = ฉบับที่บีบอัดไว้แล้ว
+        (ฉบับที่บีบอัดสดจะถูกเก็บกลับลงใน variants ให้คำขอถัดไปใช้ซ้ำ)
+        """
+        encoding = self.choose_encoding() if len(body) >= COMPRESS_MIN_SIZE else None
+        if self.not_modified(encoding_etag(etag, encoding), last_modified, cache_control):
+            return
+        if encoding:
+            compressed = variants.get(encoding) if variants is not None else None
+            if compressed is None:
+                compressed = compress_body(body, encoding)
+                if variants is not None:
+                    variants[encoding] = compressed
+            body = compressed
+        headers = {'ETag': encoding_etag(etag, encoding), 'Cache-Control': cache_control, 'Vary': 'Accept-Encoding'}
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        if last_modified:
+            headers['Last-Modified'] = last_modified
+        self.send_bytes(body, content_type, headers=headers)
+
+    def accepted_encodings(self) -> Dict[str, float]:
+        """Accept-Encoding → {encoding: q}"""
+        accepted = {}
+        for part in (self.headers.get('Accept-Encoding') or '').split(','):
+            name, _, params = part.strip().partition(';')
+            if not name:
+                continue
+            q = 1.0
+            params = params.strip()
+            if params.startswith('q='):
+                try:
+                    q = float(params[2:])
+                except ValueError:
+                    q = 0.0
+            accepted[name.strip().lower()] = q
+        return accepted
+
+    def choose_encoding(self) -> Optional[str]:
+        """การบีบอัดที่ client รองรับ (q > 0) ตามลำดับ ENCODINGS - None = ไม่บีบอัด"""
+        accepted = self.accepted_encodings()
+        for encoding in ENCODINGS:
+            if accepted.get(encoding, accepted.get('*', 0)) > 0:
+                return encoding
+        return None
+
+    def accepts_gzip(self) -> bool:
+        return self.accepted_encodings().get('gzip', 0) > 0
+
+    def start_chunked(self, content_type: str, headers=None, compress: bool = None) -> ChunkedWriter:
+        """ส่ง header แล้วคืน ChunkedWriter (ต้องเรียก close() เมื่อจบ) - gzip อัตโนมัติถ้า client รองรับ, HEAD ได้แค่ header"""
+        if compress is None:
+            compress = self.accepts_gzip()
+        self.send_response(200)
+        self.send_header('Content-type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('Vary', 'Accept-Encoding')
+        if compress:
+            self.send_header('Content-Encoding', 'gzip')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        return ChunkedWriter(self.wfile, compress, send_body=self.command != 'HEAD')
+
+
+class PooledThreadingHTTPServer(http.server.HTTPServer):
+    """
+    HTTPServer + ThreadPoolExecutor
+    - งานช้า (เช่น /api/accounting) ไม่บล็อกคำขออื่น
+    - จำนวน worker และคิวรอจำกัด เกินแล้วตอบ 503 ทันทีแทนการสร้าง thread ไม่จำกัด
+    - การเชื่อมต่อที่เปิดค้างนาน (SSE) detach() ออกจาก pool ได้ - ไม่กิน worker
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, server_address, handler_class, max_workers: int = MAX_WORKERS, max_pending: int = MAX_PENDING):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='http-worker')
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        # การเชื่อมต่อที่รับแล้วแต่ยังไม่ได้ worker (keep-alive ที่ว่างอยู่จะคืน worker ให้)
+        self.waiting = 0
+        self._waiting_lock = threading.Lock()
+        self._detached = set()
+        self._detached_lock = threading.Lock()
+        self.stopping = threading.Event()
+        super().__init__(server_address, handler_class)
+
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(blocking=False):
+            try:
+                request.sendall(OVERLOADED_RESPONSE)
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        with self._waiting_lock:
+            self.waiting += 1
+        self._executor.submit(self._process_in_worker, request, client_address)
+
+    def _process_in_worker(self, request, client_address):
+        with self._waiting_lock:
+            self.waiting -= 1
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            with self._detached_lock:
+                detached = request in self._detached
+            if not detached:
+                self.shutdown_request(request)
+            self._slots.release()
+
+    def detach(self, request, limit: Optional[int] = None) -> bool:
+        """
+        ให้ worker คืนตัวเองเข้า pool เมื่อ handler จบ โดยไม่ปิด socket (ผู้เรียกส่งข้อมูลต่อจาก thread ของตัวเอง
+        แล้วเรียก release_detached() เมื่อจบ) - คืน False ถ้ามีการเชื่อมต่อที่ detach อยู่ครบ limit แล้ว
+        """
+        with self._detached_lock:
+            if self.stopping.is_set() or (limit is not None and len(self._detached) >= limit):
+                return False
+            self._detached.add(request)
+            return True
+
+    def release_detached(self, request):
+        with self._detached_lock:
+            self._detached.discard(request)
+        self.shutdown_request(request)
+
+    def detached_count(self) -> int:
+        with self._detached_lock:
+            return len(self._detached)
+
+    def drain(self):
+        """รอคำขอที่รับไว้แล้วให้เสร็จ (keep-alive ที่ว่างจะถูกปิดภายใน IDLE_TIMEOUT) ตัดการเชื่อมต่อที่ detach แล้วปิด socket"""
+        self.stopping.set()
+        self._executor.shutdown(wait=True)
+        with self._detached_lock:
+            detached = list(self._detached)
+        for request in detached:
+            try:
+                request.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self.server_close()
+
+    def graceful_shutdown(self):
+        """หยุดรับการเชื่อมต่อใหม่ แล้ว drain()"""
+        self.shutdown()
+        self.drain()
+
+
+def serve(handler_class, host: str = '', port: int = 8000, max_workers: int = MAX_WORKERS, on_started=None):
+    """รันเซิร์ฟเวอร์จนกว่าจะได้ SIGINT/SIGTERM แล้วปิดแบบ graceful"""
+    server = PooledThreadingHTTPServer((host, port), handler_class, max_workers=max_workers)
+    stopping = threading.Event()
+
+    def request_stop(signum=None, frame=None):
+        if stopping.is_set():
+            return
+        stopping.set()
+        # shutdown() ต้องเรียกจาก thread อื่นที่ไม่ใช่ serve_forever
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+
+    if on_started:
+        on_started(server)
+    try:
+        server.serve_forever()
+    finally:
+        request_stop()
+        server.drain()
+    return server
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+VIPAT Hotel ERP - HTTP Response Cache
+เก็บ body ที่ serialize แล้วของ GET ที่ผลขึ้นกับฐานข้อมูลอย่างเดียว (key = route + query)
+ใช้ได้ตราบที่ PRAGMA data_version ของ connection เฝ้าดูยังไม่เปลี่ยน (ไม่มี connection/process อื่น commit)
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate
+from typing import Callable, Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE', '1') != '0'
+RESPONSE_CACHE_MAX = int(os.environ.get('RESPONSE_CACHE_MAX', 256))
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag จากเนื้อหา - ข้อมูลเปลี่ยนแต่ผลลัพธ์เหมือนเดิมยังได้ 304"""
+    return '"%s"' % hashlib.blake2b(body, digest_size=12).hexdigest()
+
+
+def cache_key(path: str) -> str:
+    """route + query ที่เรียงพารามิเตอร์แล้ว (?a=1&b=2 กับ ?b=2&a=1 ใช้ entry เดียวกัน)"""
+    parsed = urlparse(path)
+    query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+    return f"{parsed.path}?{query}" if query else parsed.path
+
+
+class CachedResponse:
+    __slots__ = ("body", "etag", "last_modified", "generation", "variants")
+
+    def __init__(self, body: bytes, etag: str, last_modified: str, generation: int):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.generation = generation
+        # ฉบับบีบอัด (gzip/br) - เติมเมื่อมีคำขอแรกที่รองรับ แล้วใช้ซ้ำจนกว่า entry จะเก่า
+        self.variants: Dict[str, bytes] = {}
+
+
+class ResponseCache:
+    """
+    Cache response ต่อไฟล์ฐานข้อมูล (LRU ไม่เกิน max_entries)
+    - generation = PRAGMA data_version บน connection เฉพาะ: เปลี่ยนเมื่อ connection อื่น (รวมถึง pool ใน process นี้) commit
+      การตรวจไม่แตะตารางใดๆ - อ่านแค่ header ของ WAL index
+    - entry ผูกกับ generation ตอนเริ่มคำนวณ: ถ้ามี commit ระหว่างคำนวณ entry นั้นจะถูกคำนวณใหม่ในคำขอถัดไป
+    """
+
+    def __init__(self, db_path: str, max_entries: int = RESPONSE_CACHE_MAX):
+        self.db_path = db_path
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._watcher: Optional[sqlite3.Connection] = None
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0}
+
+    def generation(self) -> int:
+        with self._lock:
+            if self._watcher is None:
+                self._watcher = sqlite3.connect(self.db_path, check_same_thread=False)
+            return self._watcher.execute("PRAGMA data_version").fetchone()[0]
+
+    def lookup(self, key: str) -> Optional[CachedResponse]:
+        generation = self.generation()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            if entry.generation != generation:
+                self._stats["stale"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry
+
+    def store(self, key: str, generation: int, body: bytes) -> CachedResponse:
+        etag = make_etag(body)
+        with self._lock:
+            previous = self._entries.get(key)
+            # เนื้อหาเดิม - คง Last-Modified เดิมไว้
+            last_modified = previous.last_modified if previous and previous.etag == etag else formatdate(time.time(), usegmt=True)
+            entry = CachedResponse(body, etag, last_modified, generation)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+            return entry
+
+    def get_or_compute(self, key: str, compute: Callable[[], bytes]) -> CachedResponse:
+        entry = self.lookup(key)
+        if entry is None:
+            generation = self.generation()
+            entry = self.store(key, generation, compute())
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries)}
+
+
+_caches: Dict[str, ResponseCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_response_cache(db_path: str) -> Optional[ResponseCache]:
+    """ResponseCache หนึ่งตัวต่อไฟล์ฐานข้อมูลต่อ process (None ถ้าปิดด้วย RESPONSE_CACHE=0)"""
+    if not RESPONSE_CACHE_ENABLED:
+        return None
+    key = os.path.abspath(db_path)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = ResponseCache(key)
+        return cache
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+VIPAT Hotel ERP - Static Assets
+หน้า HTML ใน web/static ถูกอ่านและบีบอัดล่วงหน้าครั้งเดียวตอนเริ่มเซิร์ฟเวอร์ (gzip ระดับสูงสุด และ br ถ้าติดตั้ง brotli)
+แล้วเก็บในหน่วยความจำพร้อม hash ของเนื้อหา - ไม่ต้อง encode/บีบอัดใหม่ทุกคำขอ
+"""
+import hashlib
+import mimetypes
+import os
+import threading
+from email.utils import formatdate
+from typing import Dict
+
+try:
+    from web.interface.http_server import brotli, compress_body
+except ImportError:  # รันตรงจาก web/interface
+    from http_server import brotli, compress_body
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
+# ใช้ฉบับใน cache ของเบราว์เซอร์ได้ทันที STATIC_MAX_AGE วินาที แล้ว revalidate เบื้องหลัง (ETag = hash) ได้อีกนาน
+# - เปิดหน้าเร็วโดยไม่ต้องรอเครือข่าย แต่หลัง deploy ยังได้หน้าใหม่ภายในไม่กี่นาที
+STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', 300))
+STATIC_STALE_WHILE_REVALIDATE = int(os.environ.get('STATIC_STALE_WHILE_REVALIDATE', 7 * 24 * 3600))
+STATIC_CACHE_CONTROL = f"public, max-age={STATIC_MAX_AGE}, stale-while-revalidate={STATIC_STALE_WHILE_REVALIDATE}"
+
+
+class StaticAsset:
+    """ไฟล์หนึ่งไฟล์ในหน่วยความจำ: body ดิบ, ฉบับบีบอัด (variants) และ ETag จาก hash ของเนื้อหา"""
+
+    def __init__(self, name: str, body: bytes, content_type: str, mtime: float):
+        self.name = name
+        self.body = body
+        self.content_type = content_type
+        self.hash = hashlib.sha256(body).hexdigest()[:16]
+        self.etag = f'"{self.hash}"'
+        self.last_modified = formatdate(mtime, usegmt=True)
+        self.variants: Dict[str, bytes] = {'gzip': compress_body(body, 'gzip', 9)}
+        if brotli:
+            self.variants['br'] = compress_body(body, 'br', 11)
+
+    def stats(self) -> Dict:
+        return {"name": self.name, "hash": self.hash, "bytes": len(self.body),
+                **{f"{encoding}_bytes": len(data) for encoding, data in self.variants.items()}}
+
+
+_assets: Dict[str, StaticAsset] = {}
+_assets_lock = threading.Lock()
+
+
+def load_asset(name: str) -> StaticAsset:
+    """อ่าน web/static/<name> ครั้งแรกที่ใช้ (หรือจาก preload) แล้วใช้ฉบับในหน่วยความจำตลอดอายุ process"""
+    with _assets_lock:
+        asset = _assets.get(name)
+        if asset is None:
+            path = os.path.join(STATIC_DIR, name)
+            with open(path, 'rb') as f:
+                body = f.read()
+            content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+            if content_type.startswith('text/'):
+                content_type += '; charset=utf-8'
+            asset = _assets[name] = StaticAsset(name, body, content_type, os.path.getmtime(path))
+        return asset
+
+
+def preload(*names: str):
+    """บีบอัดล่วงหน้าตอนเริ่มเซิร์ฟเวอร์ - คำขอแรกไม่ต้องรอ"""
+    for name in names:
+        load_asset(name)